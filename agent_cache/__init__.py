@@ -0,0 +1,13 @@
+"""Response caching shared by the CRM and Plotly agents
+
+Exports:
+- ResponseCache
+- CachedResponse
+- InMemoryBackend
+- SQLiteBackend
+- normalize_query
+- fingerprint
+"""
+from .response_cache import CachedResponse, InMemoryBackend, ResponseCache, SQLiteBackend, fingerprint, normalize_query
+
+__all__ = ["ResponseCache", "CachedResponse", "InMemoryBackend", "SQLiteBackend", "normalize_query", "fingerprint"]
@@ -0,0 +1,244 @@
+"""
+Response cache for agent invocations.
+
+Operators repeat the same questions, often from different sessions within
+minutes. :class:`ResponseCache` stores the final answer of an agent run under
+a key built from the normalized question, the history it was asked in and a
+data version, so a repeat skips the model entirely.
+
+The data version is how answers stay fresh: the caller passes a value that
+changes whenever the underlying data does (a replica watermark, the newest
+``modifiedon``, a model name), so changed data means a new key and old entries
+simply age out by TTL.
+
+Entries live in a pluggable backend: :class:`InMemoryBackend` (per process)
+or :class:`SQLiteBackend` (shared by processes on one host and kept across
+restarts). Both expire entries after a TTL and evict the least recently used
+ones beyond ``maxsize``.
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING = re.compile(r"[\s?.!]+$")
+
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a question."""
+    return _TRAILING.sub("", _WHITESPACE.sub(" ", str(query)).strip().casefold())
+
+
+def fingerprint(value: Any) -> str:
+    """Stable short hash of a string or JSON-serializable value."""
+    text = value if isinstance(value, str) else json.dumps(value, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+@dataclass
+class CachedResponse:
+    """A cached answer and when it was stored."""
+    answer: str
+    created_at: float = 0.0
+
+    def to_json(self) -> str:
+        return json.dumps({"answer": self.answer, "created_at": self.created_at})
+
+    @classmethod
+    def from_json(cls, text: str) -> "CachedResponse":
+        data = json.loads(text)
+        return cls(answer=data["answer"], created_at=data.get("created_at", 0.0))
+
+
+class InMemoryBackend:
+    """Thread-safe TTL/LRU store of serialized responses in this process."""
+
+    def __init__(self, maxsize: int = 1024, clock: Callable[[], float] = time.time):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        self.maxsize = maxsize
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            if item[0] <= self._clock():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        with self._lock:
+            self._data[key] = (self._clock() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class SQLiteBackend:
+    """
+    TTL/LRU store in a SQLite file, shared by every process that opens the same path.
+
+    Args:
+        path: Database file (``":memory:"`` for a private in-memory database).
+        maxsize: Entries kept; the least recently used are deleted beyond it.
+    """
+
+    def __init__(self, path: str = "response_cache.sqlite3", maxsize: int = 10000,
+                 clock: Callable[[], float] = time.time):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        self.path = path
+        self.maxsize = maxsize
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS response_cache_used ON response_cache (used_at)")
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        now = self._clock()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE response_cache SET used_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: float) -> None:
+        now = self._clock()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now),
+            )
+            self._conn.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+            excess = self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0] - self.maxsize
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM response_cache WHERE key IN "
+                    "(SELECT key FROM response_cache ORDER BY used_at LIMIT ?)", (excess,)
+                )
+                self.evictions += excess
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """
+    Answers of agent runs keyed by question, history and data version.
+
+    Args:
+        backend: Where entries are stored; defaults to an :class:`InMemoryBackend`.
+        ttl: Seconds an answer may be served.
+        namespace: Mixed into every key, e.g. the agent type and model, so
+            different agents can share one backend.
+    """
+
+    def __init__(self, backend: Optional[Any] = None, ttl: float = 300.0, namespace: str = ""):
+        self.backend = backend if backend is not None else InMemoryBackend()
+        self.ttl = ttl
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def make_key(self, query: str, history: Sequence[Any] = (), data_version: Any = None) -> str:
+        """
+        Key for ``query`` asked after ``history`` (messages or strings) against
+        ``data_version`` (e.g. a replica watermark or a fingerprint of the data).
+        """
+        parts = [self.namespace, normalize_query(query), [_message_key(m) for m in history], data_version]
+        return fingerprint(parts)
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """The cached response for ``key``, or None."""
+        text = self.backend.get(key)
+        entry = CachedResponse.from_json(text) if text is not None else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def set(self, key: str, answer: str) -> None:
+        entry = CachedResponse(answer=answer, created_at=time.time())
+        self.backend.set(key, entry.to_json(), self.ttl)
+        with self._lock:
+            self.stores += 1
+
+    def invalidate(self, key: str) -> None:
+        self.backend.delete(key)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.backend),
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": getattr(self.backend, "evictions", 0),
+            }
+
+
+def _message_key(message: Any) -> Any:
+    """The parts of a history message that affect the answer: its role, text and tool calls."""
+    if isinstance(message, str):
+        return message
+    calls = [(call.get("name"), call.get("args")) for call in (getattr(message, "tool_calls", None) or ())]
+    return [type(message).__name__, str(getattr(message, "content", message)), calls]
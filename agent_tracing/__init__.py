@@ -0,0 +1,17 @@
+"""Tracing and metrics shared by the CRM and Plotly agents
+
+Exports:
+- Tracer
+- Span
+- span
+- traced
+- get_tracer
+- set_tracer
+- InMemoryCollector
+- JSONLExporter
+- PrometheusExporter
+"""
+from .tracer import Span, Tracer, current_span, get_tracer, set_tracer, span, traced
+from .exporters import InMemoryCollector, JSONLExporter, PrometheusExporter
+
+__all__ = ["Tracer", "Span", "span", "traced", "current_span", "get_tracer", "set_tracer", "InMemoryCollector", "JSONLExporter", "PrometheusExporter"]
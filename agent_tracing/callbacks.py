@@ -0,0 +1,62 @@
+"""
+LangChain callback handler that records model calls as spans.
+
+Model calls happen inside the LangGraph agent loop, out of reach of a
+``with span(...)`` block, so they are traced through callbacks: a span is
+opened on ``on_chat_model_start`` and ended on ``on_llm_end`` with the token
+usage reported by the provider. Agents attach a handler to a run only while
+their tracer is enabled.
+"""
+
+from typing import Any, Dict, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from .tracer import Span, Tracer
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    Records each model call as an ``llm`` span under ``parent`` (the agent's run span).
+    """
+
+    def __init__(self, tracer: Tracer, parent: Optional[Span] = None):
+        self.tracer = tracer
+        self.parent = parent
+        self._spans: Dict[UUID, Span] = {}
+
+    def _start(self, run_id: UUID, serialized: Optional[Dict[str, Any]], prompt_chars: int) -> None:
+        name = ((serialized or {}).get("kwargs") or {}).get("model_name") or (serialized or {}).get("name")
+        self._spans[run_id] = self.tracer.span(
+            "llm", parent=self.parent, model=name, prompt_chars=prompt_chars
+        )
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, **kwargs: Any) -> None:
+        chars = sum(len(str(m.content)) for batch in messages for m in batch)
+        self._start(run_id, serialized, chars)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, **kwargs: Any) -> None:
+        self._start(run_id, serialized, sum(len(p) for p in prompts))
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        usage = None
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or usage
+        if usage:
+            span.set(input_tokens=usage.get("input_tokens", 0), output_tokens=usage.get("output_tokens", 0))
+        else:
+            token_usage = (response.llm_output or {}).get("token_usage") or {}
+            if token_usage:
+                span.set(input_tokens=token_usage.get("prompt_tokens", 0),
+                         output_tokens=token_usage.get("completion_tokens", 0))
+        span.end()
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.end(error)
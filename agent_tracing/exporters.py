@@ -0,0 +1,211 @@
+"""
+Span exporters: an in-memory collector, a JSONL file writer and a Prometheus
+text endpoint. Any object with an ``export(span)`` method can be added to a
+:class:`~agent_tracing.tracer.Tracer`; ``close()`` is called if present.
+"""
+
+import json
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from .tracer import Span
+
+# Numeric span attributes that the Prometheus exporter sums into counters
+COUNTED_ATTRIBUTES = ("input_tokens", "output_tokens", "payload_bytes", "records")
+
+# Histogram buckets in seconds, from a cached tool call up to a slow model turn
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+class InMemoryCollector:
+    """
+    Keeps the most recent finished spans in memory, for tests, benchmarks and
+    ad-hoc inspection.
+
+    Args:
+        maxlen: Spans kept; older ones are dropped first.
+    """
+
+    def __init__(self, maxlen: int = 10000):
+        self._lock = threading.Lock()
+        self._spans: deque = deque(maxlen=maxlen)
+
+    def export(self, span: Span) -> None:
+        with self._lock:
+            self._spans.append(span)
+
+    def spans(self, name: Optional[str] = None, trace_id: Optional[str] = None) -> List[Span]:
+        with self._lock:
+            spans = list(self._spans)
+        return [s for s in spans if (name is None or s.name == name) and (trace_id is None or s.trace_id == trace_id)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._spans.clear()
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Count, latency percentiles and summed counted attributes per span name."""
+        durations: Dict[str, List[float]] = {}
+        totals: Dict[str, Dict[str, float]] = {}
+        for span in self.spans():
+            durations.setdefault(span.name, []).append(span.duration)
+            sums = totals.setdefault(span.name, {})
+            for key in COUNTED_ATTRIBUTES:
+                value = span.attributes.get(key)
+                if isinstance(value, (int, float)):
+                    sums[key] = sums.get(key, 0) + value
+        summary = {}
+        for name, samples in sorted(durations.items()):
+            ordered = sorted(samples)
+            summary[name] = {
+                "count": len(ordered),
+                "total_ms": round(sum(ordered) * 1000, 3),
+                "p50_ms": round(_percentile(ordered, 0.50) * 1000, 3),
+                "p95_ms": round(_percentile(ordered, 0.95) * 1000, 3),
+                **totals[name],
+            }
+        return summary
+
+    def tree(self, trace_id: str) -> str:
+        """Indented one-line-per-span rendering of a trace, for printing."""
+        spans = sorted(self.spans(trace_id=trace_id), key=lambda s: s.start_time)
+        children: Dict[Optional[int], List[Span]] = {}
+        ids = {s.span_id for s in spans}
+        for s in spans:
+            children.setdefault(s.parent_id if s.parent_id in ids else None, []).append(s)
+        lines = []
+
+        def walk(parent_id: Optional[int], depth: int) -> None:
+            for s in children.get(parent_id, ()):
+                attrs = " ".join(f"{k}={v}" for k, v in s.attributes.items())
+                lines.append(f"{'  ' * depth}{s.name} {s.duration * 1000:.1f}ms {attrs}".rstrip())
+                walk(s.span_id, depth + 1)
+
+        walk(None, 0)
+        return "\n".join(lines)
+
+
+class JSONLExporter:
+    """Appends each finished span as one JSON line to ``path``."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8")
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusExporter:
+    """
+    Aggregates spans into Prometheus metrics and renders them in the text
+    exposition format: a latency histogram and an error counter per span name,
+    plus a counter per :data:`COUNTED_ATTRIBUTES` entry. :meth:`serve` exposes
+    them over HTTP for scraping.
+
+    Args:
+        namespace: Metric name prefix.
+        buckets: Histogram bucket upper bounds in seconds.
+    """
+
+    def __init__(self, namespace: str = "agent", buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.namespace = namespace
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, List[float]] = {}
+        self._errors: Dict[str, int] = {}
+        self._counters: Dict[Tuple[str, str], float] = {}
+        self._server: Optional[Any] = None
+
+    def export(self, span: Span) -> None:
+        duration = span.duration
+        with self._lock:
+            # One slot per bucket, then +Inf (count) and the sum
+            histogram = self._histograms.setdefault(span.name, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if duration <= bound:
+                    histogram[i] += 1
+            histogram[-2] += 1
+            histogram[-1] += duration
+            if span.error is not None:
+                self._errors[span.name] = self._errors.get(span.name, 0) + 1
+            for key in COUNTED_ATTRIBUTES:
+                value = span.attributes.get(key)
+                if isinstance(value, (int, float)):
+                    self._counters[(key, span.name)] = self._counters.get((key, span.name), 0) + value
+
+    def render(self) -> str:
+        ns = self.namespace
+        with self._lock:
+            histograms = {name: list(values) for name, values in self._histograms.items()}
+            errors = dict(self._errors)
+            counters = dict(self._counters)
+        lines = [f"# HELP {ns}_span_seconds Time spent per traced stage.",
+                 f"# TYPE {ns}_span_seconds histogram"]
+        for name, values in sorted(histograms.items()):
+            label = _label(name)
+            for bound, count in zip(self.buckets, values):
+                lines.append(f'{ns}_span_seconds_bucket{{span="{label}",le="{bound}"}} {count:g}')
+            lines.append(f'{ns}_span_seconds_bucket{{span="{label}",le="+Inf"}} {values[-2]:g}')
+            lines.append(f'{ns}_span_seconds_count{{span="{label}"}} {values[-2]:g}')
+            lines.append(f'{ns}_span_seconds_sum{{span="{label}"}} {values[-1]:.6f}')
+        lines += [f"# HELP {ns}_span_errors_total Traced stages that raised.",
+                  f"# TYPE {ns}_span_errors_total counter"]
+        lines += [f'{ns}_span_errors_total{{span="{_label(name)}"}} {count}' for name, count in sorted(errors.items())]
+        for key in COUNTED_ATTRIBUTES:
+            series = sorted((name, value) for (attribute, name), value in counters.items() if attribute == key)
+            if not series:
+                continue
+            lines += [f"# HELP {ns}_{key}_total Sum of the {key} attribute per traced stage.",
+                      f"# TYPE {ns}_{key}_total counter"]
+            lines += [f'{ns}_{key}_total{{span="{_label(name)}"}} {value:g}' for name, value in series]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int = 9464, host: str = "127.0.0.1") -> Any:
+        """Serve :meth:`render` at ``http://host:port/metrics`` from a daemon thread."""
+        # http.server is only imported by processes that actually expose metrics
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="prometheus-exporter", daemon=True).start()
+        return self._server
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -0,0 +1,226 @@
+"""
+Nested timing spans for the CRM and Plotly agents.
+
+A :class:`Tracer` hands out :class:`Span` context managers. The span that is
+open in the current context becomes the parent of the next one, so a run of
+an agent produces a tree: the run, each model call, each tool call and the
+stages inside a tool (Dataverse pages, option-set decoding, ``exec`` of chart
+code, ``fig.to_json()``). Spans carry attributes such as token counts and
+payload sizes and are handed to the tracer's exporters when they end.
+
+Instrumented code calls the module-level :func:`span`, which uses the tracer
+of the enclosing span (so tools follow the agent that called them) and falls
+back to the process-wide default. A tracer without exporters is disabled and
+:func:`span` then returns a shared no-op span, so instrumentation costs one
+context-variable lookup per stage when tracing is off.
+"""
+
+import contextvars
+import functools
+import itertools
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("agent_tracing_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class Span:
+    """
+    One timed stage. Use as a context manager, or call :meth:`end` for spans
+    that start and end in different callbacks (e.g. model calls).
+    """
+
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "attributes", "start_time",
+                 "end_time", "error", "_started", "_elapsed", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, parent: Optional["Span"] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.name = name
+        self.span_id = next(_span_ids)
+        self.parent_id = parent.span_id if parent is not None else None
+        self.trace_id = parent.trace_id if parent is not None else os.urandom(8).hex()
+        self.attributes = dict(attributes) if attributes else {}
+        self.start_time = time.time()
+        self.end_time: Optional[float] = None
+        self.error: Optional[str] = None
+        self._started = time.perf_counter()
+        self._elapsed: Optional[float] = None
+        self._token = None
+
+    @property
+    def duration(self) -> float:
+        """Seconds from start to end (or to now while the span is open)."""
+        return self._elapsed if self._elapsed is not None else time.perf_counter() - self._started
+
+    def set(self, **attributes: Any) -> "Span":
+        self.attributes.update(attributes)
+        return self
+
+    def add(self, name: str, amount: float) -> "Span":
+        """Add ``amount`` to a numeric attribute, e.g. bytes over several pages."""
+        self.attributes[name] = self.attributes.get(name, 0) + amount
+        return self
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        if self.end_time is not None:
+            return
+        self._elapsed = time.perf_counter() - self._started
+        self.end_time = self.start_time + self._elapsed
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        self.tracer._export(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        _current_span.reset(self._token)
+        self.end(exc)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    """Stand-in returned while tracing is disabled; every operation does nothing."""
+
+    __slots__ = ()
+    attributes: Dict[str, Any] = {}
+
+    def set(self, **attributes: Any) -> "_NoopSpan":
+        return self
+
+    def add(self, name: str, amount: float) -> "_NoopSpan":
+        return self
+
+    def end(self, error: Optional[BaseException] = None) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class Tracer:
+    """
+    Creates spans and sends finished ones to its exporters.
+
+    Args:
+        exporters: Objects with an ``export(span)`` method, e.g.
+            :class:`~agent_tracing.exporters.InMemoryCollector`,
+            :class:`~agent_tracing.exporters.JSONLExporter` or
+            :class:`~agent_tracing.exporters.PrometheusExporter`.
+            The tracer is enabled while it has at least one.
+    """
+
+    def __init__(self, exporters: Optional[Iterable[Any]] = None):
+        self._lock = threading.Lock()
+        self._exporters: List[Any] = list(exporters or ())
+        self.enabled = bool(self._exporters)
+        self.export_errors = 0
+
+    def add_exporter(self, exporter: Any) -> None:
+        with self._lock:
+            self._exporters = self._exporters + [exporter]
+            self.enabled = True
+
+    def remove_exporter(self, exporter: Any) -> None:
+        with self._lock:
+            self._exporters = [e for e in self._exporters if e is not exporter]
+            self.enabled = bool(self._exporters)
+
+    def span(self, name: str, parent: Optional[Span] = None, **attributes: Any):
+        """Open a span under ``parent`` (default: the span open in this context)."""
+        if not self.enabled:
+            return NOOP_SPAN
+        if parent is None:
+            parent = _current_span.get()
+        return Span(self, name, parent, attributes)
+
+    def _export(self, span: Span) -> None:
+        for exporter in self._exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                # A broken exporter must never fail the agent call it is observing
+                self.export_errors += 1
+                if self.export_errors == 1:
+                    print(f"[WARNING] Trace exporter {type(exporter).__name__} failed: {e}")
+
+    def close(self) -> None:
+        for exporter in self._exporters:
+            close = getattr(exporter, "close", None)
+            if close is not None:
+                close()
+
+
+_default_tracer = Tracer()
+
+
+def get_tracer() -> Tracer:
+    """The process-wide tracer used by agents that were not given one."""
+    return _default_tracer
+
+
+def set_tracer(tracer: Tracer) -> Tracer:
+    """Replace the process-wide tracer; returns the previous one."""
+    global _default_tracer
+    previous, _default_tracer = _default_tracer, tracer
+    return previous
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def span(name: str, **attributes: Any):
+    """
+    Open a span with the tracer of the enclosing span, or the default tracer
+    at the top level. Returns a no-op span while that tracer is disabled.
+    """
+    parent = _current_span.get()
+    tracer = parent.tracer if parent is not None else _default_tracer
+    if not tracer.enabled:
+        return NOOP_SPAN
+    return Span(tracer, name, parent, attributes)
+
+
+def traced(name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Run the decorated function in a span named ``name``. A string result is
+    recorded as ``payload_bytes``, the size of what goes back to the model.
+    Apply it below ``@tool`` so the tool schema still comes from the function.
+    """
+    def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            stage = span(name)
+            if stage is NOOP_SPAN:
+                return fn(*args, **kwargs)
+            with stage:
+                result = fn(*args, **kwargs)
+                if isinstance(result, str):
+                    stage.set(payload_bytes=len(result.encode("utf-8")))
+                return result
+        return wrapper
+    return decorate
@@ -0,0 +1,5 @@
+"""
+Offline benchmarks for the CRM and Plotly agents.
+
+Run from the project root, e.g. ``python -m benchmarks.bench_case_decoding``.
+"""
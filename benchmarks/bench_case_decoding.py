@@ -0,0 +1,123 @@
+"""
+Microbenchmark: table-driven CaseDecoder vs. the original per-record loop.
+
+Usage:
+    python -m benchmarks.bench_case_decoding [--rows 5000] [--repeat 20]
+"""
+
+import argparse
+import json
+import random
+import timeit
+
+from crm_case_agent.decoding import CaseDecoder, PRIORITY_MAP, STATUS_MAP, STATUS_REASON_MAP
+from crm_case_agent.utility import get_customer_name_from_case
+
+
+def legacy_decode(case_batches):
+    """The per-record loop retrieve_customer_cases used before CaseDecoder."""
+    cases_list = []
+    for batch in case_batches:
+        for case in batch:
+            customer = get_customer_name_from_case(case)
+
+            priority = case.get('prioritycode@OData.Community.Display.V1.FormattedValue')
+            if not priority:
+                raw_priority = case.get('prioritycode')
+                try:
+                    priority = PRIORITY_MAP.get(int(raw_priority)) if raw_priority is not None else 'N/A'
+                except Exception:
+                    priority = raw_priority if raw_priority is not None else 'N/A'
+
+            status = case.get('statecode@OData.Community.Display.V1.FormattedValue')
+            raw_state = case.get('statecode')
+            if not status:
+                try:
+                    status = STATUS_MAP.get(int(raw_state)) if raw_state is not None else None
+                except Exception:
+                    status = None
+
+            status_reason = case.get('statuscode@OData.Community.Display.V1.FormattedValue')
+            raw_status = case.get('statuscode')
+            if not status_reason:
+                try:
+                    status_reason = STATUS_REASON_MAP.get(int(raw_status)) if raw_status is not None else None
+                except Exception:
+                    status_reason = None
+
+            if not status:
+                derived = None
+                try:
+                    code = int(raw_status) if raw_status is not None else None
+                except Exception:
+                    code = None
+                if code is not None:
+                    if code in (1, 2, 3, 4):
+                        derived = "Active"
+                    elif code in (5, 1000):
+                        derived = "Resolved"
+                    elif code in (6, 2000):
+                        derived = "Cancelled"
+                    else:
+                        derived = STATUS_MAP.get(code)
+                status = status or derived or 'N/A'
+
+            cases_list.append({
+                "customer": customer,
+                "title": case.get('title', 'N/A'),
+                "ticket_number": case.get('ticketnumber', 'N/A'),
+                "priority": priority or 'N/A',
+                "status": status or 'N/A',
+                "status_reason": status_reason or 'N/A',
+                "createdon": case.get('createdon'),
+                "description": case.get('description', 'N/A')
+            })
+    return cases_list
+
+
+def make_records(rows, seed=7):
+    """Synthetic incident rows shaped like get_customer_cases output (numeric codes only)."""
+    rng = random.Random(seed)
+    reasons = list(STATUS_REASON_MAP)
+    return [
+        {
+            "incidentid": f"00000000-0000-0000-0000-{i:012d}",
+            "title": f"Case {i}",
+            "ticketnumber": f"CAS-{i:06d}",
+            "prioritycode": rng.choice([1, 2, 3]),
+            "statuscode": rng.choice(reasons),
+            "createdon": "2024-01-01T00:00:00Z",
+            "description": "Synthetic case",
+            "customerid_account": {"name": "Trey Research"},
+        }
+        for i in range(rows)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    records = make_records(args.rows)
+    decoder = CaseDecoder()
+    assert decoder.decode(records) == legacy_decode([records]), "decoder output diverges from legacy loop"
+
+    legacy = min(timeit.repeat(lambda: legacy_decode([records]), number=1, repeat=args.repeat))
+    table = min(timeit.repeat(lambda: decoder.decode(records), number=1, repeat=args.repeat))
+    columns = min(timeit.repeat(lambda: decoder.decode_page(records), number=1, repeat=args.repeat))
+
+    print(json.dumps({
+        "benchmark": "case_decoding",
+        "rows": args.rows,
+        "legacy_loop_ms": round(legacy * 1000, 3),
+        "decoder_rows_ms": round(table * 1000, 3),
+        "decoder_columns_ms": round(columns * 1000, 3),
+        "speedup_rows": round(legacy / table, 2),
+        "speedup_columns": round(legacy / columns, 2),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Chart rendering in process versus in the sandboxed ChartExecutorPool.
+
+Renders the same set of charts over a synthetic dataset three ways: serially
+in this process (the default tool path), from ``--concurrency`` threads in
+this process (serialized by the GIL), and from ``--concurrency`` threads
+through a ``ChartExecutorPool`` with one worker per thread. Reports wall time
+and charts per second for each, plus the pool's counters.
+
+Usage:
+    python -m benchmarks.bench_chart_executor [--rows 200000] [--charts 16]
+        [--concurrency 4] [--max-points 20000] [--output results.json]
+"""
+
+import argparse
+import json
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from plotly_agent.datasets import get_dataset_store
+from plotly_agent.executor import ChartExecutorPool, execute_chart_code
+
+CHART_CODE = (
+    "fig = px.line(df, x='date', y='value', color='region', title='<b>Value</b>')",
+    "fig = px.scatter(df, x='value', y='count', color='region')",
+    "fig = px.bar(df.groupby('category', as_index=False)['value'].sum(), x='category', y='value')",
+    "fig = px.histogram(df, x='value', nbins=60)",
+)
+
+
+def synthetic_frame(rows: int) -> Any:
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "date": pd.date_range("2020-01-01", periods=rows, freq="min"),
+        "category": rng.choice([f"Category {i}" for i in range(40)], rows),
+        "region": rng.choice(["North", "South", "East", "West"], rows),
+        "value": rng.normal(1000, 250, rows).cumsum(),
+        "count": rng.integers(0, 500, rows),
+    })
+
+
+def timed(charts: int, concurrency: int, render: Callable[[str], Any]) -> Dict[str, Any]:
+    codes = [CHART_CODE[i % len(CHART_CODE)] for i in range(charts)]
+    started = time.perf_counter()
+    if concurrency <= 1:
+        for code in codes:
+            render(code)
+    else:
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(render, codes))
+    seconds = time.perf_counter() - started
+    return {"wall_s": round(seconds, 3), "charts_per_s": round(charts / seconds, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--charts", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-points", type=int, default=20000)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    df = synthetic_frame(args.rows)
+    handle = get_dataset_store().register(df)
+
+    def in_process(code: str) -> Any:
+        return execute_chart_code(code, df.copy(), max_points=args.max_points)
+
+    # Warm plotly in this process too, so neither side pays first-use costs
+    in_process(CHART_CODE[0])
+    results = {
+        "in_process_serial": timed(args.charts, 1, in_process),
+        "in_process_threads": timed(args.charts, args.concurrency, in_process),
+    }
+    started = time.perf_counter()
+    with ChartExecutorPool(workers=args.concurrency).ready() as pool:
+        startup_s = round(time.perf_counter() - started, 3)
+
+        def sandboxed(code: str) -> Any:
+            return pool.run(code, df, max_points=args.max_points, data_key=handle)
+
+        sandboxed(CHART_CODE[0])
+        results["pool_threads"] = timed(args.charts, args.concurrency, sandboxed)
+        results["pool_threads"]["startup_s"] = startup_s
+        results["pool_stats"] = pool.stats()
+
+    report = {
+        "benchmark": "chart_executor",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "rows": args.rows,
+        "charts": args.charts,
+        "concurrency": args.concurrency,
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Per-turn prompt size and latency of a long CRMCaseAgent session, fully offline.
+
+Runs the same scripted session (``--turns`` questions cycling through a few
+case lookups) twice against a synthetic org: once with the default bounded
+``ConversationMemory`` and once with a memory whose limits are never reached,
+which is what sending the whole history back on every turn costs. The
+scripted model can charge simulated prompt-processing time per 1,000 prompt
+tokens (``--ms-per-1k-tokens``), so latency follows prompt size the way it
+does with a hosted model.
+
+For each mode the report gives the prompt tokens the model received and the
+turn latency, averaged over the first, middle and last ``--window`` turns,
+plus the least-squares slope of both over the session. A flat session has a
+slope near zero.
+
+Usage:
+    python -m benchmarks.bench_conversation_memory [--turns 200] [--window 20]
+        [--ms-per-1k-tokens 2] [--incidents 10000] [--output results.json]
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import time
+from typing import Any, Dict, List
+
+from crm_case_agent.agent import CRMCaseAgent
+from crm_case_agent.fakes import ScriptedChatModel, synthetic_client
+from crm_case_agent.memory import ConversationMemory, message_tokens
+
+QUERIES = (
+    "Show cases for Trey Research",
+    "Show cases for Contoso Ltd",
+    "How many cases for Fabrikam Inc?",
+    "Show cases for Adventure Works and Litware Inc",
+    "Show me the details of CAS-000001",
+    "Show cases for Northwind Traders",
+)
+
+
+class MeteredScriptedModel(ScriptedChatModel):
+    """``ScriptedChatModel`` that records prompt tokens and sleeps in proportion to them."""
+
+    ms_per_1k_tokens: float = 0.0
+    prompt_tokens: List[int] = []
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        tokens = sum(message_tokens(message) for message in messages)
+        self.prompt_tokens.append(tokens)
+        if self.ms_per_1k_tokens:
+            time.sleep(tokens / 1000 * self.ms_per_1k_tokens / 1000)
+        return super()._generate(messages, stop, run_manager, **kwargs)
+
+
+def _slope(values: List[float]) -> float:
+    """Least-squares change per turn."""
+    mean_x = (len(values) - 1) / 2
+    mean_y = statistics.fmean(values)
+    numerator = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+    denominator = sum((x - mean_x) ** 2 for x in range(len(values)))
+    return numerator / denominator if denominator else 0.0
+
+
+def _windows(values: List[float], window: int, digits: int) -> Dict[str, float]:
+    middle = max((len(values) - window) // 2, 0)
+    return {
+        "first": round(statistics.fmean(values[:window]), digits),
+        "middle": round(statistics.fmean(values[middle:middle + window]), digits),
+        "last": round(statistics.fmean(values[-window:]), digits),
+    }
+
+
+def run_session(mode: str, client, turns: int, window: int, ms_per_1k_tokens: float) -> Dict[str, Any]:
+    if mode == "bounded":
+        memory = ConversationMemory()
+    else:
+        memory = ConversationMemory(max_tokens=10 ** 9, max_turns=10 ** 9, keep_tool_outputs=10 ** 9)
+    model = MeteredScriptedModel(ms_per_1k_tokens=ms_per_1k_tokens, prompt_tokens=[])
+    agent = CRMCaseAgent(client, model=model, memory=memory)
+
+    latencies, prompt_tokens = [], []
+    for turn in range(turns):
+        model.prompt_tokens.clear()
+        started = time.perf_counter()
+        agent.run(QUERIES[turn % len(QUERIES)], memory=memory)
+        latencies.append((time.perf_counter() - started) * 1000)
+        # The largest prompt of the turn: the model call that follows the tool result
+        prompt_tokens.append(max(model.prompt_tokens, default=0))
+
+    return {
+        "mode": mode,
+        "turns": turns,
+        "prompt_tokens": _windows(prompt_tokens, window, 0),
+        "prompt_tokens_max": max(prompt_tokens),
+        "prompt_tokens_slope_per_turn": round(_slope(prompt_tokens), 2),
+        "latency_ms": _windows(latencies, window, 2),
+        "latency_ms_slope_per_turn": round(_slope(latencies), 4),
+        "memory": memory.stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--window", type=int, default=20)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=2.0,
+                        help="Simulated model time per 1,000 prompt tokens")
+    parser.add_argument("--incidents", type=int, default=10000)
+    parser.add_argument("--customers", type=int, default=50)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    client = synthetic_client(args.incidents, args.customers)
+    report = {
+        "benchmark": "conversation_memory",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "ms_per_1k_tokens": args.ms_per_1k_tokens,
+        "results": [run_session(mode, client, args.turns, args.window, args.ms_per_1k_tokens)
+                    for mode in ("bounded", "unbounded")],
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+End-to-end benchmark of CRMCaseAgent against a synthetic org, fully offline.
+
+A ``FakeDataverseClient`` filled with generated incidents stands in for
+Dataverse and ``ScriptedChatModel`` for the LLM. For each org size it measures
+``retrieve_customer_cases`` (cold and warm cache) and ``CRMCaseAgent.run``:
+latency percentiles, time per stage (Dataverse paging, model, everything
+else), throughput under concurrency and peak traced memory. With ``--fast-path``
+the agent gets a ``FastPathRouter`` and the report includes its hit rate.
+
+Usage:
+    python -m benchmarks.bench_crm_agent [--incidents 10 1000 10000 100000]
+        [--iterations 20] [--concurrency 8] [--fast-path] [--output results.json]
+"""
+
+import argparse
+import json
+import platform
+import resource
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from typing import Any, Callable, Dict, List
+
+from crm_case_agent.agent import CRMCaseAgent
+from crm_case_agent.cache import CaseCache
+from crm_case_agent.fakes import ScriptedChatModel, synthetic_client
+from crm_case_agent.gateway import DataverseGateway, RequestBudget
+from crm_case_agent.router import FastPathRouter
+from crm_case_agent.tools import retrieve_customer_cases
+
+QUERIES = (
+    "Show cases for Trey Research",
+    "Show cases for Contoso Ltd",
+    "How many cases for Fabrikam Inc?",
+    "Show cases for Adventure Works and Litware Inc",
+    "Show me the details of CAS-000001",
+)
+
+
+class Stopwatch:
+    """Thread-safe accumulator of seconds per stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.seconds: Dict[str, float] = {}
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+
+    def reset(self) -> Dict[str, float]:
+        with self._lock:
+            seconds, self.seconds = self.seconds, {}
+            return seconds
+
+
+class TimedClient:
+    """Times each page a client produces under the ``dataverse`` stage."""
+
+    def __init__(self, client, stopwatch: Stopwatch):
+        self.client = client
+        self.stopwatch = stopwatch
+
+    def get(self, table, record_id=None, **kwargs):
+        started = time.perf_counter()
+        result = self.client.get(table, record_id, **kwargs)
+        if record_id is not None:
+            self.stopwatch.add("dataverse", time.perf_counter() - started)
+            return result
+        return self._timed(iter(result))
+
+    def _timed(self, pages):
+        while True:
+            started = time.perf_counter()
+            page = next(pages, None)
+            self.stopwatch.add("dataverse", time.perf_counter() - started)
+            if page is None:
+                return
+            yield page
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+
+class TimedScriptedModel(ScriptedChatModel):
+    """``ScriptedChatModel`` that reports its calls under the ``model`` stage."""
+
+    stopwatch: Any = None
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        started = time.perf_counter()
+        try:
+            return super()._generate(messages, stop, run_manager, **kwargs)
+        finally:
+            self.stopwatch.add("model", time.perf_counter() - started)
+
+
+class _Runtime:
+    def __init__(self, context):
+        self.context = context
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def pick(q):
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    return {
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p95_ms": round(pick(0.95) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def _measure(fn: Callable[[int], Any], iterations: int, stopwatch: Stopwatch) -> Dict[str, Any]:
+    """Latency, per-stage time and peak traced memory of ``iterations`` sequential calls."""
+    samples = []
+    stopwatch.reset()
+    for i in range(iterations):
+        started = time.perf_counter()
+        fn(i)
+        samples.append(time.perf_counter() - started)
+    stages = stopwatch.reset()
+    total = sum(samples)
+    stage_ms = {name: round(seconds / iterations * 1000, 3) for name, seconds in sorted(stages.items())}
+    stage_ms["other"] = round((total - sum(stages.values())) / iterations * 1000, 3)
+
+    # Memory is traced in a separate pass; tracemalloc slows allocation-heavy code down
+    tracemalloc.start()
+    fn(iterations)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    stopwatch.reset()
+    return {"iterations": iterations, **_percentiles(samples), "stages_ms": stage_ms,
+            "peak_traced_mb": round(peak / 2 ** 20, 2)}
+
+
+def _throughput(fn: Callable[[int], Any], requests: int, concurrency: int) -> Dict[str, Any]:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(fn, range(requests)))
+    elapsed = time.perf_counter() - started
+    return {"concurrency": concurrency, "requests": requests, "requests_per_s": round(requests / elapsed, 2)}
+
+
+def bench_size(incidents: int, customers: int, iterations: int, concurrency: int, model_latency: float,
+               fast_path: bool = False) -> Dict[str, Any]:
+    stopwatch = Stopwatch()
+    started = time.perf_counter()
+    fake = synthetic_client(incidents, customers)
+    setup_s = time.perf_counter() - started
+    # A private org budget, so repeated runs are never held back by the request budget
+    client = DataverseGateway(TimedClient(fake, stopwatch), org=f"benchmark-{incidents}",
+                              budget=RequestBudget(requests=10 ** 9))
+    model = TimedScriptedModel(latency=model_latency, stopwatch=stopwatch)
+    agent = CRMCaseAgent(client, model=model, router=FastPathRouter() if fast_path else None)
+    customer = fake.tables["account"][0]["name"]
+
+    def tool_call(context):
+        return retrieve_customer_cases.func(customer_name=customer, runtime=_Runtime(context))
+
+    results = {
+        "incidents": incidents,
+        "customers": customers,
+        "setup_ms": round(setup_s * 1000, 1),
+        "retrieve_customer_cases_cold": _measure(
+            lambda i: tool_call(replace(agent._context(), case_cache=CaseCache())),
+            iterations, stopwatch),
+        "retrieve_customer_cases_warm": _measure(lambda i: tool_call(agent._context()), iterations, stopwatch),
+    }
+    # The largest customer pages past its first page; its cached prefix should still be hit
+    warm_cache = agent.case_cache.stats()
+    results["retrieve_customer_cases_warm"]["cache"] = {
+        key: warm_cache[key] for key in ("hits", "misses", "hit_rate", "revalidations")
+    }
+    results["run"] = _measure(lambda i: agent.run(QUERIES[i % len(QUERIES)]), iterations, stopwatch)
+    results["run_throughput"] = _throughput(lambda i: agent.run(QUERIES[i % len(QUERIES)]),
+                                            max(iterations, concurrency * 4), concurrency)
+    results["gateway"] = {key: value for key, value in client.stats().items()
+                          if key in ("requests", "retries", "throttles", "peak_limit")}
+    if fast_path:
+        results["fast_path"] = agent.router_stats()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--incidents", type=int, nargs="+", default=[10, 1000, 10000, 100000])
+    parser.add_argument("--customers", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--model-latency", type=float, default=0.0,
+                        help="Seconds the scripted model sleeps per call")
+    parser.add_argument("--fast-path", action="store_true",
+                        help="Answer simple case lookups without the model (FastPathRouter)")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = {
+        "benchmark": "crm_agent",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "model_latency_s": args.model_latency,
+        "results": [bench_size(n, args.customers, args.iterations, args.concurrency, args.model_latency,
+                               args.fast_path)
+                    for n in args.incidents],
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                            / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1),
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Cold import time of the agent packages, each measured in a fresh interpreter.
+
+For every module it starts ``--repeat`` new Python processes that import only
+that module and reports the median and best wall time of the import, plus the
+slowest imported packages from ``python -X importtime`` (cumulative), so a
+regression in start-up cost can be traced to the dependency that caused it.
+
+Usage:
+    python -m benchmarks.bench_import_time [--modules crm_case_agent plotly_agent ...]
+        [--repeat 5] [--top 8] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict, List
+
+MODULES = (
+    "agent_tracing",
+    "agent_cache",
+    "crm_case_agent",
+    "crm_case_agent.tools",
+    "crm_case_agent.agent",
+    "plotly_agent",
+    "plotly_agent.tools",
+    "plotly_agent.agent",
+)
+
+_TIMER = "import time; started = time.perf_counter(); import {module}; print(time.perf_counter() - started)"
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _run(args: List[str]) -> subprocess.CompletedProcess:
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True)
+
+
+def _slowest(module: str, top: int) -> List[Dict[str, Any]]:
+    """Dependencies (by top-level package) with the largest cumulative import time, from ``-X importtime``."""
+    result = _run(["-X", "importtime", "-c", f"import {module}"])
+    own = module.split(".")[0]
+    totals: Dict[str, int] = {}
+    for line in result.stderr.splitlines():
+        # "import time: <self us> | <cumulative us> | <indented module name>"
+        parts = line.split("|")
+        if len(parts) != 3 or not line.startswith("import time:") or not parts[1].strip().isdigit():
+            continue
+        package = parts[2].strip().split(".")[0]
+        if package != own:
+            totals[package] = max(totals.get(package, 0), int(parts[1].strip()))
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"package": package, "cumulative_ms": round(us / 1000, 1)} for package, us in ranked]
+
+
+def bench_module(module: str, repeat: int, top: int) -> Dict[str, Any]:
+    samples = []
+    for _ in range(repeat):
+        result = _run(["-c", _TIMER.format(module=module)])
+        if result.returncode != 0:
+            error = (result.stderr.strip().splitlines() or ["import failed"])[-1]
+            return {"module": module, "error": error}
+        samples.append(float(result.stdout.strip().splitlines()[-1]))
+    return {
+        "module": module,
+        "median_ms": round(statistics.median(samples) * 1000, 1),
+        "best_ms": round(min(samples) * 1000, 1),
+        "slowest_imports": _slowest(module, top),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=list(MODULES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=8, help="Slowest imported packages listed per module")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = {
+        "benchmark": "import_time",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [bench_module(module, args.repeat, args.top) for module in args.modules],
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Ingestion cost of chart data for PlotlyVisualizationAgent, per input format.
+
+Writes a synthetic dataset (dates, categories, floats, ints) as Parquet and
+Feather, then for each input format starts a fresh Python process that takes
+the data from "in the caller's hands" to "a DataFrame the chart code can
+use" and reports the wall time and the peak RSS that step added:
+
+- ``records_json``: the old path, ``to_json(orient="records")`` then
+  ``json.loads`` and ``pd.DataFrame`` in the tool
+- ``dataframe``: a pandas DataFrame registered in the dataset store
+- ``arrow_table``: a pyarrow Table registered in the dataset store
+- ``parquet``: a Parquet file path registered in the dataset store
+- ``feather``: a memory-mapped Feather file path registered in the dataset store
+
+Each store-backed format also resolves its handle and takes the copy the chart
+tools hand to generated code. Requires pandas and pyarrow.
+
+Usage:
+    python -m benchmarks.bench_plotly_ingestion [--rows 1000000] [--repeat 3]
+        [--formats records_json dataframe arrow_table parquet feather] [--output results.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+FORMATS = ("records_json", "dataframe", "arrow_table", "parquet", "feather")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _status_mb(field: str) -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 2 ** 10
+    raise ValueError(field)
+
+
+def _reset_peak_rss() -> float:
+    """
+    Reset the peak RSS (so import-time peaks do not hide the measured step) and
+    return the current RSS in MB. Falls back to ``ru_maxrss`` off Linux.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return _status_mb("VmRSS")
+    except (OSError, ValueError):
+        return _max_rss_mb()
+
+
+def _peak_rss_mb() -> float:
+    try:
+        return _status_mb("VmHWM")
+    except (OSError, ValueError):
+        return _max_rss_mb()
+
+
+def _max_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == "darwin" else 2 ** 10)
+
+
+def write_dataset(rows: int, directory: str) -> Dict[str, str]:
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "date": pd.date_range("2020-01-01", periods=rows, freq="min"),
+        "category": pd.Series(rng.choice([f"Category {i}" for i in range(50)], rows)),
+        "region": pd.Series(rng.choice(["North", "South", "East", "West"], rows)),
+        "value": rng.normal(1000, 250, rows),
+        "count": rng.integers(0, 500, rows),
+    })
+    paths = {"parquet": os.path.join(directory, "data.parquet"), "feather": os.path.join(directory, "data.feather")}
+    df.to_parquet(paths["parquet"], index=False)
+    # Uncompressed, so the memory-mapped columns can be used in place
+    df.reset_index(drop=True).to_feather(paths["feather"], compression="uncompressed")
+    return paths
+
+
+def worker(fmt: str, paths: Dict[str, str]) -> Dict[str, Any]:
+    """Runs in a fresh process: prepare the caller-side input, then time ingestion only."""
+    import pandas as pd
+    import pyarrow.parquet as pq
+
+    from plotly_agent.datasets import DatasetStore
+
+    store = DatasetStore(max_bytes=None)
+    if fmt in ("records_json", "dataframe"):
+        source = pd.read_parquet(paths["parquet"])
+    elif fmt == "arrow_table":
+        source = pq.read_table(paths["parquet"])
+    else:
+        source = paths[fmt]
+
+    rss_before = _reset_peak_rss()
+    started = time.perf_counter()
+    if fmt == "records_json":
+        df = pd.DataFrame(json.loads(source.to_json(orient="records")))
+    else:
+        df = store.get(store.register(source)).copy()
+    seconds = time.perf_counter() - started
+    return {"seconds": seconds, "peak_rss_added_mb": max(_peak_rss_mb() - rss_before, 0.0), "rows": len(df)}
+
+
+def bench_format(fmt: str, paths: Dict[str, str], repeat: int) -> Dict[str, Any]:
+    samples: List[Dict[str, Any]] = []
+    for _ in range(repeat):
+        result = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_plotly_ingestion", "--worker", fmt, "--paths", json.dumps(paths)],
+            cwd=ROOT, capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            error = (result.stderr.strip().splitlines() or ["worker failed"])[-1]
+            return {"format": fmt, "error": error}
+        samples.append(json.loads(result.stdout.strip().splitlines()[-1]))
+    return {
+        "format": fmt,
+        "rows": samples[0]["rows"],
+        "median_s": round(statistics.median(s["seconds"] for s in samples), 4),
+        "best_s": round(min(s["seconds"] for s in samples), 4),
+        "peak_rss_added_mb": round(statistics.median(s["peak_rss_added_mb"] for s in samples), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--formats", nargs="+", default=list(FORMATS), choices=FORMATS)
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--worker", choices=FORMATS, help=argparse.SUPPRESS)
+    parser.add_argument("--paths", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(worker(args.worker, json.loads(args.paths))))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = write_dataset(args.rows, directory)
+        report = {
+            "benchmark": "plotly_ingestion",
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "rows": args.rows,
+            "file_mb": {fmt: round(os.path.getsize(path) / 2 ** 20, 1) for fmt, path in paths.items()},
+            "results": [bench_format(fmt, paths, args.repeat) for fmt in args.formats],
+        }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,10 +3,73 @@
 This package contains the refactored CRM case agent implementation.
 Exports:
 - CRMCaseAgent
+- StreamEvent
 - retrieve_customer_cases
+- retrieve_cases_for_customers
+- get_case_details
+- get_case_statistics
+- CaseCache
+- CustomerIndex
+- CaseReplica
+- CaseOutputFormat
+- ConversationMemory
+- CRMSessionManager
+- DataverseClientPool
+- SharedTokenCredential
+- DataverseGateway
+- ThrottledError
+- FastPathRouter
+
+Exports are imported on first access, so importing the package (or a light
+submodule such as ``crm_case_agent.cache``) does not load LangChain.
 """
-from .agent import CRMCaseAgent
-from .tools import retrieve_customer_cases
+import importlib
+from typing import TYPE_CHECKING
+
+_EXPORTS = {
+    "CRMCaseAgent": ".agent",
+    "StreamEvent": ".agent",
+    "retrieve_customer_cases": ".tools",
+    "retrieve_cases_for_customers": ".tools",
+    "get_case_details": ".tools",
+    "get_case_statistics": ".tools",
+    "CaseCache": ".cache",
+    "CustomerIndex": ".customer_index",
+    "CaseReplica": ".replica",
+    "CaseOutputFormat": ".formatting",
+    "ConversationMemory": ".memory",
+    "CRMSessionManager": ".service",
+    "DataverseClientPool": ".service",
+    "SharedTokenCredential": ".auth",
+    "DataverseGateway": ".gateway",
+    "ThrottledError": ".gateway",
+    "FastPathRouter": ".router",
+}
+
+__all__ = list(_EXPORTS)
+
+if TYPE_CHECKING:
+    from .agent import CRMCaseAgent, StreamEvent
+    from .tools import retrieve_customer_cases, retrieve_cases_for_customers, get_case_details, get_case_statistics
+    from .cache import CaseCache
+    from .customer_index import CustomerIndex
+    from .replica import CaseReplica
+    from .formatting import CaseOutputFormat
+    from .memory import ConversationMemory
+    from .service import CRMSessionManager, DataverseClientPool
+    from .auth import SharedTokenCredential
+    from .gateway import DataverseGateway, ThrottledError
+    from .router import FastPathRouter
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
 
-__all__ = ["CRMCaseAgent", "retrieve_customer_cases"]
 
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,48 +1,513 @@
-import os
-from typing import List, Optional
-from langchain.agents import create_agent
-from langchain.messages import HumanMessage, AIMessage
-from .tools import retrieve_customer_cases, CRMContext
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Union
+from langchain.messages import AIMessage, HumanMessage, ToolMessage
+from agent_cache import ResponseCache
+from agent_tracing import Span, Tracer, get_tracer, span
+from agent_tracing.callbacks import TracingCallbackHandler
+from .cache import CaseCache, TTLCache
+from .customer_index import CustomerIndex
+from .decoding import CaseDecoder
+from .formatting import CaseOutputFormat
+from .gateway import DataverseGateway
+from .memory import ConversationMemory
+from .pagination import CaseCursorStore
+from .replica import CaseReplica
+from .router import FastPathMatch, FastPathRouter, fast_path_answer
+from .statistics import count_cases
+from .tools import (
+    retrieve_customer_cases,
+    retrieve_cases_for_customers,
+    get_case_details,
+    get_case_statistics,
+    CRMContext,
+)
+
+class _DirectRuntime:
+    """The part of ``ToolRuntime`` the tools use, for calling them outside the agent loop."""
+
+    def __init__(self, context: CRMContext):
+        self.context = context
+
+
+@dataclass(frozen=True)
+class StreamEvent:
+    """
+    One event of a streamed agent turn.
+
+    ``kind`` is one of:
+
+    - ``"text"``: a piece of the answer (``text``),
+    - ``"preamble"``: text the model wrote alongside tool calls, before it had
+      their results; not part of the answer,
+    - ``"tool_start"``: a tool call is about to run (``tool``, ``args``, ``call_id``),
+    - ``"tool_end"``: a tool call finished (``tool``, ``call_id`` and its result in ``text``),
+    - ``"answer"``: the turn is complete; ``text`` is the full answer.
+    """
+    kind: str
+    text: str = ""
+    tool: Optional[str] = None
+    args: Optional[Dict[str, Any]] = None
+    call_id: Optional[str] = None
+
+
+def _graph_events(mode: str, chunk: Any) -> List[StreamEvent]:
+    """Translate one ``messages``/``updates`` item of the agent graph's stream into events."""
+    events = []
+    if mode == "messages":
+        message, metadata = chunk
+        # Streaming models emit AIMessageChunks; others emit the whole AIMessage once
+        if isinstance(message, AIMessage) and metadata.get("langgraph_node") == "model" and message.text:
+            calls = message.tool_calls or getattr(message, "tool_call_chunks", None)
+            events.append(StreamEvent("preamble" if calls else "text", text=str(message.text)))
+    elif mode == "updates":
+        for node, update in chunk.items():
+            if not isinstance(update, dict):
+                continue
+            for message in update.get("messages") or ():
+                if node == "model" and isinstance(message, AIMessage):
+                    events.extend(StreamEvent("tool_start", tool=call["name"], args=call["args"], call_id=call["id"])
+                                  for call in message.tool_calls)
+                elif isinstance(message, ToolMessage):
+                    events.append(StreamEvent("tool_end", text=str(message.content), tool=message.name,
+                                              call_id=message.tool_call_id))
+    return events
 
 
 class CRMCaseAgent:
-    def __init__(self, dataverse_client, model: str = "gpt-4o", api_key: Optional[str] = None):
+    def __init__(self, dataverse_client, model="gpt-4o", api_key: Optional[str] = None,
+                 case_cache: Optional[CaseCache] = None, use_cache: bool = True,
+                 load_option_sets: bool = False, customer_index: Optional[CustomerIndex] = None,
+                 case_replica: Optional[CaseReplica] = None, output_format: Optional[CaseOutputFormat] = None,
+                 memory: Optional[ConversationMemory] = None, use_gateway: bool = True,
+                 tracer: Optional[Tracer] = None, router: Optional[FastPathRouter] = None,
+                 response_cache: Optional[ResponseCache] = None, max_tool_concurrency: int = 8):
+        # Every Dataverse call goes through the throttling-aware gateway (AIMD concurrency, Retry-After, budgets)
+        if use_gateway and dataverse_client is not None and not isinstance(dataverse_client, DataverseGateway):
+            dataverse_client = DataverseGateway(dataverse_client)
         self.dataverse_client = dataverse_client
-        if api_key:
-            os.environ["OPENAI_API_KEY"] = api_key
+        # Shared across turns so hot customers are served from memory and only revalidated
+        self.case_cache = case_cache if case_cache is not None else (CaseCache() if use_cache else None)
+        # Full case records fetched on demand by get_case_details
+        self.detail_cache = TTLCache(maxsize=256, ttl=120.0)
+        # Aggregates are memoized briefly so repeated dashboard questions are free
+        self.stats_cache = TTLCache(maxsize=128, ttl=60.0)
+        # Bounded history for chat(): sliding window plus rolling summary
+        self.memory = memory if memory is not None else ConversationMemory()
+        # Compact, token-budgeted rendering of case lists in tool results
+        self.case_output = output_format if output_format is not None else CaseOutputFormat()
+        # Open result streams parked between "next page" tool calls
+        self.case_cursors = CaseCursorStore()
+        # Option-set labels are loaded once up front rather than per tool call
+        self.case_decoder = None
+        if load_option_sets:
+            try:
+                self.case_decoder = CaseDecoder.from_dataverse(dataverse_client)
+            except Exception as e:
+                print(f"[WARNING] Failed to load option-set metadata, using built-in maps: {e}")
+        # Name -> GUID resolution happens locally; warm the index before the first request
+        self.customer_index = customer_index
+        if customer_index is not None and not customer_index.is_warm:
+            customer_index.warm(dataverse_client)
+        # Local incident replica answers case lookups once it has completed a sync
+        self.case_replica = case_replica
+        if case_replica is not None and not case_replica.is_ready:
+            case_replica.sync(dataverse_client)
+        # Spans for runs, model calls, tools and Dataverse pages; the process default tracer if None
+        self.tracer = tracer
+        # Plain "cases for X" questions are answered by a direct tool call, without the model
+        self.router = router
+        # Repeated questions are answered from here while the case data version is unchanged
+        self.response_cache = response_cache
+        self._data_versions = TTLCache(maxsize=1, ttl=5.0)
+        # Tool calls the model issues in one step run in parallel, at most this many at a time
+        self.max_tool_concurrency = max_tool_concurrency
+        # The graph and model client are built on first use, or ahead of it by prewarm()
+        self.model = model
+        self._api_key = api_key
+        self._agent = None
+        self._agent_lock = threading.Lock()
+
+    @property
+    def agent(self):
+        """The compiled agent graph, built on first access."""
+        if self._agent is None:
+            with self._agent_lock:
+                if self._agent is None:
+                    self._agent = self._build_agent()
+        return self._agent
 
-        self.agent = create_agent(
+    def _build_agent(self):
+        # langchain.agents pulls in LangGraph; importing it here keeps `import crm_case_agent` cheap
+        from langchain.agents import create_agent
+        from langchain.chat_models import init_chat_model
+
+        model = self.model
+        if isinstance(model, str):
+            # The key goes to this agent's model client only; the process environment is left alone
+            model = init_chat_model(model, api_key=self._api_key) if self._api_key else init_chat_model(model)
+        return create_agent(
             model,
-            tools=[retrieve_customer_cases],
+            tools=[retrieve_customer_cases, retrieve_cases_for_customers, get_case_details, get_case_statistics],
             context_schema=CRMContext,
-            system_prompt="You are a CRM assistant. Use the provided tools to look up customer cases."
+            system_prompt=(
+                "You are a CRM assistant. Use the provided tools to look up customer cases. "
+                "When a question needs several independent lookups, request all of those tool calls "
+                "in the same step; they run in parallel."
+            )
         )
 
-    def run(self, query: str, chat_history: List = None) -> str:
+    def prewarm(self) -> Dict[str, float]:
+        """
+        Build the model client and agent graph now instead of on the first
+        request, so first-request latency is predictable. Returns the seconds
+        spent (near zero if already built).
+        """
+        started = time.perf_counter()
+        self.agent
+        return {"agent_graph_s": round(time.perf_counter() - started, 4)}
+
+    def _context(self) -> CRMContext:
+        return CRMContext(
+            dataverse_client=self.dataverse_client,
+            case_cache=self.case_cache,
+            case_cursors=self.case_cursors,
+            case_decoder=self.case_decoder,
+            customer_index=self.customer_index,
+            case_replica=self.case_replica,
+            stats_cache=self.stats_cache,
+            case_output=self.case_output,
+            detail_cache=self.detail_cache,
+        )
+
+    def _tracer(self) -> Tracer:
+        return self.tracer if self.tracer is not None else get_tracer()
+
+    def _config(self, tracer: Tracer, span: Span) -> dict:
+        # LangGraph runs the tool calls of one step as parallel tasks; max_concurrency bounds its thread pool
+        config = {"max_concurrency": self.max_tool_concurrency}
+        # Model calls are only reachable through callbacks; none are attached while tracing is off
+        if tracer.enabled:
+            config["callbacks"] = [TracingCallbackHandler(tracer, span)]
+        return config
+
+    @staticmethod
+    def _messages(query: str, chat_history: Optional[List], memory: Optional[ConversationMemory]) -> List:
         messages = []
+        if memory is not None:
+            messages.extend(memory.messages())
         if chat_history:
             messages.extend(chat_history)
         messages.append(HumanMessage(content=query))
+        return messages
 
-        response = self.agent.invoke(
-            {"messages": messages},
-            context=CRMContext(dataverse_client=self.dataverse_client)
-        )
+    def _fast_path(self, query: str, memory: Optional[ConversationMemory]) -> Optional[str]:
+        """Answer a plain single-customer lookup with a direct tool call; None means use the agent."""
+        routed = self._fast_path_call(query, memory)
+        return routed[1] if routed is not None else None
+
+    def _fast_path_call(self, query: str, memory: Optional[ConversationMemory]) -> Optional[Tuple[FastPathMatch, str]]:
+        """The route and answer of a fast-path lookup, or None when the query needs the agent."""
+        if self.router is None:
+            return None
+        started = time.perf_counter()
+        route = self.router.match(query, self.customer_index)
+        if route is None:
+            self.router.record(False, time.perf_counter() - started)
+            return None
+        with span("crm.fast_path", pattern=route.pattern) as stage:
+            result = retrieve_customer_cases.func(customer_name=route.customer_name,
+                                                  runtime=_DirectRuntime(self._context()))
+            stage.set(payload_bytes=len(result.encode("utf-8")))
+        answer = fast_path_answer(result)
+        if answer is None:
+            # Errors, empty results, throttling and paged listings need the model to act on them
+            self.router.record(False, time.perf_counter() - started)
+            return None
+        result = answer
+        self.router.record(True, time.perf_counter() - started)
+        if memory is not None:
+            memory.add_turn([HumanMessage(content=query), AIMessage(content=result)])
+        return route, result
+
+    def _data_version(self):
+        """
+        A cheap marker that changes whenever a case is created, edited or deleted:
+        the replica watermark and row count when the replica is serving, else the
+        newest ``modifiedon`` in Dataverse plus the case count where a FetchXML
+        count is available (memoized for a few seconds). Without that count,
+        deletes in Dataverse do not change the marker.
+        """
+        replica = self.case_replica
+        if replica is not None and replica.is_ready:
+            # reconcile() deletions lower the count without touching the watermark
+            return ("replica", replica.watermark, len(replica))
+        version = self._data_versions.get("incident")
+        if version is None:
+            with span("crm.response_cache.probe"):
+                batches = self.dataverse_client.get(
+                    "incident", select=["modifiedon"], orderby=["modifiedon desc"], top=1
+                )
+                latest = next((record.get("modifiedon") for batch in batches for record in batch), None)
+                total = count_cases(self.dataverse_client)
+            version = ("dataverse", latest, total)
+            self._data_versions.set("incident", version)
+        return version
 
+    def _cached_answer(self, query: str, messages: List, memory: Optional[ConversationMemory]):
+        """Return ``(key, answer)``; ``answer`` is None unless a still-valid cached answer exists."""
+        if self.response_cache is None:
+            return None, None
+        try:
+            data_version = self._data_version()
+        except Exception:
+            # Without a data version a cached answer could be stale; answer normally and cache nothing
+            return None, None
+        # Changed data means a new key, so a hit can be served as is
+        key = self.response_cache.make_key(query, messages[:-1], ("crm", data_version))
+        entry = self.response_cache.get(key)
+        if entry is None:
+            return key, None
+        if memory is not None:
+            memory.add_turn([HumanMessage(content=query), AIMessage(content=entry.answer)])
+        return key, entry.answer
+
+    def _store_answer(self, key: Optional[str], turn: List) -> None:
+        """Cache the answer of a completed turn."""
+        if key is None or not turn or not isinstance(turn[-1].content, str) or not turn[-1].content:
+            return
+        results = {m.tool_call_id: m.content for m in turn if isinstance(m, ToolMessage)}
+        for message in turn:
+            for call in getattr(message, "tool_calls", None) or ():
+                result = str(results.get(call["id"], ""))
+                # Paged follow-ups and failed or throttled lookups are not worth repeating
+                if "continuation_token" in call["args"] or result.startswith("Error") or "throttling" in result:
+                    return
+        self.response_cache.set(key, turn[-1].content)
+
+    def _record_agent_run(self, started: float) -> None:
+        if self.router is not None:
+            self.router.record_agent_run(time.perf_counter() - started)
+
+    def run(self, query: str, chat_history: List = None, memory: Optional[ConversationMemory] = None,
+            on_token: Optional[Callable[[str], None]] = None) -> str:
+        """
+        Answer ``query``. Pass either a plain ``chat_history`` list (sent as is)
+        or a ``ConversationMemory``, which supplies bounded history and records
+        this turn, including its tool calls, afterwards. With ``on_token`` the
+        answer is streamed: it is called with each piece of text as the model
+        generates it, and the full answer is still returned.
+        """
+        if on_token is not None:
+            answer = ""
+            for event in self._stream_events(query, chat_history, memory):
+                if event.kind == "text":
+                    on_token(event.text)
+                elif event.kind == "answer":
+                    answer = event.text
+            return answer
+        result = self._fast_path(query, memory)
+        if result is not None:
+            return result
+        started = time.perf_counter()
+        messages = self._messages(query, chat_history, memory)
+        key, cached = self._cached_answer(query, messages, memory)
+        if cached is not None:
+            return cached
+        tracer = self._tracer()
+        with tracer.span("crm.run", history_messages=len(messages) - 1) as span:
+            response = self.agent.invoke({"messages": messages}, context=self._context(),
+                                         config=self._config(tracer, span))
+            span.set(messages=len(response["messages"]) - len(messages))
+        self._record_agent_run(started)
+        self._store_answer(key, response["messages"][len(messages):])
+
+        if memory is not None:
+            memory.add_turn(response["messages"][len(messages) - 1:])
         return response["messages"][-1].content
 
+    async def arun(self, query: str, chat_history: List = None, memory: Optional[ConversationMemory] = None) -> str:
+        """Async :meth:`run`; the model is awaited and tools run in the event loop's executor."""
+        if self.router is not None:
+            result = await asyncio.to_thread(self._fast_path, query, memory)
+            if result is not None:
+                return result
+        started = time.perf_counter()
+        messages = self._messages(query, chat_history, memory)
+        key, cached = None, None
+        if self.response_cache is not None:
+            key, cached = await asyncio.to_thread(self._cached_answer, query, messages, memory)
+            if cached is not None:
+                return cached
+        tracer = self._tracer()
+        with tracer.span("crm.arun", history_messages=len(messages) - 1) as span:
+            response = await self.agent.ainvoke({"messages": messages}, context=self._context(),
+                                                config=self._config(tracer, span))
+            span.set(messages=len(response["messages"]) - len(messages))
+        self._record_agent_run(started)
+        self._store_answer(key, response["messages"][len(messages):])
+
+        if memory is not None:
+            memory.add_turn(response["messages"][len(messages) - 1:])
+        return response["messages"][-1].content
+
+    def stream(self, query: str, chat_history: List = None, memory: Optional[ConversationMemory] = None,
+               events: bool = False) -> Iterator[Union[str, StreamEvent]]:
+        """
+        :meth:`run` that yields the model's answer text as it is generated.
+
+        With ``events=True`` it yields :class:`StreamEvent` objects instead,
+        including tool calls starting and finishing, text the model wrote
+        alongside its tool calls (``preamble``) and a final ``answer`` event.
+        Without it, only answer text is yielded.
+        """
+        for event in self._stream_events(query, chat_history, memory):
+            if events:
+                yield event
+            elif event.kind == "text":
+                yield event.text
+
+    def _stream_events(self, query: str, chat_history: Optional[List],
+                       memory: Optional[ConversationMemory]) -> Iterator[StreamEvent]:
+        """Yield the :class:`StreamEvent` objects of one turn, ending with ``answer``."""
+        fast = self._fast_path_events(query, memory)
+        if fast is not None:
+            yield from fast
+            return
+        messages = self._messages(query, chat_history, memory)
+        key, result = self._cached_answer(query, messages, memory)
+        if result is not None:
+            yield StreamEvent("text", text=result)
+            yield StreamEvent("answer", text=result)
+            return
+        started = time.perf_counter()
+        final = None
+        tracer = self._tracer()
+        with tracer.span("crm.stream", history_messages=len(messages) - 1) as span:
+            for mode, chunk in self.agent.stream(
+                {"messages": messages}, context=self._context(), stream_mode=["messages", "updates", "values"],
+                config=self._config(tracer, span),
+            ):
+                if mode == "values":
+                    final = chunk
+                    continue
+                for event in _graph_events(mode, chunk):
+                    if event.kind == "text" and "first_token_ms" not in span.attributes:
+                        span.set(first_token_ms=round((time.perf_counter() - started) * 1000, 1))
+                    yield event
+        self._record_agent_run(started)
+
+        if final is None:
+            return
+        self._store_answer(key, final["messages"][len(messages):])
+        if memory is not None:
+            memory.add_turn(final["messages"][len(messages) - 1:])
+        yield StreamEvent("answer", text=final["messages"][-1].content)
+
+    def _fast_path_events(self, query: str, memory: Optional[ConversationMemory]) -> Optional[List[StreamEvent]]:
+        """The events of a fast-path answer, or None when the query needs the agent."""
+        routed = self._fast_path_call(query, memory)
+        if routed is None:
+            return None
+        route, result = routed
+        args = {"customer_name": route.customer_name}
+        return [
+            StreamEvent("tool_start", tool=retrieve_customer_cases.name, args=args),
+            StreamEvent("tool_end", text=result, tool=retrieve_customer_cases.name),
+            StreamEvent("text", text=result),
+            StreamEvent("answer", text=result),
+        ]
+
+    async def astream(self, query: str, chat_history: List = None, memory: Optional[ConversationMemory] = None,
+                      events: bool = False) -> AsyncIterator[Union[str, StreamEvent]]:
+        """Async :meth:`stream`; ``events=True`` yields :class:`StreamEvent` objects."""
+        async for event in self._astream_events(query, chat_history, memory):
+            if events:
+                yield event
+            elif event.kind == "text":
+                yield event.text
+
+    async def _astream_events(self, query: str, chat_history: Optional[List],
+                              memory: Optional[ConversationMemory]) -> AsyncIterator[StreamEvent]:
+        """Async :meth:`_stream_events`."""
+        if self.router is not None:
+            fast = await asyncio.to_thread(self._fast_path_events, query, memory)
+            if fast is not None:
+                for event in fast:
+                    yield event
+                return
+        messages = self._messages(query, chat_history, memory)
+        key = None
+        if self.response_cache is not None:
+            key, cached = await asyncio.to_thread(self._cached_answer, query, messages, memory)
+            if cached is not None:
+                yield StreamEvent("text", text=cached)
+                yield StreamEvent("answer", text=cached)
+                return
+        started = time.perf_counter()
+        final = None
+        tracer = self._tracer()
+        with tracer.span("crm.astream", history_messages=len(messages) - 1) as span:
+            async for mode, chunk in self.agent.astream(
+                {"messages": messages}, context=self._context(), stream_mode=["messages", "updates", "values"],
+                config=self._config(tracer, span),
+            ):
+                if mode == "values":
+                    final = chunk
+                    continue
+                for event in _graph_events(mode, chunk):
+                    if event.kind == "text" and "first_token_ms" not in span.attributes:
+                        span.set(first_token_ms=round((time.perf_counter() - started) * 1000, 1))
+                    yield event
+        self._record_agent_run(started)
+
+        if final is None:
+            return
+        await asyncio.to_thread(self._store_answer, key, final["messages"][len(messages):])
+        if memory is not None:
+            memory.add_turn(final["messages"][len(messages) - 1:])
+        yield StreamEvent("answer", text=final["messages"][-1].content)
+
     def chat(self):
         print("CRM Agent (LangChain v1) Ready. Type 'exit' to quit.")
-        history: List = []
+        self.memory.clear()
         while True:
             user_input = input("\nYou: ").strip()
             if user_input.lower() in ['quit', 'exit']:
                 print("Goodbye!")
                 break
 
-            response_text = self.run(user_input, history)
-            print(f"\nAgent: {response_text}")
+            # Print the answer as it is generated, with tool activity on its own lines
+            print("\nAgent: ", end="", flush=True)
+            for event in self.stream(user_input, memory=self.memory, events=True):
+                if event.kind == "text":
+                    print(event.text, end="", flush=True)
+                elif event.kind == "tool_start":
+                    arguments = ", ".join(f"{name}={value!r}" for name, value in (event.args or {}).items())
+                    print(f"\n  [calling {event.tool}({arguments})]", flush=True)
+                elif event.kind == "tool_end":
+                    summary = next((line.strip() for line in event.text.splitlines() if line.strip()), "")
+                    print(f"  [{event.tool} done: {summary[:100]}]\n", end="", flush=True)
+            print()
+
+    def cache_stats(self) -> dict:
+        """Return hit/miss counters of the case cache (empty if caching is disabled)."""
+        return self.case_cache.stats() if self.case_cache is not None else {}
+
+    def gateway_stats(self) -> dict:
+        """Return request, retry and throttle counters of the Dataverse gateway (empty if not used)."""
+        return self.dataverse_client.stats() if isinstance(self.dataverse_client, DataverseGateway) else {}
+
+    def router_stats(self) -> dict:
+        """Return fast-path hit rate and estimated latency saved (empty if no router is set)."""
+        return self.router.stats() if self.router is not None else {}
 
-            history.append(HumanMessage(content=user_input))
-            history.append(AIMessage(content=response_text))
+    def response_cache_stats(self) -> dict:
+        """Return hit, miss and stale counters of the response cache (empty if not used)."""
+        return self.response_cache.stats() if self.response_cache is not None else {}
 
+    def output_stats(self) -> dict:
+        """Return token usage counters of rendered case lists, for tuning the token budget."""
+        return self.case_output.stats()
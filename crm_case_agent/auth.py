@@ -0,0 +1,185 @@
+"""
+Shared access-token cache for Dataverse authentication.
+
+:class:`SharedTokenCredential` wraps any Azure Identity ``TokenCredential``
+(e.g. ``InteractiveBrowserCredential``). Tokens are cached per scope and
+refreshed on a background thread well before they expire, so a Dataverse
+request never waits on an auth round trip once a scope has been fetched.
+One instance can be shared by every ``DataverseClient``, thread and session
+in the process.
+"""
+
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from azure.core.credentials import AccessToken
+
+TokenKey = Tuple[Tuple[str, ...], Optional[str]]
+
+
+class SharedTokenCredential:
+    """
+    Thread-safe, proactively refreshed token cache around ``credential``.
+
+    Args:
+        credential: The wrapped Azure Identity credential.
+        refresh_margin: Refresh a token once it has less than this many seconds left.
+        min_validity: Tokens with less than this left are never handed out; the
+            caller fetches synchronously instead (only if background refresh failed).
+        background_refresh: Start the refresh thread on the first cached token.
+        clock: Wall-clock source (``expires_on`` is a Unix timestamp).
+    """
+
+    def __init__(
+        self,
+        credential,
+        refresh_margin: float = 300.0,
+        min_validity: float = 30.0,
+        background_refresh: bool = True,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.credential = credential
+        self.refresh_margin = refresh_margin
+        self.min_validity = min_validity
+        self.background_refresh = background_refresh
+        self._clock = clock
+        self._tokens: Dict[TokenKey, AccessToken] = {}
+        self._key_locks: Dict[TokenKey, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._stop_refresh = threading.Event()
+        self._wake = threading.Event()
+        self.cache_hits = 0
+        self.blocking_fetches = 0
+        self.background_refreshes = 0
+        self.refresh_failures = 0
+        self.refresh_seconds_total = 0.0
+        self.refresh_seconds_max = 0.0
+        self.last_refresh_seconds: Optional[float] = None
+
+    def get_token(self, *scopes: str, claims: Optional[str] = None, tenant_id: Optional[str] = None,
+                  **kwargs: Any) -> AccessToken:
+        """``TokenCredential.get_token``; served from the cache whenever a valid token exists."""
+        if claims or kwargs:
+            # Claims challenges (CAE) and extra options always need a fresh token
+            return self.credential.get_token(*scopes, claims=claims, tenant_id=tenant_id, **kwargs)
+
+        key = (tuple(scopes), tenant_id)
+        token = self._tokens.get(key)
+        if token is not None and token.expires_on - self._clock() > self.min_validity:
+            self.cache_hits += 1
+            return token
+
+        with self._key_lock(key):
+            # Another thread may have fetched it while we waited
+            token = self._tokens.get(key)
+            if token is not None and token.expires_on - self._clock() > self.min_validity:
+                self.cache_hits += 1
+                return token
+            token = self._fetch(key)
+            self.blocking_fetches += 1
+
+        if self.background_refresh:
+            self.start_background_refresh()
+        self._wake.set()
+        return token
+
+    def prefetch(self, *scopes: str, tenant_id: Optional[str] = None) -> AccessToken:
+        """Fetch and cache a token up front (e.g. at startup, before the first request)."""
+        return self.get_token(*scopes, tenant_id=tenant_id)
+
+    def _key_lock(self, key: TokenKey) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _fetch(self, key: TokenKey) -> AccessToken:
+        scopes, tenant_id = key
+        started = time.perf_counter()
+        token = self.credential.get_token(*scopes, tenant_id=tenant_id) if tenant_id else self.credential.get_token(*scopes)
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self._tokens[key] = token
+            self.last_refresh_seconds = elapsed
+            self.refresh_seconds_total += elapsed
+            self.refresh_seconds_max = max(self.refresh_seconds_max, elapsed)
+        return token
+
+    def _next_refresh_in(self) -> float:
+        with self._lock:
+            expiries = [token.expires_on for token in self._tokens.values()]
+        if not expiries:
+            return 60.0
+        return max(min(expiries) - self.refresh_margin - self._clock(), 0.0)
+
+    def refresh_due(self) -> int:
+        """Refresh every cached token inside the refresh margin. Returns tokens refreshed."""
+        now = self._clock()
+        with self._lock:
+            due = [key for key, token in self._tokens.items() if token.expires_on - now <= self.refresh_margin]
+        refreshed = 0
+        for key in due:
+            with self._key_lock(key):
+                token = self._tokens.get(key)
+                if token is not None and token.expires_on - self._clock() > self.refresh_margin:
+                    continue
+                try:
+                    self._fetch(key)
+                    self.background_refreshes += 1
+                    refreshed += 1
+                except Exception as e:
+                    self.refresh_failures += 1
+                    print(f"[WARNING] Background token refresh failed for {key[0]}: {e}")
+        return refreshed
+
+    def start_background_refresh(self) -> threading.Thread:
+        """Refresh tokens shortly before they enter the refresh margin, on a daemon thread."""
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return self._refresh_thread
+
+            def loop():
+                while not self._stop_refresh.is_set():
+                    self._wake.wait(self._next_refresh_in())
+                    self._wake.clear()
+                    if self._stop_refresh.is_set():
+                        break
+                    if self.refresh_due() == 0 and self.refresh_failures:
+                        # Back off briefly instead of spinning on a failing credential
+                        self._stop_refresh.wait(5.0)
+
+            self._stop_refresh.clear()
+            self._refresh_thread = threading.Thread(target=loop, name="token-refresh", daemon=True)
+            self._refresh_thread.start()
+            return self._refresh_thread
+
+    def stop_background_refresh(self) -> None:
+        self._stop_refresh.set()
+        self._wake.set()
+
+    def close(self) -> None:
+        self.stop_background_refresh()
+        close = getattr(self.credential, "close", None)
+        if close is not None:
+            close()
+
+    def __enter__(self) -> "SharedTokenCredential":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache and refresh-latency counters."""
+        with self._lock:
+            fetches = self.blocking_fetches + self.background_refreshes
+            return {
+                "scopes": len(self._tokens),
+                "cache_hits": self.cache_hits,
+                "blocking_fetches": self.blocking_fetches,
+                "background_refreshes": self.background_refreshes,
+                "refresh_failures": self.refresh_failures,
+                "last_refresh_ms": round(self.last_refresh_seconds * 1000, 1) if self.last_refresh_seconds is not None else None,
+                "avg_refresh_ms": round(self.refresh_seconds_total / fetches * 1000, 1) if fetches else None,
+                "max_refresh_ms": round(self.refresh_seconds_max * 1000, 1),
+            }
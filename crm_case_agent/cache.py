@@ -0,0 +1,303 @@
+"""
+Caching helpers for Dataverse case lookups.
+
+Provides a small thread-safe TTL/LRU cache and a case-specific layer on top of
+it that revalidates cached results with a cheap ``modifiedon`` delta query
+instead of re-pulling every record.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+
+class TTLCache:
+    """
+    Bounded mapping with per-entry time-to-live and least-recently-used eviction.
+
+    Safe to share across threads. Hit/miss/eviction counters are exposed via
+    :meth:`stats` so the cache can be sized against real traffic.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for ``key`` or ``default`` if missing/expired."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return default
+            expires_at, value = item
+            if expires_at <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        """Store ``value`` under ``key``, evicting the least recently used entry if full."""
+        with self._lock:
+            expires_at = self._clock() + (self.ttl if ttl is None else ttl)
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove ``key`` and return its value (without touching the counters)."""
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[1]
+
+    def pop_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Remove every entry whose key satisfies ``predicate`` and return how many were removed."""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+            for key in keys:
+                del self._data[key]
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and item[0] > self._clock()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return a snapshot of the cache counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+def normalize_customer_name(name: str) -> str:
+    """Normalize a customer name for use in cache keys (case and whitespace insensitive)."""
+    return " ".join(str(name).split()).casefold()
+
+
+@dataclass
+class CaseCacheEntry:
+    """Cached case records for one customer/query shape."""
+    records: List[Dict[str, Any]]
+    last_seen: Optional[str]
+    validated_at: float
+    ids: Dict[str, int] = field(default_factory=dict)
+    # False when only a prefix of the result was read (e.g. the first page of a paged listing)
+    complete: bool = True
+
+
+class CaseCache:
+    """
+    TTL/LRU cache for ``get_customer_cases`` results.
+
+    Entries are keyed by the normalized customer name plus the query shape
+    (selected columns, ``top`` and any extra filter). On a hit older than
+    ``revalidate_after`` seconds the caller issues a ``modifiedon ge <last_seen>``
+    delta query and merges the changed records into the entry via :meth:`merge`,
+    so hot customers cost one tiny response instead of a full re-pull.
+
+    Deletions are not detected by the delta query; ``ttl`` bounds how long
+    they can stay hidden. Records that stop matching a structured filter are
+    dropped on merge when the caller passes ``keep``.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 256,
+        ttl: float = 300.0,
+        revalidate_after: float = 5.0,
+        max_entry_records: int = 5000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl, clock=clock)
+        self._clock = clock
+        self._lock = threading.RLock()
+        self.revalidate_after = revalidate_after
+        self.max_entry_records = max_entry_records
+        self.revalidations = 0
+        self.revalidated_records = 0
+        self.refetches = 0
+
+    @staticmethod
+    def make_key(customer_name: str, **shape: Any) -> Tuple:
+        """Build a cache key from the customer name and the query shape."""
+        frozen = tuple(
+            (k, tuple(v) if isinstance(v, (list, tuple)) else v)
+            for k, v in sorted(shape.items())
+        )
+        return (normalize_customer_name(customer_name),) + frozen
+
+    def lookup(self, key: Tuple) -> Optional[CaseCacheEntry]:
+        """Return the entry for ``key`` (counted as a hit) or None (counted as a miss)."""
+        return self._entries.get(key)
+
+    def needs_revalidation(self, entry: CaseCacheEntry) -> bool:
+        return self._clock() - entry.validated_at >= self.revalidate_after
+
+    def snapshot(self, entry: CaseCacheEntry) -> List[Dict[str, Any]]:
+        """Return a copy of the entry's records that is safe to hand to callers."""
+        with self._lock:
+            return list(entry.records)
+
+    def store(self, key: Tuple, records: List[Dict[str, Any]], complete: bool = True) -> Optional[CaseCacheEntry]:
+        """
+        Store a result set, unless it is too large to be worth caching, and
+        return the new entry.
+
+        ``complete=False`` marks ``records`` as only the leading part of the
+        result; callers serve it and query for the remainder, and may grow it
+        with :meth:`extend` as they read on.
+        """
+        if len(records) > self.max_entry_records:
+            return None
+        records = list(records)
+        entry = CaseCacheEntry(
+            records=records,
+            last_seen=_max_modifiedon(records),
+            validated_at=self._clock(),
+            ids={r["incidentid"]: i for i, r in enumerate(records) if r.get("incidentid")},
+            complete=complete,
+        )
+        self._entries.set(key, entry)
+        return entry
+
+    def extend(self, entry: CaseCacheEntry, records: List[Dict[str, Any]]) -> bool:
+        """
+        Append the next records of a partial entry's result in place.
+
+        Returns False, leaving the entry as it is, once it would grow past
+        ``max_entry_records``. Records already in the entry (e.g. merged by a
+        revalidation meanwhile) are skipped.
+        """
+        with self._lock:
+            if len(entry.records) + len(records) > self.max_entry_records:
+                return False
+            for record in records:
+                record_id = record.get("incidentid")
+                if record_id in entry.ids:
+                    continue
+                if record_id:
+                    entry.ids[record_id] = len(entry.records)
+                entry.records.append(record)
+            latest = _max_modifiedon(records)
+            if latest and (entry.last_seen is None or latest > entry.last_seen):
+                entry.last_seen = latest
+            return True
+
+    def merge(
+        self,
+        key: Tuple,
+        entry: CaseCacheEntry,
+        changed: List[Dict[str, Any]],
+        top: Optional[int] = None,
+        keep: Optional[Callable[[Dict[str, Any]], bool]] = None,
+        order: Optional[Callable[[List[Dict[str, Any]]], Any]] = None,
+    ) -> bool:
+        """
+        Merge delta-query results into ``entry``.
+
+        ``keep`` re-applies the entry's filter to changed records: those that no
+        longer match are removed instead of merged. ``order`` re-sorts the
+        records in place afterwards for ordered queries.
+
+        Returns False when the entry can no longer be trusted (new records would
+        push a ``top``-limited result past its limit, or records dropped out of
+        one), in which case the entry is dropped and the caller should refetch.
+        A partial entry is treated as limited to the records it holds, since a
+        new record may belong after the cached prefix.
+        """
+        if not entry.complete:
+            top = len(entry.records)
+        with self._lock:
+            self.revalidations += 1
+            # Without an id a changed record cannot be matched to the one it replaces
+            changed = [r for r in changed if r.get("incidentid")]
+            if keep is not None:
+                dropped = {r.get("incidentid") for r in changed if not keep(r)}
+                changed = [r for r in changed if r.get("incidentid") not in dropped]
+                dropped &= entry.ids.keys()
+            else:
+                dropped = set()
+            new_records = [r for r in changed if r.get("incidentid") not in entry.ids]
+            if top is not None and (dropped or (new_records and len(entry.records) + len(new_records) > top)):
+                self._entries.pop(key)
+                self.refetches += 1
+                return False
+
+            if dropped:
+                entry.records[:] = [r for r in entry.records if r.get("incidentid") not in dropped]
+                entry.ids = {r["incidentid"]: i for i, r in enumerate(entry.records) if r.get("incidentid")}
+                self.revalidated_records += len(dropped)
+            for record in changed:
+                record_id = record.get("incidentid")
+                index = entry.ids.get(record_id)
+                if index is None:
+                    entry.ids[record_id] = len(entry.records)
+                    entry.records.append(record)
+                    self.revalidated_records += 1
+                elif entry.records[index].get("modifiedon") != record.get("modifiedon"):
+                    entry.records[index] = record
+                    self.revalidated_records += 1
+
+            if order is not None:
+                order(entry.records)
+                entry.ids = {r["incidentid"]: i for i, r in enumerate(entry.records) if r.get("incidentid")}
+            entry.last_seen = _max_modifiedon(entry.records) or entry.last_seen
+            entry.validated_at = self._clock()
+            return True
+
+    def invalidate(self, customer_name: Optional[str] = None) -> None:
+        """Drop entries for one customer, or everything when no name is given."""
+        if customer_name is None:
+            self._entries.clear()
+            return
+        normalized = normalize_customer_name(customer_name)
+        self._entries.pop_where(lambda key: key[0] == normalized)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss and revalidation counters."""
+        stats = self._entries.stats()
+        stats.update({
+            "revalidations": self.revalidations,
+            "revalidated_records": self.revalidated_records,
+            "refetches": self.refetches,
+        })
+        return stats
+
+
+def _max_modifiedon(records: List[Dict[str, Any]]) -> Optional[str]:
+    # Dataverse returns ISO-8601 UTC timestamps, which sort lexicographically.
+    values = [r.get("modifiedon") for r in records if r.get("modifiedon")]
+    return max(values) if values else None
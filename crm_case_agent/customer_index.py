@@ -0,0 +1,219 @@
+"""
+In-process index of account and contact names.
+
+Resolves customer names to ``_customerid_value`` GUIDs locally so incident
+queries can filter on the indexed lookup column instead of comparing strings
+across two expanded navigation properties. Supports exact, prefix and trigram
+(fuzzy) lookup and is refreshed incrementally with a ``modifiedon`` watermark.
+"""
+
+import bisect
+import threading
+from collections import defaultdict
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Set, Tuple
+
+from .cache import normalize_customer_name
+
+# (table, id column, name column) for each customer type behind incident.customerid
+CUSTOMER_TABLES = (
+    ("account", "accountid", "name"),
+    ("contact", "contactid", "fullname"),
+)
+
+
+@dataclass(frozen=True)
+class CustomerMatch:
+    """A customer record matched by the index."""
+    customer_id: str
+    name: str
+    kind: str
+    score: float
+
+
+def _trigrams(normalized: str) -> Set[str]:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class CustomerIndex:
+    """
+    Thread-safe name -> customer GUID index with exact, prefix and trigram lookup.
+
+    Call :meth:`warm` once at startup, then :meth:`refresh` (or
+    :meth:`start_background_refresh`) to pick up new and renamed customers.
+    Deleted customers are not detected and simply resolve to no cases.
+    """
+
+    def __init__(self, page_size: int = 5000):
+        self.page_size = page_size
+        self._lock = threading.RLock()
+        self._slots: Dict[str, int] = {}
+        self._records: List[Optional[Tuple[str, str, str, str, int]]] = []  # (id, name, normalized, kind, trigram count)
+        self._exact: Dict[str, Set[int]] = defaultdict(set)
+        self._trigram_postings: Dict[str, Set[int]] = defaultdict(set)
+        self._sorted_names: List[str] = []
+        self._sorted_dirty = False
+        self._watermarks: Dict[str, Optional[str]] = {table: None for table, _, _ in CUSTOMER_TABLES}
+        self._refresh_thread: Optional[threading.Thread] = None
+        self._stop_refresh = threading.Event()
+        self.is_warm = False
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def add(self, customer_id: str, name: str, kind: str) -> None:
+        """Insert or rename a customer."""
+        normalized = normalize_customer_name(name or "")
+        with self._lock:
+            slot = self._slots.get(customer_id)
+            if slot is not None:
+                old = self._records[slot]
+                if old[2] == normalized:
+                    self._records[slot] = (customer_id, name, normalized, kind, old[4])
+                    return
+                self._unlink(slot, old[2])
+            else:
+                slot = len(self._records)
+                self._slots[customer_id] = slot
+                self._records.append(None)
+
+            grams = _trigrams(normalized) if normalized else set()
+            self._records[slot] = (customer_id, name, normalized, kind, len(grams))
+            if normalized:
+                self._exact[normalized].add(slot)
+                for gram in grams:
+                    self._trigram_postings[gram].add(slot)
+                self._sorted_dirty = True
+
+    def _unlink(self, slot: int, normalized: str) -> None:
+        self._exact[normalized].discard(slot)
+        if not self._exact[normalized]:
+            del self._exact[normalized]
+        for gram in _trigrams(normalized):
+            postings = self._trigram_postings.get(gram)
+            if postings is not None:
+                postings.discard(slot)
+        self._sorted_dirty = True
+
+    def warm(self, client) -> int:
+        """Load every account and contact name. Returns the number of customers indexed."""
+        loaded = self._load(client, incremental=False)
+        self.is_warm = True
+        return loaded
+
+    def refresh(self, client) -> int:
+        """Pick up customers created or renamed since the last load. Returns rows applied."""
+        return self._load(client, incremental=True)
+
+    def _load(self, client, incremental: bool) -> int:
+        applied = 0
+        for table, id_column, name_column in CUSTOMER_TABLES:
+            watermark = self._watermarks[table]
+            filter = f"modifiedon ge {watermark}" if incremental and watermark else None
+            latest = watermark
+            batches = client.get(
+                table,
+                select=[id_column, name_column, "modifiedon"],
+                filter=filter,
+                page_size=self.page_size,
+            )
+            for batch in batches:
+                for row in batch:
+                    customer_id = row.get(id_column)
+                    if not customer_id:
+                        continue
+                    self.add(customer_id, row.get(name_column) or "", table)
+                    applied += 1
+                    modified = row.get("modifiedon")
+                    if modified and (latest is None or modified > latest):
+                        latest = modified
+            self._watermarks[table] = latest
+        return applied
+
+    def start_background_refresh(self, client, interval: float = 300.0) -> threading.Thread:
+        """Refresh the index every ``interval`` seconds on a daemon thread."""
+        def loop():
+            while not self._stop_refresh.wait(interval):
+                try:
+                    self.refresh(client)
+                except Exception as e:
+                    print(f"[WARNING] Customer index refresh failed: {e}")
+
+        self._stop_refresh.clear()
+        self._refresh_thread = threading.Thread(target=loop, name="customer-index-refresh", daemon=True)
+        self._refresh_thread.start()
+        return self._refresh_thread
+
+    def stop_background_refresh(self) -> None:
+        self._stop_refresh.set()
+
+    def exact(self, name: str) -> List[CustomerMatch]:
+        """Customers whose normalized name equals ``name``."""
+        normalized = normalize_customer_name(name)
+        with self._lock:
+            return [self._match(slot, 1.0) for slot in sorted(self._exact.get(normalized, ()))]
+
+    def prefix(self, name: str, limit: int = 10) -> List[CustomerMatch]:
+        """Customers whose normalized name starts with ``name``."""
+        normalized = normalize_customer_name(name)
+        if not normalized:
+            return []
+        with self._lock:
+            if self._sorted_dirty:
+                self._sorted_names = sorted(self._exact)
+                self._sorted_dirty = False
+            matches = []
+            names = self._sorted_names
+            for position in range(bisect.bisect_left(names, normalized), len(names)):
+                candidate = names[position]
+                if not candidate.startswith(normalized) or len(matches) >= limit:
+                    break
+                score = len(normalized) / len(candidate)
+                matches.extend(self._match(slot, score) for slot in sorted(self._exact[candidate]))
+            return matches[:limit]
+
+    def fuzzy(self, name: str, limit: int = 5, min_score: float = 0.3) -> List[CustomerMatch]:
+        """Customers ranked by trigram similarity (Jaccard) to ``name``."""
+        normalized = normalize_customer_name(name)
+        if not normalized:
+            return []
+        grams = _trigrams(normalized)
+        with self._lock:
+            overlap: Dict[int, int] = defaultdict(int)
+            for gram in grams:
+                for slot in self._trigram_postings.get(gram, ()):
+                    overlap[slot] += 1
+            scored = []
+            for slot, common in overlap.items():
+                score = common / (len(grams) + self._records[slot][4] - common)
+                if score >= min_score:
+                    scored.append((score, slot))
+            scored.sort(key=lambda item: (-item[0], self._records[item[1]][2]))
+            return [self._match(slot, round(score, 3)) for score, slot in scored[:limit]]
+
+    def resolve(self, name: str, min_score: float = 0.6, margin: float = 0.1) -> List[CustomerMatch]:
+        """
+        Resolve a customer name to its indexed records.
+
+        Returns all exact matches (an account and a contact may share a name),
+        otherwise the best fuzzy match if it scores at least ``min_score`` and
+        beats the runner-up by ``margin``. Returns an empty list when the name
+        is unknown or ambiguous.
+        """
+        matches = self.exact(name)
+        if matches:
+            return matches
+        candidates = self.fuzzy(name, limit=5, min_score=min_score)
+        if not candidates:
+            return []
+        best = candidates[0]
+        best_name = normalize_customer_name(best.name)
+        runner_up = next((c for c in candidates[1:] if normalize_customer_name(c.name) != best_name), None)
+        if runner_up is not None and best.score - runner_up.score < margin:
+            return []
+        return [replace(match, score=best.score) for match in self.exact(best.name)]
+
+    def _match(self, slot: int, score: float) -> CustomerMatch:
+        customer_id, name, _, kind, _ = self._records[slot]
+        return CustomerMatch(customer_id=customer_id, name=name, kind=kind, score=score)
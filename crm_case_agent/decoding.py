@@ -0,0 +1,229 @@
+"""
+Table-driven option-set decoding for case (incident) records.
+
+Decodes a whole page of raw Dataverse records at once into column arrays,
+using lookup tables precomputed from the option-set maps so the hot path is a
+dict lookup per cell instead of ``int()`` conversions inside try/except.
+"""
+
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from .utility import get_customer_name_from_case
+
+FORMATTED_VALUE = "@OData.Community.Display.V1.FormattedValue"
+_PRIORITY_FORMATTED = "prioritycode" + FORMATTED_VALUE
+_STATE_FORMATTED = "statecode" + FORMATTED_VALUE
+_REASON_FORMATTED = "statuscode" + FORMATTED_VALUE
+
+# Maps for option set fields (fallback when Dataverse doesn't return formatted annotations)
+PRIORITY_MAP = {
+    1: "High",
+    2: "Normal",
+    3: "Low",
+}
+
+# Common status (state) mappings for the Case (incident) entity
+# Renamed from STATE_MAP to STATUS_MAP to reflect 'status' (statecode) terminology
+STATUS_MAP = {
+    0: "Active",
+    1: "Resolved",
+    2: "Cancelled",
+}
+
+# Status reason (statuscode) mappings grouped under the above statuses
+STATUS_REASON_MAP = {
+    # Active reasons
+    1: "In Progress",
+    2: "On Hold",
+    3: "Waiting for Details",
+    4: "Researching",
+    # Resolved reasons
+    5: "Problem Solved",
+    1000: "Information Provided",
+    # Cancelled reasons
+    6: "Cancelled",
+    2000: "Merged",
+}
+
+# Status reason (statuscode) -> status (statecode) derivation
+STATUS_REASON_STATE_MAP = {
+    1: 0, 2: 0, 3: 0, 4: 0,
+    5: 1, 1000: 1,
+    6: 2, 2000: 2,
+}
+
+DECODED_COLUMNS = (
+    "customer", "title", "ticket_number", "priority", "status",
+    "status_reason", "createdon", "description",
+)
+
+_OPTION_SET_ATTRIBUTES = ("prioritycode", "statecode", "statuscode")
+
+
+def _build_table(labels: Mapping[int, str]) -> Dict[Any, str]:
+    """Index labels by the int and string forms a raw option value may arrive in."""
+    table: Dict[Any, str] = {}
+    for code, label in labels.items():
+        table[code] = label
+        table[str(code)] = label
+    return table
+
+
+def _to_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class CaseDecoder:
+    """
+    Decodes raw case records into display values.
+
+    Formatted-value annotations returned by Dataverse win; otherwise codes are
+    resolved through precomputed tables keyed by both the int and string form
+    of each code. Status (statecode) falls back to a derivation from the status
+    reason when it is not present on the record.
+    """
+
+    def __init__(
+        self,
+        priority_labels: Mapping[int, str] = PRIORITY_MAP,
+        status_labels: Mapping[int, str] = STATUS_MAP,
+        status_reason_labels: Mapping[int, str] = STATUS_REASON_MAP,
+        status_reason_states: Mapping[int, int] = STATUS_REASON_STATE_MAP,
+    ):
+        self.priority_labels = dict(priority_labels)
+        self.status_labels = dict(status_labels)
+        self.status_reason_labels = dict(status_reason_labels)
+        self.status_reason_states = dict(status_reason_states)
+
+        self._priority = _build_table(self.priority_labels)
+        self._status = _build_table(self.status_labels)
+        self._status_reason = _build_table(self.status_reason_labels)
+        # statuscode -> status label; codes without a known state keep the legacy
+        # behaviour of being looked up directly in the status map
+        derived = dict(self.status_labels)
+        derived.update({
+            reason: self.status_labels[state]
+            for reason, state in self.status_reason_states.items()
+            if state in self.status_labels
+        })
+        self._derived_status = _build_table(derived)
+
+    @classmethod
+    def from_dataverse(cls, client, language_code: Optional[int] = 1033) -> "CaseDecoder":
+        """
+        Build a decoder from the org's option-set labels.
+
+        Labels are read from the ``stringmap`` table in a single query, so this
+        is meant to be called once at startup. Options missing from the org
+        fall back to the built-in maps; the statuscode -> statecode derivation
+        keeps the built-in table since ``stringmap`` does not carry it.
+        """
+        attribute_filter = " or ".join(f"attributename eq '{name}'" for name in _OPTION_SET_ATTRIBUTES)
+        filter = f"objecttypecode eq 'incident' and ({attribute_filter})"
+        if language_code is not None:
+            filter += f" and langid eq {int(language_code)}"
+
+        labels: Dict[str, Dict[int, str]] = {name: {} for name in _OPTION_SET_ATTRIBUTES}
+        for batch in client.get("stringmap", select=["attributename", "attributevalue", "value"], filter=filter):
+            for row in batch:
+                code = _to_int(row.get("attributevalue"))
+                if code is not None and row.get("attributename") in labels and row.get("value"):
+                    labels[row["attributename"]][code] = row["value"]
+
+        return cls(
+            priority_labels={**PRIORITY_MAP, **labels["prioritycode"]},
+            status_labels={**STATUS_MAP, **labels["statecode"]},
+            status_reason_labels={**STATUS_REASON_MAP, **labels["statuscode"]},
+        )
+
+    def decode_page(self, records: Iterable[Mapping[str, Any]]) -> Dict[str, List[Any]]:
+        """Decode a page of raw records into column arrays keyed by ``DECODED_COLUMNS``."""
+        records = records if isinstance(records, list) else list(records)
+        priority_table = self._priority
+        reason_table = self._status_reason
+        status_table = self._status
+        derived_table = self._derived_status
+
+        raw_priority = [r.get("prioritycode") for r in records]
+        raw_reason = [r.get("statuscode") for r in records]
+
+        return {
+            "customer": [get_customer_name_from_case(r) for r in records],
+            "title": [r.get("title", "N/A") for r in records],
+            "ticket_number": [r.get("ticketnumber", "N/A") for r in records],
+            "priority": [
+                r.get(_PRIORITY_FORMATTED)
+                or (priority_table[raw] if raw in priority_table else self._slow_priority(raw))
+                for r, raw in zip(records, raw_priority)
+            ],
+            "status": [
+                r.get(_STATE_FORMATTED) or status_table.get(r.get("statecode")) or derived_table.get(reason) or "N/A"
+                for r, reason in zip(records, raw_reason)
+            ],
+            "status_reason": [
+                r.get(_REASON_FORMATTED) or reason_table.get(reason) or "N/A"
+                for r, reason in zip(records, raw_reason)
+            ],
+            "createdon": [r.get("createdon") for r in records],
+            "description": [r.get("description", "N/A") for r in records],
+        }
+
+    def decode(self, records: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+        """Decode a page of raw records into one display dict per case (single pass)."""
+        priority_table = self._priority
+        reason_table = self._status_reason
+        status_table = self._status
+        derived_table = self._derived_status
+
+        decoded = []
+        append = decoded.append
+        for r in records:
+            get = r.get
+            raw_priority = get("prioritycode")
+            raw_reason = get("statuscode")
+            append({
+                "customer": get_customer_name_from_case(r),
+                "title": get("title", "N/A"),
+                "ticket_number": get("ticketnumber", "N/A"),
+                "priority": get(_PRIORITY_FORMATTED) or (
+                    priority_table[raw_priority] if raw_priority in priority_table else self._slow_priority(raw_priority)
+                ),
+                "status": get(_STATE_FORMATTED) or status_table.get(get("statecode")) or derived_table.get(raw_reason) or "N/A",
+                "status_reason": get(_REASON_FORMATTED) or reason_table.get(raw_reason) or "N/A",
+                "createdon": get("createdon"),
+                "description": get("description", "N/A"),
+            })
+        return decoded
+
+    def to_frame(self, records: Iterable[Mapping[str, Any]]):
+        """Decode a page of raw records into a pandas DataFrame."""
+        import pandas as pd
+
+        return pd.DataFrame(self.decode_page(records), columns=list(DECODED_COLUMNS))
+
+    def priority_label(self, raw: Any) -> str:
+        """Display label for a raw prioritycode."""
+        return self._priority.get(raw) or "N/A"
+
+    def status_label(self, raw_state: Any = None, raw_reason: Any = None) -> str:
+        """Display label for a statecode, derived from the statuscode when the state is missing."""
+        return self._status.get(raw_state) or self._derived_status.get(raw_reason) or "N/A"
+
+    def status_reason_label(self, raw: Any) -> str:
+        """Display label for a raw statuscode."""
+        return self._status_reason.get(raw) or "N/A"
+
+    def _slow_priority(self, raw: Any) -> Any:
+        # Unseen codes: mirror the fallback of showing the raw value when it is not numeric
+        if raw is None:
+            return "N/A"
+        code = _to_int(raw)
+        if code is None:
+            return raw
+        return self.priority_labels.get(code) or "N/A"
+
+
+default_decoder = CaseDecoder()
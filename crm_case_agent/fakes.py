@@ -0,0 +1,356 @@
+"""
+In-memory stand-ins for offline runs of the CRM agent.
+
+``FakeDataverseClient`` mimics the ``DataverseClient.get`` surface used by
+``crm_case_agent.utility``: ``select``, ``filter``, ``orderby``, ``top`` and
+``page_size`` are honoured and results are yielded as lazy page batches, like
+the real SDK. Records are stored with their expanded navigation properties
+(e.g. ``customerid_account``) already embedded, so ``expand`` is accepted but
+only controls which of them are returned.
+
+:func:`synthetic_client` fills one with generated accounts and incidents, and
+``ScriptedChatModel`` stands in for the LLM with deterministic tool calls, so
+``CRMCaseAgent`` can be run end to end without an org, a login or an API key.
+"""
+
+import asyncio
+import random
+import re
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain.messages import AIMessage, HumanMessage, ToolMessage
+
+_TOKEN_RE = re.compile(
+    r"\s*(?:"
+    r"(?P<string>'(?:[^']|'')*')"
+    r"|(?P<guid>[0-9A-Fa-f]{8}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{12})"
+    r"|(?P<lparen>\()|(?P<rparen>\))|(?P<comma>,)"
+    r"|(?P<literal>[0-9][0-9A-Za-z:.\-+]*)"
+    r"|(?P<word>[A-Za-z_@][A-Za-z0-9_./@]*)"
+    r")"
+)
+
+_COMPARISONS = {
+    "eq": lambda a, b: a == b,
+    "ne": lambda a, b: a != b,
+    "gt": lambda a, b: a is not None and b is not None and a > b,
+    "ge": lambda a, b: a is not None and b is not None and a >= b,
+    "lt": lambda a, b: a is not None and b is not None and a < b,
+    "le": lambda a, b: a is not None and b is not None and a <= b,
+}
+
+_FUNCTIONS = {
+    "contains": lambda a, b: a is not None and b.casefold() in a.casefold(),
+    "startswith": lambda a, b: a is not None and a.casefold().startswith(b.casefold()),
+    "endswith": lambda a, b: a is not None and a.casefold().endswith(b.casefold()),
+}
+
+
+def _tokenize(expression: str) -> List[tuple]:
+    tokens = []
+    position = 0
+    expression = expression.strip()
+    while position < len(expression):
+        match = _TOKEN_RE.match(expression, position)
+        if not match or match.end() == position:
+            raise ValueError(f"Unsupported filter syntax near: {expression[position:]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        position = match.end()
+    return tokens
+
+
+def _path_value(record: Dict[str, Any], path: str) -> Any:
+    value: Any = record
+    for part in path.split("/"):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _literal(kind: str, text: str) -> Any:
+    if kind == "string":
+        return text[1:-1].replace("''", "'")
+    if text == "null":
+        return None
+    if text in ("true", "false"):
+        return text == "true"
+    if re.fullmatch(r"-?\d+", text):
+        return int(text)
+    if re.fullmatch(r"-?\d+\.\d+", text):
+        return float(text)
+    # GUIDs and ISO timestamps compare as strings
+    return text
+
+
+def _normalize(value: Any) -> Any:
+    # Dataverse string comparisons are case-insensitive
+    return value.casefold() if isinstance(value, str) else value
+
+
+def compile_filter(expression: Optional[str]) -> Callable[[Dict[str, Any]], bool]:
+    """Compile the subset of OData ``$filter`` syntax the agent emits into a predicate."""
+    if not expression:
+        return lambda record: True
+
+    tokens = _tokenize(expression)
+    position = 0
+
+    def peek(offset: int = 0):
+        index = position + offset
+        return tokens[index] if index < len(tokens) else (None, None)
+
+    def take(expected_kind: Optional[str] = None):
+        nonlocal position
+        kind, text = peek()
+        if kind is None or (expected_kind and kind != expected_kind):
+            raise ValueError(f"Unexpected token in filter: {text!r}")
+        position += 1
+        return kind, text
+
+    def operand():
+        kind, text = take()
+        if kind in ("string", "guid", "literal") or text in ("null", "true", "false"):
+            value = _literal(kind, text)
+            return lambda record: value
+        if kind == "word":
+            return lambda record: _path_value(record, text)
+        raise ValueError(f"Unexpected operand in filter: {text!r}")
+
+    def comparison():
+        kind, text = peek()
+        if kind == "lparen":
+            take()
+            inner = disjunction()
+            take("rparen")
+            return inner
+        if kind == "word" and text == "not":
+            take()
+            inner = comparison()
+            return lambda record: not inner(record)
+        if kind == "word" and text in _FUNCTIONS and peek(1)[0] == "lparen":
+            take()
+            take("lparen")
+            left = operand()
+            take("comma")
+            right = operand()
+            take("rparen")
+            function = _FUNCTIONS[text]
+            return lambda record: function(left(record), right(record))
+        left = operand()
+        _, operator = take("word")
+        if operator not in _COMPARISONS:
+            raise ValueError(f"Unsupported filter operator: {operator!r}")
+        right = operand()
+        compare = _COMPARISONS[operator]
+        return lambda record: compare(_normalize(left(record)), _normalize(right(record)))
+
+    def conjunction():
+        parts = [comparison()]
+        while peek() == ("word", "and"):
+            take()
+            parts.append(comparison())
+        return parts[0] if len(parts) == 1 else (lambda record: all(part(record) for part in parts))
+
+    def disjunction():
+        parts = [conjunction()]
+        while peek() == ("word", "or"):
+            take()
+            parts.append(conjunction())
+        return parts[0] if len(parts) == 1 else (lambda record: any(part(record) for part in parts))
+
+    predicate = disjunction()
+    if position != len(tokens):
+        raise ValueError(f"Unexpected trailing filter tokens: {tokens[position:]!r}")
+    return predicate
+
+
+def _sort_key(value: Any):
+    return (value is None, _normalize(value) if value is not None else 0)
+
+
+class FakeDataverseClient:
+    """
+    Minimal in-memory ``DataverseClient`` replacement.
+
+    Args:
+        tables: Mapping of table logical name to a list of record dicts.
+        default_page_size: Page size used when the caller does not pass one.
+        latency: Optional seconds to sleep per page, to simulate network time.
+    """
+
+    def __init__(self, tables: Optional[Dict[str, List[Dict[str, Any]]]] = None,
+                 default_page_size: int = 5000, latency: float = 0.0):
+        self.tables: Dict[str, List[Dict[str, Any]]] = {name: list(rows) for name, rows in (tables or {}).items()}
+        self.default_page_size = default_page_size
+        self.latency = latency
+        self.requests: List[Dict[str, Any]] = []
+
+    def add(self, table: str, *records: Dict[str, Any]) -> None:
+        self.tables.setdefault(table, []).extend(records)
+
+    def get(self, table, record_id=None, select=None, filter=None, orderby=None, top=None,
+            expand=None, page_size=None, **kwargs):
+        self.requests.append({
+            "table": table, "record_id": record_id, "select": select, "filter": filter,
+            "orderby": orderby, "top": top, "expand": expand, "page_size": page_size,
+        })
+        if record_id is not None:
+            for record in self.tables.get(table, []):
+                if any(key.endswith("id") and value == record_id for key, value in record.items()):
+                    return self._project(record, select, expand)
+            raise KeyError(f"{table} record {record_id} not found")
+        return self._pages(table, select, filter, orderby, top, expand, page_size or self.default_page_size)
+
+    def _pages(self, table, select, filter, orderby, top, expand, page_size) -> Iterator[List[Dict[str, Any]]]:
+        predicate = compile_filter(filter)
+        rows = [record for record in self.tables.get(table, []) if predicate(record)]
+        for clause in reversed(orderby or []):
+            column, _, direction = clause.partition(" ")
+            rows.sort(key=lambda record: _sort_key(_path_value(record, column)),
+                      reverse=direction.strip().lower() == "desc")
+        if top is not None:
+            rows = rows[:top]
+        for start in range(0, len(rows), page_size):
+            if self.latency:
+                time.sleep(self.latency)
+            yield [self._project(record, select, expand) for record in rows[start:start + page_size]]
+
+    @staticmethod
+    def _project(record: Dict[str, Any], select, expand) -> Dict[str, Any]:
+        if not select:
+            return dict(record)
+        navigation = {clause.split("(", 1)[0] for clause in (expand or [])}
+        keep = set(select) | navigation
+        return {
+            key: value for key, value in record.items()
+            if key in keep or key.split("@", 1)[0] in keep
+        }
+
+
+_COMPANY_NAMES = (
+    "Trey Research", "Contoso Ltd", "Fabrikam Inc", "Adventure Works", "Litware Inc",
+    "Northwind Traders", "Alpine Ski House", "Coho Winery", "Wide World Importers", "Tailspin Toys",
+)
+
+
+def synthetic_tables(incidents: int = 10000, customers: int = 50, seed: int = 7) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Generate ``account`` and ``incident`` rows shaped like Dataverse records.
+
+    Incidents are spread over ``customers`` accounts with a skewed (Zipf-like)
+    distribution, so a few customers have many cases as in a real org. The
+    same ``seed`` always yields the same tables.
+    """
+    rng = random.Random(seed)
+    start = datetime(2023, 1, 1, tzinfo=timezone.utc)
+    accounts = []
+    for i in range(customers):
+        base = _COMPANY_NAMES[i % len(_COMPANY_NAMES)]
+        accounts.append({
+            "accountid": str(uuid.UUID(int=rng.getrandbits(128))),
+            "name": base if i < len(_COMPANY_NAMES) else f"{base} {i // len(_COMPANY_NAMES) + 1}",
+            "modifiedon": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        })
+    weights = [1.0 / (rank + 1) for rank in range(customers)]
+    owners = rng.choices(accounts, weights=weights, k=incidents)
+    reasons = [(1, 0), (2, 0), (3, 0), (4, 0), (5, 1), (1000, 1), (6, 2), (2000, 2)]
+    rows = []
+    for i, account in enumerate(owners):
+        created = start + timedelta(minutes=rng.randrange(0, 365 * 24 * 60))
+        status, state = rng.choice(reasons)
+        rows.append({
+            "incidentid": str(uuid.UUID(int=rng.getrandbits(128))),
+            "title": f"Synthetic issue {i}",
+            "ticketnumber": f"CAS-{i:06d}",
+            "prioritycode": rng.choice((1, 2, 3)),
+            "statuscode": status,
+            "statecode": state,
+            "createdon": created.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "modifiedon": (created + timedelta(hours=rng.randrange(0, 72))).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "description": f"Synthetic case {i} for {account['name']}",
+            "_customerid_value": account["accountid"],
+            "_ownerid_value": None,
+            "customerid_account": {"name": account["name"]},
+        })
+    return {"account": accounts, "contact": [], "incident": rows}
+
+
+def synthetic_client(incidents: int = 10000, customers: int = 50, seed: int = 7, latency: float = 0.0,
+                     default_page_size: int = 5000) -> FakeDataverseClient:
+    """A :class:`FakeDataverseClient` holding :func:`synthetic_tables`."""
+    return FakeDataverseClient(synthetic_tables(incidents, customers, seed),
+                               default_page_size=default_page_size, latency=latency)
+
+
+_TICKET_RE = re.compile(r"\b(CAS-[\w-]+)", re.IGNORECASE)
+_CUSTOMER_RE = re.compile(r"\b(?:for|of|from)\s+(.+?)\s*[?.!]*$", re.IGNORECASE)
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Deterministic chat model for offline runs.
+
+    On a user message it calls one tool chosen from the wording of the query:
+    ``get_case_details`` for a ticket number, ``get_case_statistics`` for
+    "how many"/"statistics" questions, ``retrieve_cases_for_customers`` for
+    "cases for A and B" and ``retrieve_customer_cases`` for "cases for A".
+    After a tool result it answers with the first lines of that result.
+
+    Args:
+        latency: Seconds to sleep per call, to simulate model time.
+        answer_lines: Lines of the tool result echoed in the final answer.
+    """
+
+    latency: float = 0.0
+    answer_lines: int = 3
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _tool_call(self, query: str) -> Optional[Dict[str, Any]]:
+        ticket = _TICKET_RE.search(query)
+        if ticket:
+            return {"name": "get_case_details", "args": {"ticket_number": ticket.group(1)}}
+        customer = _CUSTOMER_RE.search(query)
+        name = customer.group(1) if customer else None
+        if re.search(r"\bhow many\b|\bstatistic|\bcount\b", query, re.IGNORECASE):
+            return {"name": "get_case_statistics", "args": {"group_by": ["status"], "customer_name": name}}
+        if name and " and " in name:
+            names = [part.strip() for part in name.split(" and ") if part.strip()]
+            return {"name": "retrieve_cases_for_customers", "args": {"customer_names": names}}
+        if name:
+            return {"name": "retrieve_customer_cases", "args": {"customer_name": name}}
+        return None
+
+    def respond(self, messages: List[Any]) -> AIMessage:
+        """The reply to ``messages``, without simulated latency."""
+        last = messages[-1]
+        if isinstance(last, ToolMessage):
+            lines = [line for line in str(last.content).splitlines() if line.strip()]
+            return AIMessage(content="\n".join(lines[:self.answer_lines]))
+        query = last.content if isinstance(last, HumanMessage) else ""
+        call = self._tool_call(str(query))
+        if call is None:
+            return AIMessage(content="I can look up cases, case details and case statistics for a customer.")
+        return AIMessage(content="", tool_calls=[{**call, "id": f"call_{len(messages)}"}])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self.respond(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self.respond(messages))])
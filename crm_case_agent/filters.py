@@ -0,0 +1,240 @@
+"""
+Structured case filters compiled into OData ``$filter``/``$orderby``.
+
+Tools accept status, priority, date-range and ordering arguments from the LLM;
+:class:`CaseFilter` validates them against whitelists (option-set labels or
+codes, known columns, parseable timestamps) so nothing the model writes is
+pasted into a query verbatim. The same filter is compiled to SQL for the local
+replica and evaluated in Python when cached results are revalidated.
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+from .decoding import CaseDecoder, default_decoder
+
+# Columns the LLM may order by
+ORDERABLE_COLUMNS = ("createdon", "modifiedon", "prioritycode", "title", "ticketnumber")
+
+# Everyday status words that do not match an option-set label
+_STATUS_ALIASES = {
+    "open": (0,),
+    "closed": (1, 2),
+}
+
+_RELATIVE_RE = re.compile(r"^-?(\d+)\s*([hdw])$")
+_RELATIVE_UNITS = {"h": "hours", "d": "days", "w": "weeks"}
+
+
+def normalize_timestamp(value: str, now: Optional[datetime] = None) -> str:
+    """
+    Parse a date/datetime and render it as a UTC OData/FetchXML timestamp.
+
+    Accepts ISO-8601 values (``2024-03-01``, ``2024-03-01T12:00:00+02:00``),
+    ``today``/``yesterday`` and relative offsets into the past such as ``7d``,
+    ``-24h`` or ``2w``. Hour offsets are rounded down to the minute and day or
+    week offsets to midnight UTC, so repeated calls yield the same timestamp
+    (and the same cache keys) instead of one that moves every second.
+    """
+    text = str(value).strip().lower()
+    now = now or datetime.now(timezone.utc)
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    relative = _RELATIVE_RE.match(text)
+    if text == "today":
+        parsed = midnight
+    elif text == "yesterday":
+        parsed = midnight - timedelta(days=1)
+    elif relative:
+        unit = relative.group(2)
+        start = midnight if unit in ("d", "w") else now.replace(second=0, microsecond=0)
+        parsed = start - timedelta(**{_RELATIVE_UNITS[unit]: int(relative.group(1))})
+    else:
+        try:
+            parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+        except ValueError:
+            raise ValueError(f"Invalid date {value!r}; use an ISO date such as 2024-03-01 or an offset such as 7d")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _option_codes(values: Union[None, str, int, Sequence[Any]], labels: Mapping[int, str],
+                  aliases: Mapping[str, Tuple[int, ...]], kind: str) -> Tuple[int, ...]:
+    """Resolve option-set labels or codes to a sorted tuple of known codes."""
+    if values is None:
+        return ()
+    if isinstance(values, (str, int)):
+        values = [values]
+    by_label = {label.casefold(): code for code, label in labels.items()}
+    codes = set()
+    for value in values:
+        text = " ".join(str(value).split()).casefold()
+        if text in by_label:
+            codes.add(by_label[text])
+        elif text in aliases:
+            codes.update(aliases[text])
+        elif text.lstrip("-").isdigit() and int(text) in labels:
+            codes.add(int(text))
+        else:
+            choices = sorted({*labels.values(), *(alias.title() for alias in aliases)})
+            raise ValueError(f"Unknown {kind} {value!r}; choose from {choices}")
+    return tuple(sorted(codes))
+
+
+def _parse_order(order_by: Union[None, str, Sequence[str]]) -> Tuple[Tuple[str, bool], ...]:
+    if not order_by:
+        return ()
+    if isinstance(order_by, str):
+        order_by = order_by.split(",")
+    clauses = []
+    for clause in order_by:
+        parts = str(clause).split()
+        if not parts:
+            continue
+        column = parts[0].lower()
+        direction = parts[1].lower() if len(parts) > 1 else "asc"
+        if column not in ORDERABLE_COLUMNS or direction not in ("asc", "desc") or len(parts) > 2:
+            raise ValueError(
+                f"Unsupported order_by {clause!r}; use '<column> [asc|desc]' with a column from {list(ORDERABLE_COLUMNS)}"
+            )
+        clauses.append((column, direction == "desc"))
+    return tuple(clauses)
+
+
+@dataclass(frozen=True)
+class CaseFilter:
+    """
+    Validated, hashable case filter.
+
+    Build it with :meth:`build` from tool arguments; the instance itself only
+    holds option codes, normalized UTC timestamps and whitelisted columns, and
+    doubles as part of a cache key.
+    """
+    statecodes: Tuple[int, ...] = ()
+    prioritycodes: Tuple[int, ...] = ()
+    created_after: Optional[str] = None
+    created_before: Optional[str] = None
+    modified_after: Optional[str] = None
+    modified_before: Optional[str] = None
+    order_by: Tuple[Tuple[str, bool], ...] = ()
+
+    @classmethod
+    def build(
+        cls,
+        status: Union[None, str, int, Sequence[Any]] = None,
+        priority: Union[None, str, int, Sequence[Any]] = None,
+        created_after: Optional[str] = None,
+        created_before: Optional[str] = None,
+        modified_after: Optional[str] = None,
+        modified_before: Optional[str] = None,
+        order_by: Union[None, str, Sequence[str]] = None,
+        decoder: Optional[CaseDecoder] = None,
+    ) -> "CaseFilter":
+        """Validate tool arguments; raises ValueError naming the offending argument."""
+        decoder = decoder or default_decoder
+        return cls(
+            statecodes=_option_codes(status, decoder.status_labels, _STATUS_ALIASES, "status"),
+            prioritycodes=_option_codes(priority, decoder.priority_labels, {}, "priority"),
+            created_after=normalize_timestamp(created_after) if created_after else None,
+            created_before=normalize_timestamp(created_before) if created_before else None,
+            modified_after=normalize_timestamp(modified_after) if modified_after else None,
+            modified_before=normalize_timestamp(modified_before) if modified_before else None,
+            order_by=_parse_order(order_by),
+        )
+
+    @property
+    def is_empty(self) -> bool:
+        return self == CaseFilter()
+
+    def _ranges(self) -> List[Tuple[str, str, str]]:
+        ranges = [
+            ("createdon", "ge", self.created_after),
+            ("createdon", "lt", self.created_before),
+            ("modifiedon", "ge", self.modified_after),
+            ("modifiedon", "lt", self.modified_before),
+        ]
+        return [r for r in ranges if r[2]]
+
+    def to_odata(self) -> Optional[str]:
+        """The ``$filter`` expression, or None when nothing is filtered."""
+        clauses = []
+        for column, codes in (("statecode", self.statecodes), ("prioritycode", self.prioritycodes)):
+            if codes:
+                clauses.append("(" + " or ".join(f"{column} eq {int(code)}" for code in codes) + ")")
+        # Normalized timestamps are unquoted DateTimeOffset literals
+        clauses.extend(f"{column} {operator} {value}" for column, operator, value in self._ranges())
+        return " and ".join(clauses) or None
+
+    def to_orderby(self) -> Optional[List[str]]:
+        """The ``$orderby`` clauses, or None for the server's default order."""
+        if not self.order_by:
+            return None
+        return [f"{column} {'desc' if descending else 'asc'}" for column, descending in self.order_by]
+
+    def to_sql(self, decoder: Optional[CaseDecoder] = None) -> Tuple[List[str], List[Any]]:
+        """
+        ``WHERE`` clauses and parameters for the replica's ``incident`` table.
+
+        Status filters are expanded to the status reasons the decoder maps onto
+        each requested state, which also covers rows whose ``statecode`` is unset.
+        """
+        decoder = decoder or default_decoder
+        clauses: List[str] = []
+        params: List[Any] = []
+        if self.statecodes:
+            reasons = [reason for reason, state in decoder.status_reason_states.items() if state in self.statecodes]
+            clauses.append(f"statuscode IN ({', '.join('?' for _ in reasons)})" if reasons else "0")
+            params.extend(reasons)
+        if self.prioritycodes:
+            clauses.append(f"prioritycode IN ({', '.join('?' for _ in self.prioritycodes)})")
+            params.extend(self.prioritycodes)
+        for column, operator, value in self._ranges():
+            clauses.append(f"{column} {'>=' if operator == 'ge' else '<'} ?")
+            params.append(value)
+        return clauses, params
+
+    def matches(self, record: Mapping[str, Any], decoder: Optional[CaseDecoder] = None) -> bool:
+        """Evaluate the filter against a raw Dataverse-shaped record."""
+        if self.statecodes:
+            state = record.get("statecode")
+            if state is None:
+                state = (decoder or default_decoder).status_reason_states.get(record.get("statuscode"))
+            if state not in self.statecodes:
+                return False
+        if self.prioritycodes and record.get("prioritycode") not in self.prioritycodes:
+            return False
+        for column, operator, value in self._ranges():
+            actual = record.get(column)
+            if actual is None:
+                return False
+            actual = normalize_timestamp(actual)
+            if (operator == "ge" and actual < value) or (operator == "lt" and actual >= value):
+                return False
+        return True
+
+    def sort(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Sort records in place by ``order_by``; nulls sort low, as in Dataverse and SQLite."""
+        for column, descending in reversed(self.order_by):
+            present = [r for r in records if r.get(column) is not None]
+            missing = [r for r in records if r.get(column) is None]
+            present.sort(key=lambda r: r[column].casefold() if isinstance(r[column], str) else r[column],
+                         reverse=descending)
+            records[:] = present + missing if descending else missing + present
+        return records
+
+    def describe(self, decoder: Optional[CaseDecoder] = None) -> str:
+        """Short human-readable summary for tool output headers."""
+        decoder = decoder or default_decoder
+        parts = []
+        if self.statecodes:
+            parts.append("status " + "/".join(decoder.status_labels.get(c, str(c)) for c in self.statecodes))
+        if self.prioritycodes:
+            parts.append("priority " + "/".join(decoder.priority_labels.get(c, str(c)) for c in self.prioritycodes))
+        labels = {("createdon", "ge"): "created on/after", ("createdon", "lt"): "created before",
+                  ("modifiedon", "ge"): "modified on/after", ("modifiedon", "lt"): "modified before"}
+        parts.extend(f"{labels[column, operator]} {value}" for column, operator, value in self._ranges())
+        if self.order_by:
+            parts.append("ordered by " + ", ".join(f"{c} {'desc' if d else 'asc'}" for c, d in self.order_by))
+        return ", ".join(parts)
@@ -0,0 +1,175 @@
+"""
+Token-budgeted rendering of decoded cases for tool responses.
+
+Tool output is prompt input for the next LLM turn, so its size drives both
+cost and latency. :class:`CaseOutputFormat` renders decoded cases as a compact
+markdown table, TSV, or the original labelled markdown list, restricted to the
+requested fields and cut off at a token budget. Every render reports how many
+tokens it used so the budget can be tuned against response time.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .decoding import DECODED_COLUMNS
+
+OUTPUT_FORMATS = ("table", "tsv", "markdown")
+
+DEFAULT_FIELDS = ("ticket_number", "title", "priority", "status", "status_reason", "createdon")
+
+_HEADERS = {
+    "customer": "Customer",
+    "title": "Title",
+    "ticket_number": "Ticket",
+    "priority": "Priority",
+    "status": "Status",
+    "status_reason": "Status Reason",
+    "createdon": "Created",
+    "description": "Description",
+}
+
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count tokens with tiktoken's ``o200k_base`` encoding when it is available.
+
+    Falls back to a ~4 characters per token estimate when tiktoken is not
+    installed or cannot load its encoding (e.g. offline); the failure is
+    remembered so it is not retried on every call.
+    """
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                try:
+                    import tiktoken
+                    _encoder = tiktoken.get_encoding("o200k_base")
+                except Exception:
+                    _encoder = False
+    if _encoder is False:
+        return (len(text) + 3) // 4
+    return len(_encoder.encode(text))
+
+
+def _clean(value: Any, separator: str, max_chars: Optional[int]) -> str:
+    text = "N/A" if value is None else " ".join(str(value).split())
+    if separator == "|":
+        text = text.replace("|", "\\|")
+    if max_chars is not None and len(text) > max_chars:
+        text = text[:max_chars - 1].rstrip() + "…"
+    return text
+
+
+class CaseOutputFormat:
+    """
+    Rendering settings for case lists.
+
+    Args:
+        format: ``"table"`` (markdown table), ``"tsv"`` or ``"markdown"`` (one labelled block per case).
+        fields: Decoded columns to show, in order; see ``DECODED_COLUMNS``.
+        token_budget: Maximum tokens for the rendered rows; None disables truncation.
+        max_field_chars: Long values (e.g. descriptions) are clipped to this many characters.
+    """
+
+    def __init__(
+        self,
+        format: str = "table",
+        fields: Sequence[str] = DEFAULT_FIELDS,
+        token_budget: Optional[int] = 2000,
+        max_field_chars: Optional[int] = 160,
+    ):
+        if format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format {format!r}; choose from {list(OUTPUT_FORMATS)}")
+        self.format = format
+        self.fields = self.validate_fields(fields)
+        self.token_budget = token_budget
+        self.max_field_chars = max_field_chars
+        self._lock = threading.Lock()
+        self.renders = 0
+        self.truncations = 0
+        self.tokens_used = 0
+
+    @staticmethod
+    def validate_fields(fields: Optional[Sequence[str]]) -> Tuple[str, ...]:
+        """Return ``fields`` as a de-duplicated tuple; raises ValueError on unknown names."""
+        fields = tuple(dict.fromkeys(fields or ()))
+        unknown = [f for f in fields if f not in DECODED_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown field(s) {unknown}; choose from {list(DECODED_COLUMNS)}")
+        if not fields:
+            raise ValueError("At least one field is required")
+        return fields
+
+    def header(self, fields: Optional[Sequence[str]] = None) -> str:
+        fields = fields or self.fields
+        names = [_HEADERS[f] for f in fields]
+        if self.format == "table":
+            return "| # | " + " | ".join(names) + " |\n|" + "---|" * (len(names) + 1) + "\n"
+        if self.format == "tsv":
+            return "#\t" + "\t".join(names) + "\n"
+        return ""
+
+    def row(self, case: Dict[str, Any], number: int, fields: Optional[Sequence[str]] = None) -> str:
+        fields = fields or self.fields
+        if self.format == "table":
+            return f"| {number} | " + " | ".join(_clean(case.get(f), "|", self.max_field_chars) for f in fields) + " |\n"
+        if self.format == "tsv":
+            return f"{number}\t" + "\t".join(_clean(case.get(f), "\t", self.max_field_chars) for f in fields) + "\n"
+        first, *rest = fields
+        block = f"{number}. **{_clean(case.get(first), '', self.max_field_chars)}**\n"
+        block += "".join(f"   - {_HEADERS[f]}: {_clean(case.get(f), '', self.max_field_chars)}\n" for f in rest)
+        return block + "\n"
+
+    def render(
+        self,
+        cases_list: List[Dict[str, Any]],
+        start: int = 1,
+        fields: Optional[Sequence[str]] = None,
+        token_budget: Optional[int] = None,
+    ) -> Tuple[str, int, int]:
+        """
+        Render as many cases as fit in the budget.
+
+        ``token_budget`` overrides the configured budget for this call (e.g. the
+        share left for one section of a multi-customer response). Returns
+        ``(text, rendered_count, tokens)``; at least one case is always rendered.
+        """
+        fields = self.validate_fields(fields) if fields else self.fields
+        budget = token_budget if token_budget is not None else self.token_budget
+        if not cases_list:
+            return "", 0, 0
+        parts = [self.header(fields)]
+        tokens = count_tokens(parts[0]) if parts[0] else 0
+        rendered = 0
+        for number, case in enumerate(cases_list, start):
+            line = self.row(case, number, fields)
+            cost = count_tokens(line)
+            if budget is not None and rendered and tokens + cost > budget:
+                break
+            parts.append(line)
+            tokens += cost
+            rendered += 1
+        with self._lock:
+            self.renders += 1
+            self.tokens_used += tokens
+            if rendered < len(cases_list):
+                self.truncations += 1
+        return "".join(parts), rendered, tokens
+
+    def stats(self) -> Dict[str, Any]:
+        """Render counters for tuning ``token_budget``."""
+        with self._lock:
+            return {
+                "format": self.format,
+                "token_budget": self.token_budget,
+                "renders": self.renders,
+                "truncations": self.truncations,
+                "tokens_used": self.tokens_used,
+                "avg_tokens": round(self.tokens_used / self.renders, 1) if self.renders else 0.0,
+            }
+
+
+default_output_format = CaseOutputFormat()
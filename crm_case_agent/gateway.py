@@ -0,0 +1,349 @@
+"""
+Request gateway for Dataverse calls made by the CRM agent.
+
+Dataverse enforces service protection limits per user and org (requests per
+5-minute window, concurrent requests, execution time) and answers with 429 and
+a ``Retry-After`` header once they are exceeded. :class:`DataverseGateway`
+wraps a client behind the same ``get`` surface as
+:class:`~crm_case_agent.service.DataverseClientPool` and keeps traffic just
+under those limits instead of running into them:
+
+- an :class:`AIMDLimiter` caps requests in flight, growing the cap by one per
+  window of successes and halving it on a 429/503,
+- a :class:`RequestBudget` per org keeps a sliding-window request count and
+  pauses every caller for that org while a ``Retry-After`` is in effect,
+- transient failures are retried with jittered backoff, so callers that were
+  throttled together do not retry together.
+
+Once retries or the wait budget are used up on a 429/503 (or while waiting
+for the budget) a :class:`ThrottledError` is raised, which tools report to the
+LLM with the time to wait; other server errors (500/502/504) are re-raised as
+they are after their retries.
+"""
+
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from agent_tracing import span
+
+# Statuses worth retrying; 429/503 also mean "slow down"
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+THROTTLE_STATUSES = (429, 503)
+
+
+class ThrottledError(Exception):
+    """A Dataverse request was throttled and could not be completed within the retry budget."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """HTTP status of an SDK (``HttpError``) or azure-core/requests error, if any."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """``Retry-After`` carried by an error, in seconds, if the server sent one."""
+    value = getattr(error, "retry_after", None)
+    if value is None:
+        value = (getattr(error, "details", None) or {}).get("retry_after")
+    if value is None:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+        value = headers.get("Retry-After")
+    try:
+        return max(float(value), 0.0) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class AIMDLimiter:
+    """
+    Additive-increase/multiplicative-decrease cap on concurrent requests.
+
+    Args:
+        initial: Starting concurrency limit.
+        min_limit: The limit never drops below this.
+        max_limit: The limit never grows beyond this (Dataverse allows 52 concurrent requests per user).
+        increase: Added to the limit per ``limit`` successful requests while at least
+            half the limit is in use.
+        decrease: Factor applied to the limit on a throttle. Throttles of requests
+            started before the last decrease are ignored, since they were sent at the
+            old limit, so the limit is cut at most once per round of requests.
+    """
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 52, increase: float = 1.0,
+                 decrease: float = 0.5, clock: Callable[[], float] = time.monotonic):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self._clock = clock
+        self._condition = threading.Condition()
+        self._last_decrease = float("-inf")
+        self.in_flight = 0
+        self.peak_limit = self.limit
+        self.decreases = 0
+
+    def acquire(self, timeout: Optional[float] = None) -> Optional[float]:
+        """Wait for a free slot; returns its start time, or None if none frees up within ``timeout`` seconds."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self.in_flight < int(self.limit), timeout):
+                return None
+            self.in_flight += 1
+            return self._clock()
+
+    def release(self, started: float, throttled: Optional[bool] = False) -> None:
+        """
+        Free the slot taken at ``started``. ``throttled`` is False for a success
+        (additive increase), True for a throttle (multiplicative decrease) and
+        None to leave the limit alone.
+        """
+        with self._condition:
+            # Only grow a limit that is actually being used
+            busy = self.in_flight * 2 >= self.limit
+            self.in_flight -= 1
+            if throttled:
+                if started >= self._last_decrease:
+                    self.limit = max(float(self.min_limit), self.limit * self.decrease)
+                    self._last_decrease = self._clock()
+                    self.decreases += 1
+            elif throttled is False and busy:
+                self.limit = min(float(self.max_limit), self.limit + self.increase / self.limit)
+                self.peak_limit = max(self.peak_limit, self.limit)
+            self._condition.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {"limit": round(self.limit, 2), "in_flight": self.in_flight,
+                    "peak_limit": round(self.peak_limit, 2), "decreases": self.decreases}
+
+
+class RequestBudget:
+    """
+    Sliding-window request budget for one org, shared by all of its gateways.
+
+    Args:
+        requests: Requests allowed per ``window`` (Dataverse: 6000 per user per 5 minutes).
+        window: Window length in seconds.
+        jitter: Waiters add up to this fraction of their wait, so they do not all wake at once.
+    """
+
+    def __init__(self, requests: int = 6000, window: float = 300.0, jitter: float = 0.1,
+                 clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.requests = requests
+        self.window = window
+        self.jitter = jitter
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._sent: deque = deque()
+        self.paused_until = 0.0
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every request for this org for ``seconds`` (from a ``Retry-After``)."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, self._clock() + seconds)
+
+    def _reserve(self, now: float, take: bool = True) -> float:
+        """Take a slot (if ``take``) and return 0, or return the seconds until one is free."""
+        with self._lock:
+            while self._sent and self._sent[0] <= now - self.window:
+                self._sent.popleft()
+            if now < self.paused_until:
+                return self.paused_until - now
+            if len(self._sent) >= self.requests:
+                return self._sent[0] + self.window - now
+            if take:
+                self._sent.append(now)
+            return 0.0
+
+    def record(self) -> None:
+        """Count a request admitted with ``acquire(take=False)`` that did reach the server."""
+        with self._lock:
+            self._sent.append(self._clock())
+
+    def acquire(self, deadline: float, take: bool = True) -> None:
+        """
+        Wait for a slot; raises :class:`ThrottledError` if none is available before
+        ``deadline``. With ``take=False`` the slot is only checked, not used up.
+        """
+        while True:
+            now = self._clock()
+            wait = self._reserve(now, take)
+            if wait <= 0:
+                return
+            if now + wait > deadline:
+                raise ThrottledError(
+                    f"Dataverse request budget exhausted; try again in about {wait:.0f}s", retry_after=wait
+                )
+            wait = min(wait * (1 + random.uniform(0, self.jitter)), deadline - now)
+            self.waits += 1
+            self.wait_seconds += wait
+            self._sleep(wait)
+
+    def stats(self) -> Dict[str, Any]:
+        now = self._clock()
+        with self._lock:
+            used = sum(1 for sent in self._sent if sent > now - self.window)
+            return {"window_requests": used, "window_limit": self.requests,
+                    "paused_for": round(max(self.paused_until - now, 0.0), 1),
+                    "budget_waits": self.waits, "budget_wait_seconds": round(self.wait_seconds, 2)}
+
+
+_org_limits: Dict[str, Tuple[AIMDLimiter, RequestBudget]] = {}
+_org_limits_lock = threading.Lock()
+
+
+def org_limits(org: str) -> Tuple[AIMDLimiter, RequestBudget]:
+    """The limiter and budget shared by every gateway for ``org`` in this process."""
+    with _org_limits_lock:
+        if org not in _org_limits:
+            _org_limits[org] = (AIMDLimiter(), RequestBudget())
+        return _org_limits[org]
+
+
+class DataverseGateway:
+    """
+    Throttling-aware wrapper around a Dataverse client's ``get``.
+
+    The first page of a query (or a single-record fetch) is retried on
+    transient errors. Later pages are admitted the same way, but a paged
+    result cannot be resumed once the SDK's page iterator has failed, so a
+    throttle there only slows down other requests and raises :class:`ThrottledError`.
+
+    Args:
+        client: A ``DataverseClient`` or :class:`~crm_case_agent.service.DataverseClientPool`.
+        org: Budget key; defaults to the client's base URL, so gateways for the same org share limits.
+        limiter: Concurrency limiter; defaults to the org's shared one.
+        budget: Request budget; defaults to the org's shared one.
+        max_retries: Retries per request after the first attempt.
+        base_delay: Backoff base for errors without ``Retry-After`` (full jitter, doubling per attempt).
+        max_delay: Cap on one backoff delay.
+        max_wait: Total seconds one call may spend waiting before giving up.
+    """
+
+    def __init__(self, client, org: Optional[str] = None, limiter: Optional[AIMDLimiter] = None,
+                 budget: Optional[RequestBudget] = None, max_retries: int = 4, base_delay: float = 0.5,
+                 max_delay: float = 30.0, max_wait: float = 60.0, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.client = client
+        self.org = org or getattr(client, "_base_url", None) or "default"
+        shared_limiter, shared_budget = org_limits(self.org)
+        self.limiter = limiter or shared_limiter
+        self.budget = budget or shared_budget
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_wait = max_wait
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.retries = 0
+        self.throttles = 0
+        self.failures = 0
+
+    def get(self, table, record_id=None, **kwargs):
+        if record_id is not None:
+            with span("dataverse.get", table=table):
+                return self._call(lambda: self.client.get(table, record_id, **kwargs))
+
+        def first_page():
+            pages = iter(self.client.get(table, **kwargs))
+            return pages, next(pages, None)
+
+        with span("dataverse.page", table=table, page=1) as stage:
+            pages, first = self._call(first_page)
+            stage.set(records=len(first) if first is not None else 0)
+        return self._paged(table, pages, first)
+
+    def _paged(self, table: str, pages: Iterator[List[Dict[str, Any]]], page) -> Iterator[List[Dict[str, Any]]]:
+        number = 1
+        while page is not None:
+            yield page
+            number += 1
+            # Asking for the next page only costs a request if there is one
+            with span("dataverse.page", table=table, page=number) as stage:
+                page = self._call(lambda: next(pages, None), retries=0, count_empty=False)
+                stage.set(records=len(page) if page is not None else 0)
+
+    def _backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _call(self, fn: Callable[[], Any], retries: Optional[int] = None, count_empty: bool = True) -> Any:
+        retries = self.max_retries if retries is None else retries
+        deadline = self._clock() + self.max_wait
+        for attempt in range(retries + 1):
+            self.budget.acquire(deadline, take=count_empty)
+            started = self.limiter.acquire(timeout=max(deadline - self._clock(), 0.0))
+            if started is None:
+                raise ThrottledError("Too many Dataverse requests in flight; try again shortly", retry_after=1.0)
+            with self._lock:
+                self.requests += 1
+            try:
+                result = fn()
+            except Exception as e:
+                status = status_code(e)
+                if status not in RETRYABLE_STATUSES:
+                    self.limiter.release(started, throttled=None)
+                    raise
+                throttled = status in THROTTLE_STATUSES
+                self.limiter.release(started, throttled=throttled)
+                retry_after = retry_after_seconds(e)
+                with self._lock:
+                    self.throttles += throttled
+                if retry_after is not None:
+                    # Every caller for this org waits it out, not just this one
+                    self.budget.pause(retry_after)
+                    delay = 0.0
+                else:
+                    delay = self._backoff(attempt)
+                wait = max(retry_after or 0.0, delay)
+                if attempt == retries or self._clock() + wait > deadline:
+                    with self._lock:
+                        self.failures += 1
+                    if not throttled:
+                        # A server error that outlasted its retries is not a reason to tell the caller to wait
+                        raise
+                    raise ThrottledError(
+                        f"Dataverse is throttling requests (HTTP {status}); try again in about "
+                        f"{max(wait, 1.0):.0f}s", retry_after=max(wait, 1.0),
+                    ) from e
+                with self._lock:
+                    self.retries += 1
+                if delay:
+                    self._sleep(delay)
+            else:
+                self.limiter.release(started, throttled=False)
+                if not count_empty and result is not None:
+                    self.budget.record()
+                return result
+
+    def __getattr__(self, name: str) -> Any:
+        # Other SDK surfaces (e.g. ``query``) pass through ungated
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
+    def close(self) -> None:
+        close = getattr(self.client, "close", None)
+        if close is not None:
+            close()
+
+    def stats(self) -> Dict[str, Any]:
+        """Request, retry and throttle counters plus the org's current limit and budget."""
+        with self._lock:
+            counters = {"org": self.org, "requests": self.requests, "retries": self.retries,
+                        "throttles": self.throttles, "failures": self.failures}
+        return {**counters, **self.limiter.stats(), **self.budget.stats()}
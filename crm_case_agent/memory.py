@@ -0,0 +1,192 @@
+"""
+Bounded conversation memory for multi-turn agent sessions.
+
+Keeps the messages sent back to the model on each turn within a token budget
+so long sessions cost roughly the same per turn as short ones:
+
+- recent turns are kept verbatim (a sliding window of whole turns, so tool
+  calls and their results are never separated),
+- tool outputs older than a couple of turns are collapsed into a one-line
+  reference (the tool can simply be called again),
+- turns that fall out of the window are folded into a rolling summary, a few
+  turns at a time so the summarizer runs once per batch rather than per turn.
+"""
+
+import json
+import threading
+from typing import Callable, List, Optional, Sequence
+
+from langchain.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from .formatting import count_tokens
+
+# (previous summary, evicted turns) -> new summary
+Summarizer = Callable[[str, List[List[object]]], str]
+
+
+def message_tokens(message) -> int:
+    """Approximate prompt tokens for one message, including tool-call arguments."""
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, default=str)
+    tokens = count_tokens(content) + 4
+    for call in getattr(message, "tool_calls", None) or ():
+        tokens += count_tokens(call.get("name", "") + json.dumps(call.get("args", {}), default=str))
+    return tokens
+
+
+def _first_line(text: str, limit: int = 120) -> str:
+    line = next((part.strip() for part in str(text).splitlines() if part.strip()), "")
+    return line if len(line) <= limit else line[:limit - 1] + "…"
+
+
+def _snippet(text: str, limit: int = 160) -> str:
+    flat = " ".join(str(text).split())
+    return flat if len(flat) <= limit else flat[:limit - 1] + "…"
+
+
+def extractive_summarizer(summary: str, turns: List[List[object]], max_chars: int = 2000) -> str:
+    """
+    Summarize turns without a model call: one line per turn with the user's
+    request, the tools used and the start of the answer. Oldest lines are
+    dropped once the summary exceeds ``max_chars``.
+    """
+    lines = summary.splitlines() if summary else []
+    for turn in turns:
+        question = next((m.content for m in turn if isinstance(m, HumanMessage)), "")
+        answer = next((m.content for m in reversed(turn) if isinstance(m, AIMessage) and m.content), "")
+        tools = sorted({call["name"] for m in turn for call in (getattr(m, "tool_calls", None) or ())})
+        line = f"- User: {_snippet(question, 120)}"
+        if tools:
+            line += f" | tools: {', '.join(tools)}"
+        if answer:
+            line += f" | Agent: {_snippet(answer)}"
+        lines.append(line)
+    while lines and sum(len(line) + 1 for line in lines) > max_chars:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+def make_llm_summarizer(model, max_words: int = 200) -> Summarizer:
+    """Build a summarizer that asks ``model`` (a chat model) to fold turns into the summary."""
+    def summarize(summary: str, turns: List[List[object]]) -> str:
+        transcript = "\n".join(
+            f"{type(m).__name__.replace('Message', '')}: {_first_line(m.content, 400)}"
+            for turn in turns for m in turn if isinstance(m.content, str) and m.content
+        )
+        prompt = (
+            f"Update the running summary of a CRM support conversation in at most {max_words} words. "
+            f"Keep customer names, ticket numbers and open follow-ups.\n\n"
+            f"Current summary:\n{summary or '(none)'}\n\nNew turns:\n{transcript}"
+        )
+        return str(model.invoke([HumanMessage(content=prompt)]).content).strip()
+    return summarize
+
+
+class ConversationMemory:
+    """
+    Token-bounded message history for one conversation.
+
+    Args:
+        max_tokens: Budget for the messages returned by :meth:`messages` (summary included).
+        max_turns: Maximum number of verbatim turns, regardless of size.
+        keep_tool_outputs: Number of most recent turns whose tool outputs are kept in full.
+        summarize_batch: Turns evicted (and summarized) together once over budget.
+        summarizer: Folds evicted turns into the rolling summary; defaults to
+            :func:`extractive_summarizer`, which needs no model call.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 4000,
+        max_turns: int = 12,
+        keep_tool_outputs: int = 2,
+        summarize_batch: int = 4,
+        summarizer: Optional[Summarizer] = None,
+    ):
+        self.max_tokens = max_tokens
+        self.max_turns = max_turns
+        self.keep_tool_outputs = keep_tool_outputs
+        self.summarize_batch = summarize_batch
+        self.summarizer = summarizer or extractive_summarizer
+        self._lock = threading.RLock()
+        self._turns: List[List[object]] = []
+        self._turn_tokens: List[int] = []
+        self.summary = ""
+        self._summary_tokens = 0
+        self.turns_added = 0
+        self.turns_summarized = 0
+        self.tool_outputs_collapsed = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._turns.clear()
+            self._turn_tokens.clear()
+            self.summary = ""
+            self._summary_tokens = 0
+
+    @property
+    def tokens(self) -> int:
+        """Approximate tokens :meth:`messages` currently returns."""
+        with self._lock:
+            return self._summary_tokens + sum(self._turn_tokens)
+
+    def messages(self) -> List[object]:
+        """Messages to prepend to the next user message."""
+        with self._lock:
+            prefix = [SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}")] if self.summary else []
+            return prefix + [message for turn in self._turns for message in turn]
+
+    def add_turn(self, messages: Sequence[object]) -> None:
+        """Record one completed turn: the user message and everything the agent produced for it."""
+        turn = list(messages)
+        if not turn:
+            return
+        with self._lock:
+            self._turns.append(turn)
+            self._turn_tokens.append(sum(message_tokens(m) for m in turn))
+            self.turns_added += 1
+            aged = len(self._turns) - 1 - self.keep_tool_outputs
+            if aged >= 0:
+                self._collapse_tool_outputs(aged)
+            self._enforce_budget()
+
+    def _collapse_tool_outputs(self, index: int) -> None:
+        turn = self._turns[index]
+        names = {call["id"]: call["name"] for m in turn for call in (getattr(m, "tool_calls", None) or ())}
+        for position, message in enumerate(turn):
+            if not isinstance(message, ToolMessage) or message.additional_kwargs.get("collapsed"):
+                continue
+            name = message.name or names.get(message.tool_call_id, "tool")
+            reference = (
+                f"[Earlier {name} result omitted (~{message_tokens(message)} tokens): "
+                f"{_first_line(message.content)} Call {name} again if the details are needed.]"
+            )
+            turn[position] = ToolMessage(
+                content=reference, tool_call_id=message.tool_call_id, name=message.name,
+                additional_kwargs={"collapsed": True},
+            )
+            self.tool_outputs_collapsed += 1
+        self._turn_tokens[index] = sum(message_tokens(m) for m in turn)
+
+    def _enforce_budget(self) -> None:
+        # Always keep the latest turn so a follow-up question has its context
+        while len(self._turns) > 1 and (
+            len(self._turns) > self.max_turns or self._summary_tokens + sum(self._turn_tokens) > self.max_tokens
+        ):
+            count = min(max(self.summarize_batch, 1), len(self._turns) - 1)
+            evicted = self._turns[:count]
+            del self._turns[:count]
+            del self._turn_tokens[:count]
+            self.summary = self.summarizer(self.summary, evicted)
+            self._summary_tokens = message_tokens(SystemMessage(content=self.summary)) + 8 if self.summary else 0
+            self.turns_summarized += count
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "turns": len(self._turns),
+                "tokens": self._summary_tokens + sum(self._turn_tokens),
+                "summary_tokens": self._summary_tokens,
+                "turns_added": self.turns_added,
+                "turns_summarized": self.turns_summarized,
+                "tool_outputs_collapsed": self.tool_outputs_collapsed,
+            }
@@ -0,0 +1,106 @@
+"""
+Cursor-based pagination for case retrieval.
+
+Dataverse results are walked lazily page by page. When a tool response does
+not exhaust the result set, the live record iterator is parked in a
+:class:`CaseCursorStore` under a short continuation token, so a follow-up tool
+call resumes exactly where the previous one stopped without re-querying.
+"""
+
+import secrets
+import threading
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .cache import TTLCache
+
+
+def iter_records(case_batches: Iterable[List[Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+    """Flatten Dataverse page batches into a lazy stream of records."""
+    for batch in case_batches:
+        yield from batch
+
+
+@dataclass
+class CaseCursor:
+    """Position in a partially consumed case stream."""
+    customer_name: str
+    records: Iterator[Dict[str, Any]]
+    offset: int = 0
+    # Filter/order summary shown in every page header, e.g. " (status Active)"
+    scope: str = ""
+    # Records read ahead of ``offset`` (the look-ahead record, or rows handed back via ``unread``)
+    pending: List[Dict[str, Any]] = field(default_factory=list)
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+
+class CaseCursorStore:
+    """Process-local registry of open case cursors keyed by continuation token."""
+
+    def __init__(self, maxsize: int = 128, ttl: float = 600.0):
+        self._cursors = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def open(self, customer_name: str, records: Iterator[Dict[str, Any]], page_size: int,
+             scope: str = "") -> Tuple[List[Dict[str, Any]], int, Optional[str]]:
+        """
+        Read the first page from ``records``.
+
+        Returns ``(page, offset, token)`` where ``token`` is None if no more
+        records remain. ``scope`` is kept with the cursor for later page headers.
+        """
+        cursor = CaseCursor(customer_name=customer_name, records=records, scope=scope)
+        return self._advance(secrets.token_urlsafe(8), cursor, page_size)
+
+    def resume(self, token: str, page_size: int) -> Optional[Tuple[CaseCursor, List[Dict[str, Any]], int, Optional[str]]]:
+        """
+        Read the next page for ``token``.
+
+        Returns ``(cursor, page, offset, next_token)`` or None when the token is
+        unknown or has expired.
+        """
+        cursor = self._cursors.pop(token)
+        if cursor is None:
+            return None
+        # Tokens are single-use so a replayed "next page" call cannot skip ahead
+        page, offset, next_token = self._advance(secrets.token_urlsafe(8), cursor, page_size)
+        return cursor, page, offset, next_token
+
+    def unread(self, token: Optional[str], customer_name: str, records: List[Dict[str, Any]], offset: int,
+               scope: str = "") -> str:
+        """
+        Hand back the tail of a page that was read but not shown.
+
+        ``token`` is the one returned with the page (None if the stream was
+        exhausted); ``offset`` is the position of ``records[0]``. Returns the
+        token to continue from, which now starts with ``records``.
+        """
+        cursor = self._cursors.get(token) if token is not None else None
+        if cursor is None:
+            cursor = CaseCursor(customer_name=customer_name, records=iter(()), offset=offset + len(records), scope=scope)
+            token = secrets.token_urlsafe(8)
+        with cursor.lock:
+            cursor.pending[:0] = records
+            cursor.offset -= len(records)
+        self._cursors.set(token, cursor)
+        return token
+
+    def _advance(self, token: str, cursor: CaseCursor, page_size: int) -> Tuple[List[Dict[str, Any]], int, Optional[str]]:
+        with cursor.lock:
+            offset = cursor.offset
+            page = cursor.pending[:page_size]
+            del cursor.pending[:page_size]
+            page.extend(islice(cursor.records, page_size - len(page)))
+            cursor.offset += len(page)
+            # Read one record ahead so an exhausted stream never hands out a token
+            if not cursor.pending and len(page) == page_size:
+                lookahead = next(cursor.records, None)
+                if lookahead is not None:
+                    cursor.pending.append(lookahead)
+            if not cursor.pending:
+                return page, offset, None
+        self._cursors.set(token, cursor)
+        return page, offset, token
+
+    def __len__(self) -> int:
+        return len(self._cursors)
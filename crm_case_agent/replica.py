@@ -0,0 +1,364 @@
+"""
+Local SQLite replica of the incident table.
+
+Keeps the case columns (including the detail-only description, state and owner) in an indexed SQLite table,
+synced incrementally from Dataverse with a ``modifiedon`` watermark, so case
+lookups for read-heavy agent traffic become local queries instead of network
+calls. Rows are handed back in the same shape Dataverse returns them, so the
+decoder and tools work unchanged.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .cache import normalize_customer_name
+from .utility import CASE_DETAIL_SELECT, CASE_EXPAND
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS incident (
+    incidentid TEXT PRIMARY KEY,
+    title TEXT,
+    ticketnumber TEXT,
+    prioritycode INTEGER,
+    statuscode INTEGER,
+    createdon TEXT,
+    modifiedon TEXT,
+    description TEXT,
+    customerid TEXT,
+    customer_kind TEXT,
+    customer_name TEXT,
+    customer_key TEXT,
+    statecode INTEGER,
+    ownerid TEXT,
+    owner_name TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_incident_customer_key ON incident (customer_key);
+CREATE INDEX IF NOT EXISTS ix_incident_customerid ON incident (customerid);
+CREATE INDEX IF NOT EXISTS ix_incident_statuscode ON incident (statuscode);
+CREATE INDEX IF NOT EXISTS ix_incident_modifiedon ON incident (modifiedon);
+CREATE INDEX IF NOT EXISTS ix_incident_ticketnumber ON incident (ticketnumber COLLATE NOCASE);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+_COLUMNS = (
+    "incidentid", "title", "ticketnumber", "prioritycode", "statuscode", "createdon",
+    "modifiedon", "description", "customerid", "customer_kind", "customer_name", "customer_key",
+    "statecode", "ownerid", "owner_name",
+)
+
+# Columns added after the first release, with their types, for databases created before them
+_ADDED_COLUMNS = (("statecode", "INTEGER"), ("ownerid", "TEXT"), ("owner_name", "TEXT"))
+
+_OWNER_NAME = "_ownerid_value@OData.Community.Display.V1.FormattedValue"
+
+# SQLite limits bound parameters per statement; stay well below it
+_MAX_PARAMS = 500
+
+
+def _casefold_collation(left: str, right: str) -> int:
+    # Same ordering as CaseFilter.sort, which casefolds; NOCASE only folds ASCII
+    left, right = left.casefold(), right.casefold()
+    return (left > right) - (left < right)
+
+
+def _keyset_condition(exprs: List[str], descending: List[bool]) -> str:
+    # (a > ?) OR (a IS ? AND b > ?) OR ... with per-column direction; IS keeps NULL keys equal
+    branches = []
+    for i, (expr, desc) in enumerate(zip(exprs, descending)):
+        equal = [f"{prior} IS ?" for prior in exprs[:i]]
+        branches.append("(" + " AND ".join(equal + [f"{expr} {'<' if desc else '>'} ?"]) + ")")
+    return "(" + " OR ".join(branches) + ")"
+
+
+def _keyset_params(last_key: tuple) -> List[Any]:
+    params: List[Any] = []
+    for i in range(len(last_key)):
+        params.extend(last_key[:i + 1])
+    return params
+
+
+class CaseReplica:
+    """
+    Incrementally synced local copy of Dataverse incidents.
+
+    Args:
+        path: SQLite database path; ``":memory:"`` keeps the replica in process.
+        page_size: Dataverse page size used while syncing.
+        max_age: Seconds after the last successful sync in this process beyond
+            which the replica reports itself not ready, so the tools fall back
+            to Dataverse while background sync is failing. None disables it.
+
+    Call :meth:`sync` once before serving reads (``is_ready`` turns True), then
+    keep it fresh with :meth:`start_background_sync`. Deleted incidents are not
+    visible to a ``modifiedon`` watermark; :meth:`reconcile` removes them by
+    comparing ids and is run every ``reconcile_every`` background cycles.
+    """
+
+    def __init__(self, path: str = ":memory:", page_size: int = 5000, max_age: Optional[float] = None):
+        self.path = path
+        self.page_size = page_size
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.create_collation("CASEFOLD", _casefold_collation)
+        if path != ":memory:":
+            self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        self._migrate()
+        self._conn.commit()
+        self._sync_thread: Optional[threading.Thread] = None
+        self._stop_sync = threading.Event()
+        self.last_sync_at: Optional[float] = None
+        self.last_sync_seconds: Optional[float] = None
+        self.last_sync_rows = 0
+
+    def _migrate(self) -> None:
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(incident)")}
+        missing = [(name, kind) for name, kind in _ADDED_COLUMNS if name not in existing]
+        for name, kind in missing:
+            self._conn.execute(f"ALTER TABLE incident ADD COLUMN {name} {kind}")
+        if missing:
+            # Rows synced before the columns existed lack them; the next sync re-pulls everything
+            self._conn.execute("DELETE FROM sync_state WHERE key = 'watermark'")
+
+    @property
+    def watermark(self) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM sync_state WHERE key = 'watermark'").fetchone()
+        return row[0] if row else None
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the last successful sync in this process, or None before the first one."""
+        return None if self.last_sync_at is None else time.time() - self.last_sync_at
+
+    @property
+    def is_ready(self) -> bool:
+        if self.max_age is not None:
+            # A watermark left on disk by an earlier process says nothing about freshness
+            age = self.age
+            return age is not None and age <= self.max_age
+        return self.watermark is not None or self.last_sync_at is not None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM incident").fetchone()[0]
+
+    # ---------------------------------------------------------------- sync
+
+    def sync(self, client) -> int:
+        """Pull incidents modified since the watermark (everything on first run). Returns rows applied."""
+        started = time.perf_counter()
+        watermark = self.watermark
+        batches = client.get(
+            "incident",
+            select=CASE_DETAIL_SELECT,
+            expand=CASE_EXPAND,
+            filter=f"modifiedon ge {watermark}" if watermark else None,
+            orderby=["modifiedon asc"],
+            page_size=self.page_size,
+        )
+        applied = 0
+        for batch in batches:
+            applied += self.apply(batch)
+
+        self.last_sync_at = time.time()
+        self.last_sync_seconds = time.perf_counter() - started
+        self.last_sync_rows = applied
+        return applied
+
+    def apply(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Upsert raw Dataverse incident records and advance the watermark."""
+        rows = [self._to_row(record) for record in records if record.get("incidentid")]
+        if not rows:
+            return 0
+        latest = max((row[6] for row in rows if row[6]), default=None)
+        placeholders = ", ".join("?" for _ in _COLUMNS)
+        # Upsert rather than REPLACE so rowids stay stable for in-flight keyset reads
+        updates = ", ".join(f"{column} = excluded.{column}" for column in _COLUMNS[1:])
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO incident ({', '.join(_COLUMNS)}) VALUES ({placeholders}) "
+                f"ON CONFLICT(incidentid) DO UPDATE SET {updates}",
+                rows,
+            )
+            if latest:
+                self._conn.execute(
+                    "INSERT INTO sync_state (key, value) VALUES ('watermark', ?) "
+                    "ON CONFLICT(key) DO UPDATE SET value = MAX(value, excluded.value)",
+                    (latest,),
+                )
+        return len(rows)
+
+    def reconcile(self, client) -> int:
+        """Delete local incidents that no longer exist in Dataverse. Returns rows removed."""
+        remote_ids = set()
+        for batch in client.get("incident", select=["incidentid"], page_size=self.page_size):
+            remote_ids.update(record["incidentid"] for record in batch if record.get("incidentid"))
+        with self._lock:
+            local_ids = {row[0] for row in self._conn.execute("SELECT incidentid FROM incident")}
+            stale = list(local_ids - remote_ids)
+            with self._conn:
+                for start in range(0, len(stale), _MAX_PARAMS):
+                    chunk = stale[start:start + _MAX_PARAMS]
+                    self._conn.execute(
+                        f"DELETE FROM incident WHERE incidentid IN ({', '.join('?' for _ in chunk)})", chunk
+                    )
+        return len(stale)
+
+    def start_background_sync(self, client, interval: float = 30.0, reconcile_every: int = 20) -> threading.Thread:
+        """Sync every ``interval`` seconds on a daemon thread."""
+        def loop():
+            cycles = 0
+            while not self._stop_sync.wait(interval):
+                cycles += 1
+                try:
+                    self.sync(client)
+                    if reconcile_every and cycles % reconcile_every == 0:
+                        self.reconcile(client)
+                except Exception as e:
+                    print(f"[WARNING] Case replica sync failed: {e}")
+
+        self._stop_sync.clear()
+        self._sync_thread = threading.Thread(target=loop, name="case-replica-sync", daemon=True)
+        self._sync_thread.start()
+        return self._sync_thread
+
+    def stop_background_sync(self) -> None:
+        self._stop_sync.set()
+
+    def close(self) -> None:
+        self.stop_background_sync()
+        with self._lock:
+            self._conn.close()
+
+    # ---------------------------------------------------------------- reads
+
+    def execute(self, sql: str, params: Iterable[Any] = ()) -> List[tuple]:
+        """Run a read-only SQL query against the replica and return all rows."""
+        with self._lock:
+            return self._conn.execute(sql, tuple(params)).fetchall()
+
+    def get_case(self, ticket_number: str) -> Optional[Dict[str, Any]]:
+        """Local equivalent of ``utility.fetch_case_details``."""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM incident WHERE ticketnumber = ? COLLATE NOCASE LIMIT 1",
+                (ticket_number.strip(),),
+            ).fetchone()
+        return self._to_record(row) if row else None
+
+    def get_customer_cases(self, customer_name, top=None, page_size=50, customer_ids=None,
+                           case_filter=None, decoder=None) -> Iterator[List[Dict[str, Any]]]:
+        """Local equivalent of ``utility.get_customer_cases``; yields pages of Dataverse-shaped records."""
+        if customer_ids:
+            return self._query("customerid", list(customer_ids), top, page_size, case_filter, decoder)
+        return self._query("customer_key", [normalize_customer_name(customer_name)], top, page_size, case_filter, decoder)
+
+    def get_cases_for_customers(self, customer_names, page_size=50, customer_ids=None) -> Iterator[List[Dict[str, Any]]]:
+        """Local equivalent of ``utility.get_cases_for_customers``."""
+        keys = list(dict.fromkeys(normalize_customer_name(name) for name in customer_names if name and name.strip()))
+        yield from self._query("customer_key", keys, None, page_size)
+        if customer_ids:
+            yield from self._query("customerid", list(dict.fromkeys(customer_ids)), None, page_size)
+
+    def _query(self, column: str, values: List[str], top: Optional[int], page_size: int,
+               case_filter=None, decoder=None) -> Iterator[List[Dict[str, Any]]]:
+        # Keyset pagination: the lock is only held per page, never across yields,
+        # so parked cursors cannot block the sync thread
+        extra, extra_params = case_filter.to_sql(decoder) if case_filter is not None else ([], [])
+        order = case_filter.order_by if case_filter is not None else ()
+        # Ordered reads page on (sort key, rowid). Each column is preceded by a
+        # not-null flag so NULLs sort low, as in Dataverse and CaseFilter.sort
+        sort_exprs, descending = [], []
+        for name, desc in order:
+            sort_exprs += [f"({name} IS NOT NULL)", f"{name} COLLATE CASEFOLD"]
+            descending += [desc, desc]
+        sort_exprs.append("rowid")
+        descending.append(False)
+        order_sql = ", ".join(f"{expr} {'DESC' if desc else 'ASC'}" for expr, desc in zip(sort_exprs, descending))
+        remaining = top
+        for start in range(0, len(values), _MAX_PARAMS):
+            chunk = values[start:start + _MAX_PARAMS]
+            last_key = None
+            while remaining is None or remaining > 0:
+                limit = page_size if remaining is None else min(page_size, remaining)
+                where = [f"{column} IN ({', '.join('?' for _ in chunk)})", *extra]
+                params = [*chunk, *extra_params]
+                if last_key is not None:
+                    where.append(_keyset_condition(sort_exprs, descending))
+                    params.extend(_keyset_params(last_key))
+                with self._lock:
+                    rows = self._conn.execute(
+                        f"SELECT {', '.join(sort_exprs)}, {', '.join(_COLUMNS)} FROM incident "
+                        f"WHERE {' AND '.join(where)} ORDER BY {order_sql} LIMIT ?",
+                        (*params, limit),
+                    ).fetchall()
+                if not rows:
+                    break
+                last_key = rows[-1][:len(sort_exprs)]
+                if remaining is not None:
+                    remaining -= len(rows)
+                yield [self._to_record(row[len(sort_exprs):]) for row in rows]
+                if len(rows) < limit:
+                    break
+
+    @staticmethod
+    def _to_row(record: Dict[str, Any]) -> tuple:
+        contact = record.get("customerid_contact")
+        account = record.get("customerid_account")
+        if contact:
+            kind, name = "contact", contact.get("fullname")
+        elif account:
+            kind, name = "account", account.get("name")
+        else:
+            kind, name = None, None
+        return (
+            record.get("incidentid"),
+            record.get("title"),
+            record.get("ticketnumber"),
+            record.get("prioritycode"),
+            record.get("statuscode"),
+            record.get("createdon"),
+            record.get("modifiedon"),
+            record.get("description"),
+            record.get("_customerid_value"),
+            kind,
+            name,
+            normalize_customer_name(name) if name else None,
+            record.get("statecode"),
+            record.get("_ownerid_value"),
+            record.get(_OWNER_NAME),
+        )
+
+    @staticmethod
+    def _to_record(row: tuple) -> Dict[str, Any]:
+        (incidentid, title, ticketnumber, prioritycode, statuscode, createdon,
+         modifiedon, description, customerid, kind, name, _, statecode, ownerid, owner_name) = row
+        record = {
+            "incidentid": incidentid,
+            "title": title,
+            "ticketnumber": ticketnumber,
+            "prioritycode": prioritycode,
+            "statuscode": statuscode,
+            "statecode": statecode,
+            "createdon": createdon,
+            "modifiedon": modifiedon,
+            "description": description,
+            "_customerid_value": customerid,
+            "_ownerid_value": ownerid,
+            "customerid_contact": None,
+            "customerid_account": None,
+        }
+        if owner_name:
+            record[_OWNER_NAME] = owner_name
+        if kind == "contact":
+            record["customerid_contact"] = {"fullname": name}
+        elif kind == "account":
+            record["customerid_account"] = {"name": name}
+        return record
@@ -0,0 +1,170 @@
+"""
+Deterministic fast path for simple case lookups.
+
+Most questions are of the form "Get me all cases for customer X". Answering
+them through the agent costs two model round trips (pick the tool, then
+summarize its result) for an answer that is just the tool's output.
+:class:`FastPathRouter` recognises such requests with anchored patterns and
+a conservative check of the extracted customer name, so ``CRMCaseAgent`` can
+call ``retrieve_customer_cases`` directly and return its formatted output.
+Anything with filters, several customers, follow-up wording, dates or a name
+the customer index cannot resolve confidently goes to the full agent, and so
+does any tool result that needs interpretation (no cases, throttling, more
+pages); see :func:`fast_path_answer`.
+"""
+
+import re
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Pattern, Sequence
+
+from .customer_index import CustomerIndex
+
+# Whole-query templates for "list the cases of one customer"; trailing punctuation is stripped first
+DEFAULT_PATTERNS = (
+    r"(?:please\s+)?(?:can you\s+|could you\s+)?(?:get|show|list|find|fetch|retrieve|give|pull up)(?:\s+me)?"
+    r"(?:\s+(?:all|the|all the|all of the))?\s+cases\s+(?:for|of|from)\s+(?:the\s+)?"
+    r"(?:(?:customer|account|contact|company|client)\s+)?(?P<name>.+)",
+    r"what\s+(?:are\s+the\s+)?cases\s+(?:does|do)\s+(?:(?:customer|account|contact)\s+)?(?P<name>.+?)\s+have",
+    r"(?:all\s+)?cases\s+(?:for|of)\s+(?:(?:customer|account|contact)\s+)?(?P<name>.+)",
+)
+
+# Words that signal filters, aggregates, several customers or a follow-up; such queries need the model
+_UNSURE_WORDS = frozenset("""
+    and or with without where which that who whose since after before between during except but not only
+    open opened closed active resolved cancelled canceled pending high low normal priority priorities status
+    created modified updated last this next previous today yesterday week weeks month months year years
+    how many count number total statistics stats details detail description ticket tickets page more
+    it its their them those these same other again latest recent newest oldest sorted sort order top first
+    in on at by to from for of per within until till ago about around
+    please thanks thank pls
+    day days hour hours quarter quarters q1 q2 q3 q4 ytd mtd
+    january february march april may june july august september october november december
+    jan feb mar apr jun jul aug sep sept oct nov dec
+    monday tuesday wednesday thursday friday saturday sunday
+""".split())
+
+# Years and dates in a "name" mean a date filter the fast path cannot apply
+_DATE_TOKEN = re.compile(r"^(?:(?:19|20)\d\d|\d{1,4}[-/]\d{1,2}(?:[-/]\d{1,4})?)$")
+
+# Tool output the model needs to act on rather than the user to read
+_NEEDS_AGENT = re.compile(r"^(?:Error|No cases found|Dataverse is temporarily throttling)|continuation_token=|More cases are available")
+_TOKEN_NOTE = re.compile(r"^\(~\d+ tokens\)$")
+
+_NAME_CHARS = re.compile(r"^[\w][\w .&'\-]*$", re.UNICODE)
+
+
+@dataclass(frozen=True)
+class FastPathMatch:
+    """A query the router is confident it can answer with a direct tool call."""
+    customer_name: str
+    pattern: int
+
+
+class FastPathRouter:
+    """
+    Pattern router in front of :meth:`CRMCaseAgent.run` for single-customer case lookups.
+
+    Args:
+        patterns: Regexes matched against the whole query (case-insensitive);
+            each must capture the customer in a ``name`` group.
+        max_name_words: Longer captured names are treated as sentences, not names.
+        min_score: When a warm :class:`CustomerIndex` is given, the name must
+            resolve with at least this score, else the query goes to the agent.
+        require_index: Only take the fast path for names the index resolves.
+    """
+
+    def __init__(self, patterns: Sequence[str] = DEFAULT_PATTERNS, max_name_words: int = 6,
+                 min_score: float = 0.85, require_index: bool = False):
+        self.patterns = [re.compile(p, re.IGNORECASE) for p in patterns]
+        self.max_name_words = max_name_words
+        self.min_score = min_score
+        self.require_index = require_index
+        self._lock = threading.Lock()
+        self.queries = 0
+        self.hits = 0
+        self.fallbacks = 0
+        self.fast_seconds = 0.0
+        self.agent_seconds = 0.0
+        self.agent_runs = 0
+
+    def _name(self, pattern: Pattern, query: str) -> Optional[str]:
+        match = pattern.fullmatch(query)
+        if not match:
+            return None
+        name = match.group("name").strip().strip("\"'“”‘’").strip()
+        if not name or not _NAME_CHARS.match(name):
+            return None
+        words = name.split()
+        if len(words) > self.max_name_words:
+            return None
+        for word in words:
+            word = word.strip(".,").casefold()
+            if word in _UNSURE_WORDS or _DATE_TOKEN.match(word):
+                return None
+        return name
+
+    def match(self, query: str, customer_index: Optional[CustomerIndex] = None) -> Optional[FastPathMatch]:
+        """The customer to look up if ``query`` is a plain single-customer case listing, else None."""
+        text = " ".join(query.split()).rstrip("?.! ")
+        if not text or len(text) > 200:
+            return None
+        for number, pattern in enumerate(self.patterns):
+            name = self._name(pattern, text)
+            if name is None:
+                continue
+            if customer_index is not None and customer_index.is_warm:
+                matches = customer_index.resolve(name)
+                if not matches or matches[0].score < self.min_score:
+                    return None
+            elif self.require_index:
+                return None
+            return FastPathMatch(customer_name=name, pattern=number)
+        return None
+
+    def record(self, fast: bool, seconds: float) -> None:
+        """Count one routed query and how long it took on the path it took."""
+        with self._lock:
+            self.queries += 1
+            if fast:
+                self.hits += 1
+                self.fast_seconds += seconds
+            else:
+                self.fallbacks += 1
+
+    def record_agent_run(self, seconds: float) -> None:
+        """Time of a full agent run, the baseline a fast-path hit is compared against."""
+        with self._lock:
+            self.agent_runs += 1
+            self.agent_seconds += seconds
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit rate, average latency per path and the estimated latency saved by the fast path."""
+        with self._lock:
+            avg_fast = self.fast_seconds / self.hits if self.hits else 0.0
+            avg_agent = self.agent_seconds / self.agent_runs if self.agent_runs else None
+            saved = max(avg_agent - avg_fast, 0.0) * self.hits if avg_agent is not None else None
+            return {
+                "queries": self.queries,
+                "fast_path_hits": self.hits,
+                "fallbacks": self.fallbacks,
+                "hit_rate": round(self.hits / self.queries, 3) if self.queries else 0.0,
+                "avg_fast_ms": round(avg_fast * 1000, 2),
+                "avg_agent_ms": round(avg_agent * 1000, 2) if avg_agent is not None else None,
+                "latency_saved_ms": round(saved * 1000, 1) if saved is not None else None,
+            }
+
+
+def fast_path_answer(result: str) -> Optional[str]:
+    """
+    The text to show the user for a fast-path tool result, or None to hand the
+    query to the agent instead.
+
+    Results the model is meant to act on (errors, no matches, throttling, a
+    continuation token or rows held back for another page) go to the agent;
+    otherwise the model-only ``(~N tokens)`` note is dropped.
+    """
+    if _NEEDS_AGENT.search(result):
+        return None
+    lines = [line for line in result.splitlines() if not _TOKEN_NOTE.match(line.strip())]
+    return "\n".join(lines).rstrip() + "\n"
@@ -0,0 +1,191 @@
+"""
+Multi-session async service around one :class:`CRMCaseAgent`.
+
+Many operators are served from one process: the compiled agent graph, the LLM
+client and the Dataverse connections are shared, while each session keeps its
+own bounded :class:`ConversationMemory`. Turns within a session run one at a
+time; different sessions run concurrently.
+"""
+
+import asyncio
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from .cache import TTLCache
+from .memory import ConversationMemory
+
+
+class DataverseClientPool:
+    """
+    Thread-safe pool of ``DataverseClient`` instances behind the ``get`` surface.
+
+    Each ``get`` call is served by the least busy client. A client is locked
+    only while it fetches one page, not while a page is being rendered or
+    while a paged result sits parked in a cursor. A lazy result keeps using
+    the client that started it, since paging state lives in that client's
+    session.
+
+    Args:
+        factory: Zero-argument callable returning a new client (e.g. a lambda
+            around ``DataverseClient(url, credential)``).
+        size: Number of clients, i.e. the maximum concurrent Dataverse requests.
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int = 4):
+        if size <= 0:
+            raise ValueError("size must be a positive integer")
+        self._clients = [factory() for _ in range(size)]
+        self._locks = [threading.Lock() for _ in range(size)]
+        self._waiting = [0] * size
+        self._state_lock = threading.Lock()
+        self.requests = 0
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    @contextmanager
+    def _lease(self, index: Optional[int] = None) -> Iterator[int]:
+        with self._state_lock:
+            if index is None:
+                index = min(range(len(self._clients)), key=lambda i: (self._locks[i].locked(), self._waiting[i]))
+            self._waiting[index] += 1
+        try:
+            with self._locks[index]:
+                yield index
+        finally:
+            with self._state_lock:
+                self._waiting[index] -= 1
+
+    def get(self, table, record_id=None, **kwargs):
+        with self._lease() as index:
+            with self._state_lock:
+                self.requests += 1
+            result = self._clients[index].get(table, record_id, **kwargs)
+            if record_id is not None:
+                return result
+            pages = iter(result)
+        return self._paged(index, pages)
+
+    def _paged(self, index: int, pages: Iterator[List[Dict[str, Any]]]) -> Iterator[List[Dict[str, Any]]]:
+        while True:
+            with self._lease(index):
+                page = next(pages, None)
+            if page is None:
+                return
+            yield page
+
+    def __getattr__(self, name: str) -> Any:
+        # Other SDK surfaces (e.g. ``query``) are not pooled; they use the first client
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._clients[0], name)
+
+    def close(self) -> None:
+        for client in self._clients:
+            close = getattr(client, "close", None)
+            if close is not None:
+                close()
+
+
+@dataclass
+class CRMSession:
+    """Per-operator conversation state."""
+    session_id: str
+    memory: ConversationMemory
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False)
+    created_at: float = field(default_factory=time.time)
+    last_used: float = field(default_factory=time.time)
+    turns: int = 0
+
+
+class CRMSessionManager:
+    """
+    Serves concurrent sessions from one shared :class:`CRMCaseAgent`.
+
+    Args:
+        agent: The agent whose compiled graph, model client, Dataverse client
+            (ideally a :class:`DataverseClientPool`) and caches every session shares.
+        max_sessions: Least recently used sessions beyond this are dropped.
+        idle_timeout: Seconds after which an unused session expires.
+        max_concurrency: Optional cap on turns in flight across all sessions.
+        memory_factory: Builds the memory for each new session.
+    """
+
+    def __init__(
+        self,
+        agent,
+        max_sessions: int = 1000,
+        idle_timeout: float = 1800.0,
+        max_concurrency: Optional[int] = None,
+        memory_factory: Callable[[], ConversationMemory] = ConversationMemory,
+    ):
+        self.agent = agent
+        self.memory_factory = memory_factory
+        self._sessions = TTLCache(maxsize=max_sessions, ttl=idle_timeout)
+        self._create_lock = threading.Lock()
+        self._semaphore = asyncio.Semaphore(max_concurrency) if max_concurrency else None
+        self.turns = 0
+        self.in_flight = 0
+
+    def session(self, session_id: Optional[str] = None) -> CRMSession:
+        """Return the session for ``session_id``, creating it (with a new id if None)."""
+        with self._create_lock:
+            session_id = session_id or secrets.token_urlsafe(8)
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = CRMSession(session_id=session_id, memory=self.memory_factory())
+            # Re-set on every use so the TTL measures idle time
+            self._sessions.set(session_id, session)
+            return session
+
+    def close(self, session_id: str) -> None:
+        self._sessions.pop(session_id)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    async def arun(self, session_id: str, query: str) -> str:
+        """Answer ``query`` within ``session_id``'s conversation."""
+        session = self.session(session_id)
+        async with session.lock:
+            if self._semaphore is None:
+                return await self._turn(session, self.agent.arun(query, memory=session.memory))
+            async with self._semaphore:
+                return await self._turn(session, self.agent.arun(query, memory=session.memory))
+
+    async def astream(self, session_id: str, query: str) -> AsyncIterator[str]:
+        """Stream the answer to ``query`` within ``session_id``'s conversation."""
+        session = self.session(session_id)
+        async with session.lock:
+            if self._semaphore is not None:
+                await self._semaphore.acquire()
+            self.in_flight += 1
+            try:
+                async for text in self.agent.astream(query, memory=session.memory):
+                    yield text
+                self._record(session)
+            finally:
+                self.in_flight -= 1
+                if self._semaphore is not None:
+                    self._semaphore.release()
+
+    async def _turn(self, session: CRMSession, turn) -> str:
+        self.in_flight += 1
+        try:
+            result = await turn
+            self._record(session)
+            return result
+        finally:
+            self.in_flight -= 1
+
+    def _record(self, session: CRMSession) -> None:
+        session.turns += 1
+        session.last_used = time.time()
+        self.turns += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sessions": len(self._sessions), "turns": self.turns, "in_flight": self.in_flight}
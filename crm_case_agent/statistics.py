@@ -0,0 +1,360 @@
+"""
+Aggregate case statistics without pulling rows through the agent.
+
+Counts cases grouped by status, status reason, priority, customer and/or a
+``createdon`` time bucket. Aggregation runs as close to the data as the
+environment allows:
+
+1. the local :class:`~crm_case_agent.replica.CaseReplica` (SQL ``GROUP BY``),
+2. a FetchXML aggregate query (``client.query.fetchxml``, SDK 1.x),
+3. a streamed scan over only the grouping columns, folded client-side and
+   capped at ``max_scan_rows`` (the result is then flagged as partial).
+
+Weeks are ISO 8601 weeks (``2024-W09``, Monday start) on every path: the
+replica and FetchXML paths group by UTC day and fold days into ISO weeks,
+since neither SQLite's ``%W`` nor FetchXML's ``week`` grouping uses that
+convention.
+
+Results are memoized for a short time in a :class:`~crm_case_agent.cache.TTLCache`.
+"""
+
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import quoteattr
+
+from .cache import TTLCache, normalize_customer_name
+from .decoding import CaseDecoder, FORMATTED_VALUE, default_decoder
+from .filters import normalize_timestamp
+from .utility import CASE_EXPAND, _customer_filter, _customer_id_filter, get_customer_name_from_case
+
+GROUP_BY_OPTIONS = ("status", "status_reason", "priority", "customer")
+TIME_BUCKETS = ("day", "week", "month", "quarter", "year")
+
+# Default cap on rows read by the client-side scan fallback
+MAX_SCAN_ROWS = 200_000
+
+# FetchXML dategrouping parts that make up each bucket label; weeks are folded from days
+_BUCKET_PARTS = {
+    "year": ("year",),
+    "quarter": ("year", "quarter"),
+    "month": ("year", "month"),
+    "week": ("year", "month", "day"),
+    "day": ("year", "month", "day"),
+}
+
+# SQLite expressions for the same buckets over ISO-8601 createdon strings
+_SQL_BUCKETS = {
+    "year": "strftime('%Y', createdon)",
+    "quarter": "strftime('%Y', createdon) || '-Q' || ((CAST(strftime('%m', createdon) AS INTEGER) + 2) / 3)",
+    "month": "strftime('%Y-%m', createdon)",
+    "week": "strftime('%Y-%m-%d', createdon)",
+    "day": "strftime('%Y-%m-%d', createdon)",
+}
+
+
+def bucket_label(timestamp: Optional[str], bucket: str) -> str:
+    """Label an ISO timestamp with its time bucket (e.g. ``2024-03`` for month)."""
+    if not timestamp:
+        return "N/A"
+    moment = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    if bucket == "year":
+        return f"{moment.year}"
+    if bucket == "quarter":
+        return f"{moment.year}-Q{(moment.month + 2) // 3}"
+    if bucket == "month":
+        return f"{moment.year}-{moment.month:02d}"
+    if bucket == "week":
+        year, week, _ = moment.isocalendar()
+        return f"{year}-W{week:02d}"
+    return moment.strftime("%Y-%m-%d")
+
+
+def _validate(group_by: Sequence[str], time_bucket: Optional[str]) -> Tuple[str, ...]:
+    dimensions = tuple(dict.fromkeys(group_by or ()))
+    unknown = [d for d in dimensions if d not in GROUP_BY_OPTIONS]
+    if unknown:
+        raise ValueError(f"Unsupported group_by value(s) {unknown}; choose from {list(GROUP_BY_OPTIONS)}")
+    if time_bucket is not None and time_bucket not in TIME_BUCKETS:
+        raise ValueError(f"Unsupported time_bucket {time_bucket!r}; choose from {list(TIME_BUCKETS)}")
+    return dimensions
+
+
+def build_aggregate_fetchxml(
+    group_by: Sequence[str],
+    time_bucket: Optional[str] = None,
+    customer_name: Optional[str] = None,
+    customer_ids: Optional[Sequence[str]] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+) -> str:
+    """Build a FetchXML aggregate query counting incidents per group."""
+    dimensions = _validate(group_by, time_bucket)
+    attributes = ['<attribute name="incidentid" alias="case_count" aggregate="count" />']
+    column_for = {"status": "statecode", "status_reason": "statuscode", "priority": "prioritycode", "customer": "customerid"}
+    for dimension in dimensions:
+        column = column_for[dimension]
+        attributes.append(f'<attribute name="{column}" alias="{dimension}" groupby="true" />')
+    for part in _BUCKET_PARTS.get(time_bucket, ()):
+        # Group in UTC, like the replica and scan paths, rather than the calling user's time zone
+        attributes.append(
+            f'<attribute name="createdon" alias="bucket_{part}" groupby="true" dategrouping="{part}" usertimezone="false" />'
+        )
+
+    conditions = []
+    links = []
+    if customer_ids:
+        values = "".join(f"<value>{uuid.UUID(str(customer_id))}</value>" for customer_id in customer_ids)
+        conditions.append(f'<condition attribute="customerid" operator="in">{values}</condition>')
+    elif customer_name:
+        links.append('<link-entity name="account" from="accountid" to="customerid" link-type="outer" alias="acct" />')
+        links.append('<link-entity name="contact" from="contactid" to="customerid" link-type="outer" alias="cont" />')
+        name = quoteattr(customer_name)
+        conditions.append(
+            '<filter type="or">'
+            f'<condition entityname="acct" attribute="name" operator="eq" value={name} />'
+            f'<condition entityname="cont" attribute="fullname" operator="eq" value={name} />'
+            '</filter>'
+        )
+    if created_after:
+        conditions.append(f'<condition attribute="createdon" operator="ge" value="{normalize_timestamp(created_after)}" />')
+    if created_before:
+        conditions.append(f'<condition attribute="createdon" operator="lt" value="{normalize_timestamp(created_before)}" />')
+
+    filter_xml = f'<filter type="and">{"".join(conditions)}</filter>' if conditions else ""
+    return (
+        '<fetch aggregate="true">'
+        '<entity name="incident">'
+        f'{"".join(attributes)}{filter_xml}{"".join(links)}'
+        '</entity>'
+        '</fetch>'
+    )
+
+
+class CaseStatistics:
+    """
+    Aggregated case counts for one query.
+
+    Attributes:
+        dimensions: Grouping columns in output order (time bucket last, as ``period``).
+        rows: ``(group values..., count)`` tuples sorted by descending count.
+        source: Which backend produced the numbers (``replica``, ``fetchxml`` or ``scan``).
+        complete: False when a scan stopped at its row cap, so counts are lower bounds.
+    """
+
+    def __init__(self, dimensions: Sequence[str], counts: Counter, source: str, complete: bool = True):
+        self.dimensions = tuple(dimensions)
+        self.rows = sorted(((*key, count) for key, count in counts.items()), key=lambda row: (-row[-1], row[:-1]))
+        self.total = sum(counts.values())
+        self.source = source
+        self.complete = complete
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        return [dict(zip(self.dimensions + ("count",), row)) for row in self.rows]
+
+    def render(self) -> str:
+        """Render as a compact markdown table."""
+        caveat = "" if self.complete else (
+            f"\nPartial result: only the first {self.total} matching cases were counted, "
+            f"so every count is a lower bound. Narrow the date range or customer for exact numbers.\n"
+        )
+        if not self.dimensions:
+            return f"Total cases: {self.total}\n" + caveat
+        headers = [d.replace("_", " ").title() for d in self.dimensions] + ["Count"]
+        lines = [
+            "| " + " | ".join(headers) + " |",
+            "|" + "---|" * len(headers),
+        ]
+        lines.extend("| " + " | ".join(str(value) for value in row) + " |" for row in self.rows)
+        lines.append(f"\nTotal cases: {self.total}")
+        return "\n".join(lines) + "\n" + caveat
+
+
+def _label(decoder: CaseDecoder, dimension: str, record: Dict[str, Any], column: str) -> str:
+    formatted = record.get(column + FORMATTED_VALUE)
+    if formatted:
+        return formatted
+    raw = record.get(column)
+    if dimension == "status":
+        return decoder.status_label(raw)
+    if dimension == "status_reason":
+        return decoder.status_reason_label(raw)
+    if dimension == "priority":
+        return decoder.priority_label(raw)
+    return raw if raw is not None else "N/A"
+
+
+def _from_replica(replica, dimensions, time_bucket, customer_name, customer_ids, created_after, created_before, decoder) -> Counter:
+    select = []
+    for dimension in dimensions:
+        select.append({"status": "statuscode", "status_reason": "statuscode",
+                       "priority": "prioritycode", "customer": "customer_name"}[dimension])
+    if time_bucket:
+        select.append(_SQL_BUCKETS[time_bucket])
+    columns = list(dict.fromkeys(select))
+
+    where, params = [], []
+    if customer_ids:
+        where.append(f"customerid IN ({', '.join('?' for _ in customer_ids)})")
+        params.extend(customer_ids)
+    elif customer_name:
+        where.append("customer_key = ?")
+        params.append(normalize_customer_name(customer_name))
+    if created_after:
+        where.append("createdon >= ?")
+        params.append(normalize_timestamp(created_after))
+    if created_before:
+        where.append("createdon < ?")
+        params.append(normalize_timestamp(created_before))
+
+    sql = f"SELECT {', '.join(columns + ['COUNT(*)'])} FROM incident"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    if columns:
+        sql += f" GROUP BY {', '.join(columns)}"
+
+    counts: Counter = Counter()
+    for row in replica.execute(sql, params):
+        values = dict(zip(columns, row[:-1]))
+        key = []
+        for dimension in dimensions:
+            if dimension == "status":
+                key.append(decoder.status_label(raw_reason=values["statuscode"]))
+            elif dimension == "status_reason":
+                key.append(decoder.status_reason_label(values["statuscode"]))
+            elif dimension == "priority":
+                key.append(decoder.priority_label(values["prioritycode"]))
+            else:
+                key.append(values["customer_name"] or "N/A")
+        if time_bucket:
+            label = values[_SQL_BUCKETS[time_bucket]]
+            if label and time_bucket == "week":
+                label = bucket_label(label, "week")
+            key.append(label or "N/A")
+        counts[tuple(key)] += row[-1]
+    return counts
+
+
+def _from_fetchxml(client, dimensions, time_bucket, customer_name, customer_ids, created_after, created_before, decoder) -> Counter:
+    xml = build_aggregate_fetchxml(dimensions, time_bucket, customer_name, customer_ids, created_after, created_before)
+    counts: Counter = Counter()
+    for record in client.query.fetchxml(xml).execute():
+        key = [_label(decoder, dimension, record, dimension) for dimension in dimensions]
+        if time_bucket:
+            parts = [record.get(f"bucket_{part}") for part in _BUCKET_PARTS[time_bucket]]
+            if time_bucket == "quarter":
+                key.append(f"{parts[0]}-Q{parts[1]}")
+            elif time_bucket == "week":
+                key.append(bucket_label(f"{parts[0]}-{int(parts[1]):02d}-{int(parts[2]):02d}", "week"))
+            else:
+                key.append("-".join(str(parts[0]) if i == 0 else f"{int(p):02d}" for i, p in enumerate(parts)))
+        counts[tuple(key)] += int(record.get("case_count") or 0)
+    return counts
+
+
+def _from_scan(client, dimensions, time_bucket, customer_name, customer_ids, created_after, created_before, decoder,
+               max_rows=MAX_SCAN_ROWS, page_size=5000) -> Tuple[Counter, bool]:
+    filters = []
+    if customer_ids:
+        filters.append(f"({_customer_id_filter(customer_ids)})")
+    elif customer_name:
+        filters.append(f"({_customer_filter(customer_name)})")
+    if created_after:
+        filters.append(f"createdon ge {normalize_timestamp(created_after)}")
+    if created_before:
+        filters.append(f"createdon lt {normalize_timestamp(created_before)}")
+
+    select = ["statecode", "statuscode", "prioritycode", "createdon"]
+    expand = CASE_EXPAND if "customer" in dimensions else None
+
+    counts: Counter = Counter()
+    # One row past the cap tells a complete result from a truncated one
+    batches = client.get("incident", select=select, expand=expand, filter=" and ".join(filters) or None,
+                         top=None if max_rows is None else max_rows + 1, page_size=page_size)
+    seen = 0
+    for batch in batches:
+        for record in batch:
+            if max_rows is not None and seen >= max_rows:
+                return counts, False
+            seen += 1
+            key = []
+            for dimension in dimensions:
+                if dimension == "status":
+                    key.append(record.get("statecode" + FORMATTED_VALUE)
+                               or decoder.status_label(record.get("statecode"), record.get("statuscode")))
+                elif dimension == "status_reason":
+                    key.append(_label(decoder, dimension, record, "statuscode"))
+                elif dimension == "priority":
+                    key.append(_label(decoder, dimension, record, "prioritycode"))
+                else:
+                    key.append(get_customer_name_from_case(record))
+            if time_bucket:
+                key.append(bucket_label(record.get("createdon"), time_bucket))
+            counts[tuple(key)] += 1
+    return counts, True
+
+
+def _fetchxml_supported(client) -> bool:
+    # Only SDK builds that expose ``client.query.fetchxml`` can run aggregates server-side
+    return callable(getattr(getattr(client, "query", None), "fetchxml", None))
+
+
+def count_cases(client) -> Optional[int]:
+    """
+    Total number of incidents from a FetchXML count aggregate, or None when the
+    client has no ``query.fetchxml`` or the query fails (Dataverse refuses
+    aggregates over more than 50,000 rows by default).
+    """
+    if not _fetchxml_supported(client):
+        return None
+    try:
+        records = list(client.query.fetchxml(build_aggregate_fetchxml(())).execute())
+    except Exception:
+        return None
+    return sum(int(record.get("case_count") or 0) for record in records)
+
+
+def aggregate_case_statistics(
+    client,
+    group_by: Sequence[str] = ("status",),
+    time_bucket: Optional[str] = None,
+    customer_name: Optional[str] = None,
+    customer_ids: Optional[Sequence[str]] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    replica=None,
+    decoder: Optional[CaseDecoder] = None,
+    cache: Optional[TTLCache] = None,
+    max_scan_rows: Optional[int] = MAX_SCAN_ROWS,
+) -> CaseStatistics:
+    """
+    Count cases grouped by ``group_by`` (and optionally a ``createdon`` bucket).
+
+    Uses the replica when it is ready, otherwise a FetchXML aggregate when the
+    client exposes ``query.fetchxml``, otherwise a streamed scan of only the
+    grouping columns that stops after ``max_scan_rows`` rows (None for no cap)
+    and marks the result incomplete.
+    """
+    dimensions = _validate(group_by, time_bucket)
+    decoder = decoder or default_decoder
+    key = (dimensions, time_bucket, customer_name, tuple(customer_ids or ()), created_after, created_before)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    args = (dimensions, time_bucket, customer_name, customer_ids, created_after, created_before, decoder)
+    complete = True
+    if replica is not None and replica.is_ready:
+        counts, source = _from_replica(replica, *args), "replica"
+    elif _fetchxml_supported(client):
+        counts, source = _from_fetchxml(client, *args), "fetchxml"
+    else:
+        (counts, complete), source = _from_scan(client, *args, max_rows=max_scan_rows), "scan"
+
+    output_dimensions = dimensions + (("period",) if time_bucket else ())
+    statistics = CaseStatistics(output_dimensions, counts, source, complete)
+    if cache is not None:
+        cache.set(key, statistics)
+    return statistics
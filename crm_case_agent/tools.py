@@ -1,133 +1,402 @@
 from dataclasses import dataclass
+from itertools import islice
+from typing import List, Optional, Tuple
 from langchain.tools import tool, ToolRuntime
-from crm_case_agent.utility import get_customer_cases, get_customer_name_from_case
-
-# Maps for option set fields (fallback when Dataverse doesn't return formatted annotations)
-PRIORITY_MAP = {
-    1: "High",
-    2: "Normal",
-    3: "Low",
-}
-
-# Common status (state) mappings for the Case (incident) entity
-# Renamed from STATE_MAP to STATUS_MAP to reflect 'status' (statecode) terminology
-STATUS_MAP = {
-    0: "Active",
-    1: "Resolved",
-    2: "Cancelled",
-}
-
-# Status reason (statuscode) mappings grouped under the above statuses
-STATUS_REASON_MAP = {
-     # Active reasons
-     1: "In Progress",
-     2: "On Hold",
-     3: "Waiting for Details",
-     4: "Researching",
-     # Resolved reasons
-     5: "Problem Solved",
-     1000: "Information Provided",
-     # Cancelled reasons
-     6: "Cancelled",
-     2000: "Merged",
- }
+from agent_tracing import span, traced
+from crm_case_agent.cache import CaseCache, TTLCache, normalize_customer_name
+# Option-set maps live with the decoder; re-exported here for existing imports
+from crm_case_agent.decoding import (
+    CaseDecoder,
+    PRIORITY_MAP,
+    STATUS_MAP,
+    STATUS_REASON_MAP,
+    default_decoder,
+)
+from crm_case_agent.customer_index import CustomerIndex
+from crm_case_agent.filters import CaseFilter
+from crm_case_agent.formatting import CaseOutputFormat, default_output_format
+from crm_case_agent.gateway import ThrottledError
+from crm_case_agent.pagination import CaseCursorStore, iter_records
+from crm_case_agent.replica import CaseReplica
+from crm_case_agent.statistics import aggregate_case_statistics
+from crm_case_agent.utility import (
+    fetch_case_details,
+    get_cases_for_customers,
+    get_customer_cases,
+    get_customer_name_from_case,
+)
+
+# Number of cases rendered per tool response; further pages are fetched on demand
+PAGE_SIZE = 50
+
+
+def _throttled_message(error: ThrottledError) -> str:
+    """Tell the LLM the lookup was throttled and how long to wait, so it does not retry blindly."""
+    wait = max(error.retry_after or 1.0, 1.0)
+    return (
+        f"Dataverse is temporarily throttling requests (service protection limits), so this lookup was not run. "
+        f"Wait about {wait:.0f} seconds before calling this tool again; retrying sooner will fail again."
+    )
 
 @dataclass
 class CRMContext:
     dataverse_client: object
+    case_cache: Optional[CaseCache] = None
+    case_cursors: Optional[CaseCursorStore] = None
+    case_decoder: Optional[CaseDecoder] = None
+    customer_index: Optional[CustomerIndex] = None
+    case_replica: Optional[CaseReplica] = None
+    stats_cache: Optional[TTLCache] = None
+    case_output: Optional[CaseOutputFormat] = None
+    detail_cache: Optional[TTLCache] = None
+
+
+def _resolve_customer(context: CRMContext, customer_name: str) -> Tuple[str, List[str], str]:
+    """
+    Resolve a customer name through the local index, if one is warm.
+
+    Returns ``(display_name, customer_ids, note)``; ``customer_ids`` is empty when
+    the name should be matched by string comparison in Dataverse instead.
+    """
+    index = context.customer_index
+    if index is None or not index.is_warm:
+        return customer_name, [], ""
+    matches = index.resolve(customer_name)
+    if not matches:
+        return customer_name, [], ""
+    display_name = matches[0].name
+    note = ""
+    if matches[0].score < 1.0:
+        note = f"(Closest customer match for '{customer_name}': '{display_name}')\n"
+    return display_name, [match.customer_id for match in matches], note
+
 
 @tool
-def retrieve_customer_cases(customer_name: str, runtime: ToolRuntime[CRMContext]) -> str:
+@traced("tool.retrieve_customer_cases")
+def retrieve_customer_cases(
+    customer_name: str,
+    runtime: ToolRuntime[CRMContext],
+    continuation_token: Optional[str] = None,
+    status: Optional[List[str]] = None,
+    priority: Optional[List[str]] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+    modified_after: Optional[str] = None,
+    modified_before: Optional[str] = None,
+    order_by: Optional[str] = None,
+    fields: Optional[List[str]] = None,
+) -> str:
     """
     Retrieves CRM cases for a specific customer by their name.
+    Results are returned one page at a time. When more cases are available the
+    response ends with a continuation token; call this tool again with the same
+    customer_name and that continuation_token to get the next page.
     This function will attempt to use formatted (display) values from Dataverse when available
     and fall back to mapping dictionaries when only numeric codes are returned.
+
+    Optional filters are applied by Dataverse, so pass them instead of filtering the results yourself:
+        status: Case statuses, e.g. ["Active"], ["Open"], ["Resolved", "Cancelled"] or ["Closed"].
+        priority: Case priorities, e.g. ["High"] or ["High", "Normal"].
+        created_after / created_before: ISO date (2024-03-01), "today", "yesterday" or an offset such as "7d" or "2w".
+        modified_after / modified_before: Same formats, applied to the last-modified date.
+        order_by: Comma-separated "<column> [asc|desc]" with columns createdon, modifiedon,
+            prioritycode, title or ticketnumber, e.g. "createdon desc".
+    Filters are remembered by the continuation token and need not be repeated for later pages.
+
+    fields: Columns to show, from customer, title, ticket_number, priority, status,
+        status_reason and createdon. Leave empty for the default summary columns.
+        Use get_case_details for a case's description.
     """
-    dataverse_client = runtime.context.dataverse_client
-    if dataverse_client is None:
+    context = runtime.context
+    dataverse_client = context.dataverse_client
+    replica = context.case_replica if context.case_replica is not None and context.case_replica.is_ready else None
+    if dataverse_client is None and replica is None:
         return "Error: Dataverse client not initialized."
 
     try:
-        case_batches = get_customer_cases(dataverse_client, customer_name, top=50)
-        cases_list = []
-        for batch in case_batches:
-            for case in batch:
-                customer = get_customer_name_from_case(case)
-
-                # Prefer formatted annotations if present for priority
-                priority = case.get('prioritycode@OData.Community.Display.V1.FormattedValue')
-                if not priority:
-                    # Fall back to mapping by integer code
-                    raw_priority = case.get('prioritycode')
-                    try:
-                        priority = PRIORITY_MAP.get(int(raw_priority)) if raw_priority is not None else 'N/A'
-                    except Exception:
-                        priority = raw_priority if raw_priority is not None else 'N/A'
-
-                # Status (statecode) and Status Reason (statuscode) handling
-                status = case.get('statecode@OData.Community.Display.V1.FormattedValue')
-                raw_state = case.get('statecode')
-                if not status:
-                    try:
-                        status = STATUS_MAP.get(int(raw_state)) if raw_state is not None else None
-                    except Exception:
-                        status = None
-
-                status_reason = case.get('statuscode@OData.Community.Display.V1.FormattedValue')
-                raw_status = case.get('statuscode')
-                if not status_reason:
-                    try:
-                        status_reason = STATUS_REASON_MAP.get(int(raw_status)) if raw_status is not None else None
-                    except Exception:
-                        status_reason = None
-
-                # If status missing, try to derive it from status_reason numeric code
-                if not status:
-                    derived = None
-                    try:
-                        code = int(raw_status) if raw_status is not None else None
-                    except Exception:
-                        code = None
-                    if code is not None:
-                        if code in (1, 2, 3, 4):
-                            derived = "Active"
-                        elif code in (5, 1000):
-                            derived = "Resolved"
-                        elif code in (6, 2000):
-                            derived = "Cancelled"
-                        else:
-                            derived = STATUS_MAP.get(code)
-                    status = status or derived or 'N/A'
-
-                # Ensure non-empty values
-                priority = priority or 'N/A'
-                status = status or 'N/A'
-                status_reason = status_reason or 'N/A'
-
-                cases_list.append({
-                    "customer": customer,
-                    "title": case.get('title', 'N/A'),
-                    "ticket_number": case.get('ticketnumber', 'N/A'),
-                    "priority": priority,
-                    "status": status,
-                    "status_reason": status_reason,
-                    "createdon": case.get('createdon'),
-                    "description": case.get('description', 'N/A')
-                })
-
-        if not cases_list:
-            return f"No cases found for customer: {customer_name}"
-
-        result = f"Found {len(cases_list)} case(s) for '{customer_name}':\n\n"
-        for i, case in enumerate(cases_list, 1):
+        decoder = context.case_decoder or default_decoder
+        output = context.case_output or default_output_format
+        cursors = context.case_cursors
+        scope = ""
+        if fields:
+            try:
+                fields = output.validate_fields(fields)
+            except ValueError as e:
+                return f"Error: {str(e)}"
+        if continuation_token:
+            resumed = cursors.resume(continuation_token, PAGE_SIZE) if cursors is not None else None
+            if resumed is None:
+                return (
+                    f"Error: continuation token '{continuation_token}' is unknown or has expired. "
+                    f"Call retrieve_customer_cases without a token to start over."
+                )
+            cursor, page, offset, next_token = resumed
+            customer_name = cursor.customer_name
+            scope = cursor.scope
+            note = ""
+        else:
+            try:
+                case_filter = CaseFilter.build(
+                    status=status,
+                    priority=priority,
+                    created_after=created_after,
+                    created_before=created_before,
+                    modified_after=modified_after,
+                    modified_before=modified_before,
+                    order_by=order_by,
+                    decoder=decoder,
+                )
+            except ValueError as e:
+                return f"Error: {str(e)}"
+            if not case_filter.is_empty:
+                scope = f" ({case_filter.describe(decoder)})"
+            customer_name, customer_ids, note = _resolve_customer(context, customer_name)
+            if replica is not None:
+                case_batches = replica.get_customer_cases(
+                    customer_name, page_size=PAGE_SIZE, customer_ids=customer_ids,
+                    case_filter=case_filter, decoder=decoder,
+                )
+            else:
+                case_batches = get_customer_cases(
+                    dataverse_client, customer_name, top=None, cache=context.case_cache, page_size=PAGE_SIZE,
+                    customer_ids=customer_ids, case_filter=case_filter,
+                    include_customer=bool(fields and "customer" in fields),
+                )
+            records = iter_records(case_batches)
+            if cursors is not None:
+                page, offset, next_token = cursors.open(customer_name, records, PAGE_SIZE, scope=scope)
+            else:
+                page, offset, next_token = list(islice(records, PAGE_SIZE)), 0, None
+
+        with span("crm.decode", records=len(page)):
+            cases_list = decoder.decode(page)
+
+        if not cases_list and offset == 0:
+            return f"No cases found for customer: {customer_name}{scope}"
+
+        with span("crm.render") as stage:
+            rows, shown, tokens = output.render(cases_list, offset + 1, fields=fields)
+            stage.set(records=shown, tokens=tokens)
+        truncated = shown < len(cases_list)
+        if truncated and cursors is not None:
+            # Rows cut by the token budget go back to the cursor for the next call
+            next_token = cursors.unread(next_token, customer_name, page[shown:], offset + shown, scope=scope)
+
+        if offset == 0 and next_token is None and not truncated:
+            header = f"Found {shown} case(s) for '{customer_name}'{scope}:\n\n"
+        else:
+            header = f"Showing case(s) {offset + 1}-{offset + shown} for '{customer_name}'{scope}:\n\n"
+        result = note + header + rows
+        if next_token is not None:
             result += (
-                f"{i}. **{case['title']}**\n"
-                f"   - Ticket: {case['ticket_number']}\n"
-                f"   - Priority: {case['priority']}\n"
-                f"   - Status: {case['status']}\n"
-                f"   - Status Reason: {case['status_reason']}\n\n"
+                f"\nMore cases are available. To get the next page, call retrieve_customer_cases "
+                f"with customer_name='{customer_name}' and continuation_token='{next_token}'.\n"
             )
-        return result
+        elif truncated:
+            result += "\nMore cases are available but were not shown.\n"
+        return result + f"(~{tokens} tokens)\n"
 
+    except ThrottledError as e:
+        return _throttled_message(e)
     except Exception as e:
         return f"Error retrieving cases: {str(e)}"
+
+
+@tool
+@traced("tool.retrieve_cases_for_customers")
+def retrieve_cases_for_customers(customer_names: List[str], runtime: ToolRuntime[CRMContext]) -> str:
+    """
+    Retrieves CRM cases for several customers at once.
+    Use this instead of calling retrieve_customer_cases repeatedly when the user
+    asks about more than one customer. Shows up to one page of cases per customer;
+    use retrieve_customer_cases for a single customer to page through the rest.
+    """
+    context = runtime.context
+    dataverse_client = context.dataverse_client
+    replica = context.case_replica if context.case_replica is not None and context.case_replica.is_ready else None
+    if dataverse_client is None and replica is None:
+        return "Error: Dataverse client not initialized."
+
+    try:
+        requested = {normalize_customer_name(name): name for name in customer_names if name and name.strip()}
+        if not requested:
+            return "Error: no customer names provided."
+
+        # Names the local index can resolve are queried by GUID, the rest by name
+        notes = dict.fromkeys(requested, "")
+        owners_by_id = {}
+        unresolved = []
+        for key, name in requested.items():
+            display_name, customer_ids, notes[key] = _resolve_customer(context, name)
+            requested[key] = display_name
+            owners_by_id.update(dict.fromkeys(customer_ids, key))
+            if not customer_ids:
+                unresolved.append(name)
+
+        # Keep one page per customer plus one row that tells whether there are more.
+        # Customers whose page is full are dropped by re-issuing the query for the
+        # rest, so one large customer cannot make the tool read all of its cases.
+        limit = PAGE_SIZE + 1
+        pages = {key: [] for key in requested}
+        seen = set()
+        pending = set(requested)
+        while pending:
+            names = [name for name in unresolved if normalize_customer_name(name) in pending]
+            ids = [customer_id for customer_id, key in owners_by_id.items() if key in pending]
+            if replica is not None:
+                case_batches = replica.get_cases_for_customers(names, page_size=PAGE_SIZE, customer_ids=ids)
+            else:
+                case_batches = get_cases_for_customers(
+                    dataverse_client, names, page_size=PAGE_SIZE, customer_ids=ids
+                )
+            filled = False
+            for batch in case_batches:
+                for case in batch:
+                    key = owners_by_id.get(case.get('_customerid_value'))
+                    if key is None:
+                        key = normalize_customer_name(get_customer_name_from_case(case))
+                    case_id = case.get('incidentid')
+                    if key not in pending or (case_id is not None and case_id in seen):
+                        continue
+                    seen.add(case_id)
+                    pages[key].append(case)
+                    if len(pages[key]) == limit:
+                        pending.discard(key)
+                        filled = True
+                if filled:
+                    break
+            else:
+                break
+
+        decoder = context.case_decoder or default_decoder
+        output = context.case_output or default_output_format
+        budget = output.token_budget
+        sections = []
+        used = 0
+        for key, name in requested.items():
+            if not pages[key]:
+                sections.append(f"{notes[key]}No cases found for customer: {name}\n\n")
+                continue
+            more = len(pages[key]) > PAGE_SIZE
+            with span("crm.decode", records=min(len(pages[key]), PAGE_SIZE)):
+                cases_list = decoder.decode(pages[key][:PAGE_SIZE])
+            # Every customer gets at least one row; the budget is shared across sections
+            remaining = max(budget - used, 0) if budget is not None else None
+            with span("crm.render") as stage:
+                rows, shown, tokens = output.render(cases_list, token_budget=remaining)
+                stage.set(records=shown, tokens=tokens)
+            used += tokens
+            count = f"more than {PAGE_SIZE}" if more else str(len(cases_list))
+            section = f"{notes[key]}Found {count} case(s) for '{name}':\n\n" + rows
+            if more or len(cases_list) > shown:
+                section += (
+                    f"\nShowing the first {shown}. Call retrieve_customer_cases with "
+                    f"customer_name='{name}' to page through the rest.\n\n"
+                )
+            else:
+                section += "\n"
+            sections.append(section)
+        sections.append(f"(~{used} tokens)\n")
+        return "".join(sections)
+
+    except ThrottledError as e:
+        return _throttled_message(e)
+    except Exception as e:
+        return f"Error retrieving cases: {str(e)}"
+
+
+@tool
+@traced("tool.get_case_statistics")
+def get_case_statistics(
+    runtime: ToolRuntime[CRMContext],
+    group_by: Optional[List[str]] = None,
+    time_bucket: Optional[str] = None,
+    customer_name: Optional[str] = None,
+    created_after: Optional[str] = None,
+    created_before: Optional[str] = None,
+) -> str:
+    """
+    Retrieves case statistics (counts) without listing individual cases.
+    Use this for dashboard-style questions such as "how many open cases do we have"
+    or "cases per priority this month".
+
+    Args:
+        group_by: Any of "status", "status_reason", "priority", "customer". Defaults to ["status"].
+        time_bucket: Optional createdon bucket: "day", "week", "month", "quarter" or "year".
+        customer_name: Optional customer to restrict the statistics to.
+        created_after: Optional ISO date; only cases created on or after it are counted.
+        created_before: Optional ISO date; only cases created before it are counted.
+    """
+    context = runtime.context
+    replica = context.case_replica if context.case_replica is not None and context.case_replica.is_ready else None
+    if context.dataverse_client is None and replica is None:
+        return "Error: Dataverse client not initialized."
+
+    try:
+        note, customer_ids = "", []
+        if customer_name:
+            customer_name, customer_ids, note = _resolve_customer(context, customer_name)
+        statistics = aggregate_case_statistics(
+            context.dataverse_client,
+            group_by=group_by or ["status"],
+            time_bucket=time_bucket,
+            customer_name=customer_name,
+            customer_ids=customer_ids,
+            created_after=created_after,
+            created_before=created_before,
+            replica=replica,
+            decoder=context.case_decoder,
+            cache=context.stats_cache,
+        )
+        scope = f" for '{customer_name}'" if customer_name else ""
+        return f"{note}Case statistics{scope}:\n\n" + statistics.render()
+
+    except ValueError as e:
+        return f"Error: {str(e)}"
+    except ThrottledError as e:
+        return _throttled_message(e)
+    except Exception as e:
+        return f"Error retrieving case statistics: {str(e)}"
+
+
+@tool
+@traced("tool.get_case_details")
+def get_case_details(ticket_number: str, runtime: ToolRuntime[CRMContext]) -> str:
+    """
+    Retrieves the full details of a single case, including its description, by ticket number
+    (e.g. "CAS-01234-A1B2C3"). Use this after listing cases when the user asks about a specific case.
+    """
+    context = runtime.context
+    replica = context.case_replica if context.case_replica is not None and context.case_replica.is_ready else None
+    if context.dataverse_client is None and replica is None:
+        return "Error: Dataverse client not initialized."
+    if not ticket_number or not ticket_number.strip():
+        return "Error: no ticket number provided."
+
+    try:
+        if replica is not None:
+            record = replica.get_case(ticket_number)
+        else:
+            record = fetch_case_details(context.dataverse_client, ticket_number, cache=context.detail_cache)
+        if record is None:
+            return f"No case found with ticket number: {ticket_number}"
+
+        case = (context.case_decoder or default_decoder).decode([record])[0]
+        owner = record.get("_ownerid_value@OData.Community.Display.V1.FormattedValue")
+        return (
+            f"**{case['title']}**\n"
+            f"- Ticket: {case['ticket_number']}\n"
+            f"- Customer: {case['customer']}\n"
+            f"- Priority: {case['priority']}\n"
+            f"- Status: {case['status']}\n"
+            f"- Status Reason: {case['status_reason']}\n"
+            f"- Created: {case['createdon'] or 'N/A'}\n"
+            f"- Modified: {record.get('modifiedon') or 'N/A'}\n"
+            + (f"- Owner: {owner}\n" if owner else "")
+            + f"- Description: {case['description'] or 'N/A'}\n"
+        )
+
+    except ThrottledError as e:
+        return _throttled_message(e)
+    except Exception as e:
+        return f"Error retrieving case details: {str(e)}"
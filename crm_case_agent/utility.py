@@ -1,26 +1,210 @@
-def get_customer_cases(client, customer_name, top=10):
+import uuid
+
+from crm_case_agent.cache import normalize_customer_name
+
+# Summary columns for case lists; the description is only fetched per case
+CASE_SELECT = [
+    "incidentid",
+    "title",
+    "ticketnumber",
+    "prioritycode",
+    "statuscode",
+    "createdon",
+    "modifiedon",
+    "_customerid_value",
+]
+
+# Full columns for a single case (get_case_details) and the local replica
+CASE_DETAIL_SELECT = CASE_SELECT + [
+    "statecode",
+    "description",
+    "_ownerid_value",
+]
+
+CASE_EXPAND = ["customerid_contact($select=fullname)", "customerid_account($select=name)"]
+
+# Customer names per combined query; keeps the $filter well under Dataverse URL limits
+CUSTOMER_BATCH_SIZE = 20
+
+
+def escape_odata_string(value):
+    """Escape a value for use inside a single-quoted OData string literal."""
+    return str(value).replace("'", "''")
+
+
+def _customer_filter(customer_name):
+    name = escape_odata_string(customer_name)
+    return f"customerid_contact/fullname eq '{name}' or customerid_account/name eq '{name}'"
+
+
+def _customer_id_filter(customer_ids):
+    # GUIDs are round-tripped through uuid so nothing but a GUID reaches the filter
+    return " or ".join(f"_customerid_value eq {uuid.UUID(str(customer_id))}" for customer_id in customer_ids)
+
+
+def get_customer_cases(client, customer_name, top=10, cache=None, page_size=None, customer_ids=None, case_filter=None,
+                       include_customer=False):
     """
     Retrieves customer cases from Dataverse based on customer name.
+
+    If a ``CaseCache`` is passed, repeat lookups are answered from the cache and
+    revalidated with a ``modifiedon ge <last_seen>`` delta query instead of a
+    full re-pull. Fresh results are cached batch by batch as they are read, so
+    a listing that is only paged part way (a large customer's first page) is
+    cached as a prefix; reading past a cached prefix queries Dataverse again.
+
+    ``page_size`` sets the Dataverse page size; batches are fetched lazily as
+    the returned iterable is consumed, so ``top=None`` streams the full result.
+
+    ``customer_ids`` (e.g. resolved through a ``CustomerIndex``) replaces the
+    name comparison with a filter on the indexed ``_customerid_value`` column.
+
+    ``case_filter`` (a ``CaseFilter``) adds status, priority and date-range
+    conditions to the ``$filter`` and sets ``$orderby``, so Dataverse returns
+    only the relevant rows.
+
+    Only the summary columns in ``CASE_SELECT`` are fetched. The customer
+    navigation properties are expanded only with ``include_customer=True``,
+    since the caller already knows whose cases it asked for.
+    """
+    if customer_ids:
+        customer_filter = _customer_id_filter(customer_ids)
+    else:
+        customer_filter = _customer_filter(customer_name)
+    structured_filter = case_filter.to_odata() if case_filter is not None else None
+    query_filter = f"({customer_filter}) and {structured_filter}" if structured_filter else customer_filter
+    orderby = case_filter.to_orderby() if case_filter is not None else None
+    expand = CASE_EXPAND if include_customer else None
+
+    if cache is None:
+        return _query_cases(client, query_filter, top, page_size, orderby, expand)
+
+    key = cache.make_key(
+        customer_name, select=CASE_SELECT, expand=expand or (), top=top,
+        customer_ids=sorted(customer_ids or ()), filter=case_filter,
+    )
+    def fetch():
+        return _query_cases(client, query_filter, top, page_size, orderby, expand)
+
+    entry = cache.lookup(key)
+    if entry is not None:
+        if not cache.needs_revalidation(entry):
+            return _cached_batches(cache, key, entry, fetch)
+        if entry.last_seen:
+            # The delta covers the whole customer so records that stop matching the
+            # structured filter (e.g. a case being resolved) are seen and dropped
+            delta_filter = f"({customer_filter}) and modifiedon ge {entry.last_seen}"
+            changed = [case for batch in _query_cases(client, delta_filter, None, page_size, expand=expand) for case in batch]
+            keep = case_filter.matches if structured_filter else None
+            order = case_filter.sort if orderby else None
+            if cache.merge(key, entry, changed, top=top, keep=keep, order=order):
+                return _cached_batches(cache, key, entry, fetch)
+
+    return _cache_batches(cache, key, fetch())
+
+
+def get_cases_for_customers(client, customer_names, page_size=None, customer_ids=None):
+    """
+    Retrieves cases for several customers with one combined query per chunk of names.
+
+    Yields batches of raw case records; use ``get_customer_name_from_case`` (or
+    ``_customerid_value`` for ``customer_ids``) to split them back out per
+    customer. Names are de-duplicated case-insensitively. Customer names are
+    only expanded when rows have to be split by name.
+    """
+    unique_names = list({normalize_customer_name(name): name.strip() for name in customer_names if name and name.strip()}.values())
+    clauses = [f"({_customer_filter(name)})" for name in unique_names]
+    clauses += [_customer_id_filter([customer_id]) for customer_id in dict.fromkeys(customer_ids or ())]
+    expand = CASE_EXPAND if unique_names else None
+    for start in range(0, len(clauses), CUSTOMER_BATCH_SIZE):
+        combined_filter = " or ".join(clauses[start:start + CUSTOMER_BATCH_SIZE])
+        yield from _query_cases(client, combined_filter, None, page_size, expand=expand)
+
+
+def fetch_case_details(client, ticket_number, cache=None):
+    """
+    Retrieves the full record (``CASE_DETAIL_SELECT`` plus the customer) for one case.
+
+    Returns None when no case has that ticket number. With a ``TTLCache`` the
+    record is cached under the case-insensitive ticket number.
     """
-    case_batches = client.get(
+    key = ("case_details", ticket_number.strip().casefold())
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+    batches = client.get(
+        "incident",
+        select=CASE_DETAIL_SELECT,
+        expand=CASE_EXPAND,
+        filter=f"ticketnumber eq '{escape_odata_string(ticket_number.strip())}'",
+        top=1,
+    )
+    record = next((case for batch in batches for case in batch), None)
+    if record is not None and cache is not None:
+        cache.set(key, record)
+    return record
+
+
+def _query_cases(client, filter, top, page_size=None, orderby=None, expand=None):
+    return client.get(
         "incident",
-        select=[
-            "incidentid",
-            "title",
-            "ticketnumber",
-            "prioritycode",
-            "statuscode",
-            "createdon",
-            "modifiedon",
-            "description",
-            "_customerid_value",
-        ],
-        expand=["customerid_contact($select=fullname)", "customerid_account($select=name)"],
-        filter=f"customerid_contact/fullname eq '{customer_name}' or customerid_account/name eq '{customer_name}'",
+        select=CASE_SELECT,
+        expand=expand,
+        filter=filter,
+        orderby=orderby,
         top=top,
+        page_size=page_size,
     )
 
-    return case_batches
+
+def _cache_batches(cache, key, case_batches):
+    """
+    Yield batches unchanged, storing what has been read in ``cache`` as it goes.
+
+    The first batch is stored as a partial entry and later ones are appended
+    to it in place before they are handed out, so a consumer that stops early
+    (a cursor holding only the first page) still leaves its prefix cached
+    without the prefix being copied again per page. Once drained, the result
+    is stored as a complete entry.
+    """
+    records = []
+    entry = None
+    for batch in case_batches:
+        if records is not None:
+            records.extend(batch)
+            if len(records) > cache.max_entry_records:
+                records = None
+            elif entry is None:
+                entry = cache.store(key, batch, complete=False)
+            elif not cache.extend(entry, batch):
+                records = None
+        yield batch
+    if records is not None:
+        cache.store(key, records)
+
+
+def _cached_batches(cache, key, entry, fetch):
+    """
+    Yield a cached entry, then for a partial entry the rest of the result.
+
+    The remainder comes from a fresh query (issued only if the consumer reads
+    past the prefix) with the cached number of records skipped; it also
+    refreshes the cache entry.
+    """
+    records = cache.snapshot(entry)
+    if records:
+        yield records
+    if entry.complete:
+        return
+    skip = len(records)
+    for batch in _cache_batches(cache, key, fetch()):
+        if skip >= len(batch):
+            skip -= len(batch)
+            continue
+        yield batch[skip:]
+        skip = 0
 
 
 def get_customer_name_from_case(case):
@@ -28,5 +212,5 @@ def get_customer_name_from_case(case):
         return case.get('customerid_contact', {}).get('fullname', 'N/A')
     elif case.get('customerid_account'):
         return case.get('customerid_account', {}).get('name', 'N/A')
-    return 'N/A'
-
+    # Summary queries skip the expands; Dataverse still annotates the lookup with the name
+    return case.get('_customerid_value@OData.Community.Display.V1.FormattedValue') or 'N/A'
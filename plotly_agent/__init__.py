@@ -3,19 +3,51 @@ Plotly Agent V2 - Latest LangChain Agent Framework Implementation
 
 This module provides a data visualization agent using Plotly with the latest
 LangChain agent framework (create_agent from langchain.agents).
+
+Exports are imported on first access: ``import plotly_agent`` does not load
+LangChain, pandas or plotly until an agent or tool is actually used.
 """
 
-from .agent import create_plotly_agent, PlotlyVisualizationAgent
-from .tools import create_plotly_chart, repair_plotly_code
-from .security import check_malicious_code
-from .extract import extract_python_code
+import importlib
+from typing import TYPE_CHECKING
+
+_EXPORTS = {
+    'create_plotly_agent': '.agent',
+    'PlotlyVisualizationAgent': '.agent',
+    'create_plotly_chart': '.tools',
+    'repair_plotly_code': '.tools',
+    'check_malicious_code': '.security',
+    'extract_python_code': '.extract',
+    'DatasetStore': '.datasets',
+    'register_dataset': '.datasets',
+    'get_dataset_store': '.datasets',
+    'set_dataset_store': '.datasets',
+    'reduce_figure': '.downsample',
+    'ChartExecutorPool': '.executor',
+    'get_chart_executor': '.executor',
+    'set_chart_executor': '.executor',
+}
+
+__all__ = list(_EXPORTS)
+
+if TYPE_CHECKING:
+    from .agent import create_plotly_agent, PlotlyVisualizationAgent
+    from .tools import create_plotly_chart, repair_plotly_code
+    from .security import check_malicious_code
+    from .extract import extract_python_code
+    from .datasets import DatasetStore, register_dataset, get_dataset_store, set_dataset_store
+    from .downsample import reduce_figure
+    from .executor import ChartExecutorPool, get_chart_executor, set_chart_executor
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value
+    return value
 
-__all__ = [
-    'create_plotly_agent',
-    'PlotlyVisualizationAgent',
-    'create_plotly_chart',
-    'repair_plotly_code',
-    'check_malicious_code',
-    'extract_python_code'
-]
 
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
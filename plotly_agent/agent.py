@@ -7,13 +7,14 @@ LangChain create_agent API with LangGraph backend.
 
 import os
 import json
+import threading
+import time
 from typing import List, Optional, Dict, Any
 
-from langchain.chat_models import init_chat_model
-from langchain.agents import create_agent
-from langchain.messages import HumanMessage, AIMessage
+from agent_cache import ResponseCache
+from agent_tracing import Span, Tracer, get_tracer, span
 
-from .tools import create_plotly_chart, repair_plotly_code, get_dataframe_info
+# LangChain, pandas and plotly are imported where first needed, not at module load
 
 
 # System prompt for the visualization agent
@@ -25,10 +26,13 @@ CAPABILITIES:
 - Handle errors and repair code when needed
 
 WORKFLOW:
-1. First, use get_dataframe_info to understand the data structure
+1. First, use get_dataframe_info to understand the data structure (skip it if the message
+   already includes a data summary)
 2. Choose an appropriate chart type based on the data
 3. Use create_plotly_chart to generate the visualization
 4. If there's an error, use repair_plotly_code to fix it
+When the columns are already clear from the data, you may request get_dataframe_info and
+create_plotly_chart in the same step; tool calls made together run in parallel.
 
 CHART GUIDELINES:
 - Always give charts a descriptive title using HTML bold tags: title="<b>My Title</b>"
@@ -43,6 +47,11 @@ CHART GUIDELINES:
 - For distributions, use histograms or box plots
 - For correlations, use scatter plots
 
+DATA:
+When the message gives a DATASET HANDLE (like ds_3f9a0c12b4e6d871), pass that handle as
+data_json to every tool call instead of copying the data. The tools load the full dataset
+from it as `df`.
+
 CODE FORMAT:
 Your plotly_code should always create a variable named 'fig'. Example:
 ```python
@@ -69,6 +78,11 @@ def create_plotly_agent(
     Returns:
         A LangChain agent configured for Plotly visualization
     """
+    from langchain.chat_models import init_chat_model
+    from langchain.agents import create_agent
+
+    from .tools import create_plotly_chart, repair_plotly_code, get_dataframe_info
+
     # Initialize the chat model
     llm = init_chat_model(model, temperature=temperature)
 
@@ -96,7 +110,10 @@ class PlotlyVisualizationAgent:
         self,
         model: str = "gpt-4o",
         temperature: float = 0.0,
-        api_key: Optional[str] = None
+        api_key: Optional[str] = None,
+        tracer: Optional[Tracer] = None,
+        response_cache: Optional[ResponseCache] = None,
+        max_tool_concurrency: int = 4
     ):
         """
         Initialize the Plotly visualization agent.
@@ -105,14 +122,71 @@ class PlotlyVisualizationAgent:
             model: The model name to use
             temperature: Temperature for model responses
             api_key: Optional OpenAI API key (can also be set via environment)
+            tracer: Tracer for runs, model calls and tool stages (defaults to the process-wide tracer)
+            response_cache: Optional cache of chat answers keyed by message, history and model
+            max_tool_concurrency: Maximum tool calls from one model step run in parallel
         """
         if api_key:
             os.environ["OPENAI_API_KEY"] = api_key
 
         self.model = model
         self.temperature = temperature
-        self.agent = create_plotly_agent(model=model, temperature=temperature)
+        # Built on first use, or ahead of it by prewarm()
+        self._agent = None
+        self._agent_lock = threading.Lock()
         self.chat_history: List = []
+        self.tracer = tracer
+        self.response_cache = response_cache
+        self.max_tool_concurrency = max_tool_concurrency
+
+    @property
+    def agent(self) -> Any:
+        """The compiled agent graph, built on first access."""
+        if self._agent is None:
+            with self._agent_lock:
+                if self._agent is None:
+                    self._agent = create_plotly_agent(model=self.model, temperature=self.temperature)
+        return self._agent
+
+    def prewarm(self) -> Dict[str, float]:
+        """
+        Do the one-off work of the first request ahead of time: import pandas
+        and plotly, build the model client and agent graph, and render a tiny
+        figure so plotly's validators are loaded. Returns seconds per step.
+
+        Returns:
+            Dictionary of step name to seconds spent
+        """
+        from .tools import _plotting_modules
+
+        timings = {}
+        started = time.perf_counter()
+        pd, px, _ = _plotting_modules()
+        timings["imports_s"] = round(time.perf_counter() - started, 4)
+
+        started = time.perf_counter()
+        self.agent
+        timings["agent_graph_s"] = round(time.perf_counter() - started, 4)
+
+        started = time.perf_counter()
+        px.bar(pd.DataFrame({"x": ["a"], "y": [1]}), x="x", y="y").to_json()
+        timings["first_figure_s"] = round(time.perf_counter() - started, 4)
+        return timings
+
+    def _tracer(self) -> Tracer:
+        return self.tracer if self.tracer is not None else get_tracer()
+
+    def _config(self, tracer: Tracer, run_span: Span) -> Dict[str, Any]:
+        """
+        Run config for one invocation: a bound on the tool calls of one step that
+        run in parallel, plus the model-call tracing callback while tracing is enabled.
+        """
+        config: Dict[str, Any] = {"max_concurrency": self.max_tool_concurrency}
+        if tracer.enabled:
+            from agent_tracing.callbacks import TracingCallbackHandler
+
+            config["callbacks"] = [TracingCallbackHandler(tracer, run_span)]
+        return config
 
     def create_chart(
         self,
@@ -124,31 +198,54 @@ class PlotlyVisualizationAgent:
         Create a chart based on data and natural language instruction.
 
         Args:
-            data: DataFrame, dict, or list of dicts containing the data
+            data: DataFrame, dict, list of dicts, Arrow table, or path of a
+                Parquet/Feather/Arrow file (memory-mapped, read without a copy)
             instruction: Natural language description of the desired chart
             reset_history: Whether to reset conversation history
 
         Returns:
             Dictionary containing the result (figure JSON or error)
         """
-        import pandas as pd
-
         if reset_history:
             self.chat_history = []
 
-        # Convert data to JSON
-        if isinstance(data, pd.DataFrame):
-            data_json = data.to_json(orient='records')
-        elif isinstance(data, (list, dict)):
-            data_json = json.dumps(data)
-        else:
-            data_json = str(data)
+        tracer = self._tracer()
+        with tracer.span("plotly.create_chart") as run_span:
+            return self._create_chart(data, instruction, tracer, run_span)
+
+    def _create_chart(self, data: Any, instruction: str, tracer: Tracer, run_span: Span) -> Dict[str, Any]:
+        from langchain.messages import HumanMessage, AIMessage
+
+        from .datasets import describe_dataset, get_dataset_store
+
+        # Register the data once; the prompt and tool calls carry only its handle
+        with span("plotly.register_data") as stage:
+            try:
+                store = get_dataset_store()
+                handle = store.register(data)
+                summary = describe_dataset(store.get(handle))
+                stage.set(dataset=handle, records=summary["shape"]["rows"])
+            except (TypeError, ValueError):
+                # Not tabular (e.g. free text): send it inline as before
+                handle = None
+                data_json = json.dumps(data) if isinstance(data, (list, dict)) else str(data)
+                stage.set(payload_bytes=len(data_json))
 
         # Construct the message
+        if handle is not None:
+            run_span.set(dataset=handle)
+            data_section = f"""DATASET HANDLE: {handle}
+Pass this handle as data_json to the tools; the full data is already loaded.
+
+DATA SUMMARY (columns, dtypes, shape and sample rows):
+{json.dumps(summary)}"""
+        else:
+            data_section = f"""DATA (JSON format):
+{data_json}"""
+
         user_message = f"""Please create a visualization for the following data:
 
-DATA (JSON format):
-{data_json}
+{data_section}
 
 INSTRUCTION:
 {instruction}
@@ -161,7 +258,7 @@ First analyze the data structure, then create an appropriate chart."""
 
         try:
             # Invoke the agent
-            response = self.agent.invoke({"messages": messages})
+            response = self.agent.invoke({"messages": messages}, config=self._config(tracer, run_span))
 
             # Extract the response
             final_message = response["messages"][-1]
@@ -178,6 +275,7 @@ First analyze the data structure, then create an appropriate chart."""
             }
 
         except Exception as e:
+            run_span.set(error=str(e))
             return {
                 "success": False,
                 "error": str(e)
@@ -193,12 +291,30 @@ First analyze the data structure, then create an appropriate chart."""
         Returns:
             The agent's response as a string
         """
+        from langchain.messages import HumanMessage, AIMessage
+
         messages = list(self.chat_history)
         messages.append(HumanMessage(content=message))
 
+        # The data being charted is part of the history, so it is part of the key
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = self.response_cache.make_key(
+                message, self.chat_history, ("plotly", self.model, self.temperature)
+            )
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                self.chat_history.append(HumanMessage(content=message))
+                self.chat_history.append(AIMessage(content=cached.answer))
+                return cached.answer
+
+        tracer = self._tracer()
         try:
-            response = self.agent.invoke({"messages": messages})
+            with tracer.span("plotly.chat") as run_span:
+                response = self.agent.invoke({"messages": messages}, config=self._config(tracer, run_span))
             response_content = response["messages"][-1].content
+            if cache_key is not None and isinstance(response_content, str) and response_content:
+                self.response_cache.set(cache_key, response_content)
 
             # Update history
             self.chat_history.append(HumanMessage(content=message))
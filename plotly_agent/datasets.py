@@ -0,0 +1,278 @@
+"""
+Process-local store of DataFrames referenced by short handles.
+
+Passing data to the chart tools as ``data_json`` means the model reads the
+whole dataset in the prompt, copies it back out token by token in every tool
+call, and each tool parses it into a DataFrame again. Instead, data is
+registered here once and the model only sees a handle such as
+``ds_3f9a0c12b4e6d871`` plus a short schema summary; the tools resolve the
+handle to the DataFrame that was already built.
+
+Handles are derived from the data itself, so registering the same data twice
+returns the same handle and keeps prompts (and response cache keys) stable.
+
+Columnar inputs stay columnar: Arrow tables and Parquet, Feather or Arrow IPC
+files become DataFrames backed by the Arrow buffers (``pd.ArrowDtype``)
+instead of going through lists of dicts. Feather/IPC files are memory-mapped,
+so their columns are read from the page cache without a copy. These inputs
+need pyarrow.
+
+Files are only read when the application registers them (:func:`register_dataset`,
+``PlotlyVisualizationAgent.create_chart``). The chart tools get their data
+argument from the model, so :func:`resolve_dataset` refuses file paths; a
+prompt would otherwise be enough to load any data file on the host.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+HANDLE_PATTERN = re.compile(r"^ds_[0-9a-f]{16}$")
+
+PARQUET_SUFFIXES = (".parquet", ".pq")
+ARROW_SUFFIXES = (".feather", ".arrow", ".ipc")
+
+
+def is_handle(value: Any) -> bool:
+    return isinstance(value, str) and HANDLE_PATTERN.match(value.strip()) is not None
+
+
+def data_file_path(data: Any) -> Optional[str]:
+    """``data`` as a path if it names an existing Parquet/Feather/Arrow file, else None."""
+    if isinstance(data, str):
+        if data.lstrip()[:1] in ("[", "{"):
+            return None
+    elif not isinstance(data, os.PathLike):
+        return None
+    path = os.fspath(data)
+    if path.lower().endswith(PARQUET_SUFFIXES + ARROW_SUFFIXES) and os.path.isfile(path):
+        return path
+    return None
+
+
+def _pyarrow() -> Any:
+    try:
+        import pyarrow
+    except ImportError as exc:
+        raise ImportError("Arrow, Parquet and Feather data require pyarrow: pip install pyarrow") from exc
+    return pyarrow
+
+
+def read_columnar(path: str) -> Any:
+    """Arrow table from a Parquet file, or memory-mapped from a Feather/Arrow IPC file."""
+    pa = _pyarrow()
+    if path.lower().endswith(PARQUET_SUFFIXES):
+        import pyarrow.parquet as pq
+
+        return pq.read_table(path, memory_map=True)
+    source = pa.memory_map(path, "r")
+    try:
+        return pa.ipc.open_file(source).read_all()
+    except pa.ArrowInvalid:
+        # Arrow IPC stream format rather than the file (Feather v2) format
+        source.seek(0)
+        return pa.ipc.open_stream(source).read_all()
+
+
+def _is_arrow(data: Any) -> bool:
+    return type(data).__module__.startswith("pyarrow") and hasattr(data, "schema") and hasattr(data, "column_names")
+
+
+def to_dataframe(data: Any) -> Any:
+    """
+    DataFrame from a DataFrame, a dict or list of records, their JSON string,
+    an Arrow table or record batch, or the path of a Parquet/Feather/Arrow file.
+    """
+    import pandas as pd
+
+    if isinstance(data, pd.DataFrame):
+        return data
+    path = data_file_path(data)
+    if path is not None:
+        data = read_columnar(path)
+    if _is_arrow(data):
+        # Arrow-backed columns share the table's buffers instead of copying into NumPy
+        return data.to_pandas(types_mapper=pd.ArrowDtype)
+    if isinstance(data, (bytes, str)):
+        data = json.loads(data)
+    return pd.DataFrame(data)
+
+
+def _file_hash(path: str) -> str:
+    """Identity of a data file without reading it: path, size and modification time."""
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+
+
+def _content_hash(df: Any) -> str:
+    import pandas as pd
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps([str(c) for c in df.columns]).encode("utf-8"))
+    digest.update(json.dumps([str(t) for t in df.dtypes]).encode("utf-8"))
+    try:
+        digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    except TypeError:
+        # Unhashable cells (lists, dicts): fall back to the serialized form
+        digest.update(df.to_json(orient="split", default_handler=str).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+class DatasetStore:
+    """
+    Thread-safe LRU store of DataFrames keyed by content-derived handles.
+
+    Args:
+        maxsize: Datasets kept; the least recently used are dropped beyond it.
+        max_bytes: Total in-memory size kept (``DataFrame.memory_usage``), or None for no limit.
+    """
+
+    def __init__(self, maxsize: int = 64, max_bytes: Optional[int] = 512 * 1024 * 1024):
+        if maxsize <= 0:
+            raise ValueError("maxsize must be a positive integer")
+        self.maxsize = maxsize
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Any]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self.registrations = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def register(self, data: Any) -> str:
+        """Store ``data`` (anything :func:`to_dataframe` accepts) and return its handle."""
+        path = data_file_path(data)
+        if path is not None:
+            # Files are identified without loading them, so re-registering one is free
+            handle = f"ds_{_file_hash(path)}"
+            with self._lock:
+                if handle in self._data:
+                    self.registrations += 1
+                    self._data.move_to_end(handle)
+                    return handle
+            df = to_dataframe(path)
+        else:
+            df = to_dataframe(data)
+            handle = f"ds_{_content_hash(df)}"
+        size = int(df.memory_usage(index=True, deep=False).sum())
+        with self._lock:
+            self.registrations += 1
+            if handle in self._data:
+                self._data.move_to_end(handle)
+                return handle
+            self._data[handle] = df
+            self._sizes[handle] = size
+            self._bytes += size
+            # Always keep the dataset just registered, even if it alone exceeds max_bytes
+            while len(self._data) > 1 and (
+                len(self._data) > self.maxsize or (self.max_bytes is not None and self._bytes > self.max_bytes)
+            ):
+                old, _ = self._data.popitem(last=False)
+                self._bytes -= self._sizes.pop(old)
+                self.evictions += 1
+        return handle
+
+    def get(self, handle: str) -> Any:
+        """The DataFrame registered as ``handle``; raises KeyError if unknown or evicted."""
+        handle = handle.strip()
+        with self._lock:
+            df = self._data.get(handle)
+            if df is None:
+                self.misses += 1
+                raise KeyError(
+                    f"Unknown dataset handle {handle!r}; it was never registered or has been evicted. "
+                    f"Register the data again."
+                )
+            self._data.move_to_end(handle)
+            self.hits += 1
+            return df
+
+    def __contains__(self, handle: str) -> bool:
+        with self._lock:
+            return handle in self._data
+
+    def remove(self, handle: str) -> None:
+        with self._lock:
+            if self._data.pop(handle, None) is not None:
+                self._bytes -= self._sizes.pop(handle)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "datasets": len(self._data),
+                "bytes": self._bytes,
+                "registrations": self.registrations,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+_default_store = DatasetStore()
+
+
+def get_dataset_store() -> DatasetStore:
+    """The process-wide store the chart tools resolve handles against."""
+    return _default_store
+
+
+def set_dataset_store(store: DatasetStore) -> DatasetStore:
+    """Replace the process-wide store (e.g. with different limits) and return the previous one."""
+    global _default_store
+    previous, _default_store = _default_store, store
+    return previous
+
+
+def register_dataset(data: Any) -> str:
+    """Register ``data`` in the process-wide store and return its handle."""
+    return _default_store.register(data)
+
+
+def resolve_dataset(data: Any) -> Any:
+    """
+    DataFrame for a handle from the process-wide store, or parsed from inline
+    data. Raises ValueError for anything naming a data file, whether or not it
+    exists: tools pass model-written arguments here.
+    """
+    if is_handle(data):
+        return _default_store.get(data)
+    if isinstance(data, (str, os.PathLike)) and os.fspath(data).strip().lower().endswith(
+            PARQUET_SUFFIXES + ARROW_SUFFIXES):
+        raise ValueError("Data file paths are not accepted here; pass the dataset handle the file was registered as")
+    return to_dataframe(data)
+
+
+def describe_dataset(df: Any, sample_rows: int = 3) -> Dict[str, Any]:
+    """Columns, dtypes, shape and a few sample rows: what the model needs to write chart code."""
+    import pandas as pd
+
+    # Unlike select_dtypes(include=["object"]), this also covers Arrow-backed string columns
+    categorical = [
+        str(col) for col, dtype in df.dtypes.items()
+        if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_string_dtype(dtype)
+    ]
+    return {
+        "columns": [str(c) for c in df.columns],
+        "dtypes": {str(col): str(dtype) for col, dtype in df.dtypes.items()},
+        "shape": {"rows": len(df), "columns": len(df.columns)},
+        "sample_data": json.loads(df.head(sample_rows).to_json(orient="records", date_format="iso")),
+        "numeric_columns": [str(c) for c in df.select_dtypes(include=["number"]).columns],
+        "categorical_columns": categorical,
+    }
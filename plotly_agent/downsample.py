@@ -0,0 +1,324 @@
+"""
+Point-budget reduction of Plotly figures before they are rendered.
+
+Chart code written for small data happily plots millions of rows, and the
+figure JSON then grows to hundreds of MB. :func:`reduce_figure` runs after the
+chart code, looks at each trace's type and shrinks its data with a method
+that keeps the chart looking the same:
+
+- line series (``scatter``/``scattergl`` drawn with lines): LTTB
+  (largest-triangle-three-buckets) or min/max decimation per bucket
+- marker-only scatter: 2-D binning, keeping one point per occupied grid cell
+  so the shape of the cloud and its outliers survive
+- ``bar``: values summed per category; beyond ``max_categories`` only the
+  largest bars are kept
+- ``pie``: values summed per label; beyond ``max_categories`` the smallest
+  slices are merged into "Other"
+- ``histogram``: pre-binned counts (plotted with ``histfunc="sum"``), so the
+  raw samples never reach the browser
+
+Per-point attributes (hover text, custom data, marker colors and sizes, error
+bars) are subset along with the points they belong to. The total number of
+points is kept within ``max_points``, split across traces in proportion to
+their size, so render time and payload size no longer grow with the input.
+"""
+
+import math
+import warnings
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_POINTS = 20000
+DEFAULT_MAX_CATEGORIES = 100
+
+# Trace attributes that hold one value per point and must be subset with it
+PER_POINT_ATTRIBUTES = (
+    "text", "hovertext", "customdata", "ids",
+    "marker.color", "marker.size", "marker.symbol", "marker.opacity",
+    "error_x.array", "error_x.arrayminus", "error_y.array", "error_y.arrayminus",
+)
+
+LINE_METHODS = ("lttb", "minmax")
+
+
+def _numeric(values: Any) -> Tuple[Optional[np.ndarray], bool]:
+    """Float array for numbers and datetimes (as epoch nanoseconds) and whether they were datetimes; None for categories."""
+    array = np.asarray(values)
+    if array.dtype.kind in "iufb":
+        return array.astype(float, copy=False), False
+    if array.dtype.kind == "M":
+        return array.astype("datetime64[ns]").astype("int64").astype(float), True
+    if array.dtype.kind == "O":
+        import pandas as pd
+
+        # Each conversion is tried on a few values first, so category labels fail fast
+        try:
+            pd.to_numeric(pd.Series(array[:100]))
+            return pd.to_numeric(pd.Series(array)).to_numpy(dtype=float), False
+        except (TypeError, ValueError):
+            pass
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            try:
+                pd.to_datetime(pd.Series(array[:100]))
+                dates = pd.to_datetime(pd.Series(array)).astype("datetime64[ns]")
+                return dates.astype("int64").to_numpy(dtype=float), True
+            except (TypeError, ValueError, OverflowError):
+                pass
+    return None, False
+
+
+def _as_numeric(values: Any) -> Optional[np.ndarray]:
+    return _numeric(values)[0]
+
+
+def _length(trace: Any) -> int:
+    for name in ("x", "y", "labels", "values"):
+        values = getattr(trace, name, None)
+        if values is not None and not isinstance(values, str):
+            try:
+                return len(values)
+            except TypeError:
+                continue
+    return 0
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the ``threshold`` points LTTB keeps, first and last always included."""
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # threshold - 2 buckets over the inner points, then the last point on its own
+    edges = np.append(np.linspace(1, n - 1, threshold - 1).astype(np.int64), n)
+    # Mean of every bucket at once; each step compares against the next bucket's mean
+    finite = np.isfinite(x) & np.isfinite(y)
+    counts = np.maximum(np.add.reduceat(finite.astype(np.int64), edges[:-1]), 1)
+    mean_x = np.add.reduceat(np.where(finite, x, 0.0), edges[:-1]) / counts
+    mean_y = np.add.reduceat(np.where(finite, y, 0.0), edges[:-1]) / counts
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        avg_x, avg_y = mean_x[i + 1], mean_y[i + 1]
+        area = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        area = np.where(np.isnan(area), -1.0, area)
+        a = start + int(np.argmax(area))
+        kept[i + 1] = a
+    return kept
+
+
+def minmax_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the minimum and maximum of each of ``threshold // 2`` buckets, in order."""
+    n = len(y)
+    buckets = max(threshold // 2, 1)
+    if threshold >= n:
+        return np.arange(n)
+    edges = np.linspace(0, n, buckets + 1).astype(np.int64)
+    kept = []
+    filled = np.where(np.isnan(y), np.nanmean(y) if np.isfinite(y).any() else 0.0, y)
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            kept.extend((start + int(np.argmin(filled[start:end])), start + int(np.argmax(filled[start:end]))))
+    return np.unique(np.asarray(kept, dtype=np.int64))
+
+
+def grid_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Indices of the first point in each occupied cell of a ~``threshold``-cell grid."""
+    cells_per_axis = max(int(math.sqrt(threshold)), 1)
+    finite = np.isfinite(x) & np.isfinite(y)
+    positions = np.flatnonzero(finite)
+    if len(positions) == 0:
+        return positions
+
+    def cell(values: np.ndarray) -> np.ndarray:
+        low, high = values.min(), values.max()
+        if high == low:
+            return np.zeros(len(values), dtype=np.int64)
+        return np.minimum(((values - low) / (high - low) * cells_per_axis).astype(np.int64), cells_per_axis - 1)
+
+    cells = cell(x[positions]) * cells_per_axis + cell(y[positions])
+    _, first = np.unique(cells, return_index=True)
+    return np.sort(positions[first])
+
+
+def _get(trace: Any, name: str) -> Any:
+    """``trace[name]``, or None where the trace type has no such attribute."""
+    try:
+        return trace[name]
+    except (KeyError, ValueError):
+        return None
+
+
+def _clear_per_point(trace: Any) -> None:
+    # After aggregation, per-row attributes no longer line up with the points
+    for name in PER_POINT_ATTRIBUTES:
+        value = _get(trace, name)
+        if value is not None and not isinstance(value, str):
+            trace[name] = None
+
+
+def _subset(trace: Any, indices: np.ndarray, n: int, names: Sequence[str]) -> None:
+    for name in names:
+        values = _get(trace, name)
+        if values is None or isinstance(values, str):
+            continue
+        try:
+            if len(values) != n:
+                continue
+        except TypeError:
+            continue
+        trace[name] = np.asarray(values, dtype=object if isinstance(values, (list, tuple)) else None)[indices]
+
+
+def _reduce_points(trace: Any, n: int, budget: int, line_method: str) -> Optional[Dict[str, Any]]:
+    x = np.arange(n, dtype=float) if trace.x is None else _as_numeric(trace.x)
+    y = None if trace.y is None else _as_numeric(trace.y)
+    mode = trace.mode or "lines"
+    if "lines" in mode:
+        if y is None:
+            indices, method = np.linspace(0, n - 1, budget).astype(np.int64), "stride"
+        elif line_method == "minmax":
+            indices, method = minmax_indices(y, budget), "minmax"
+        else:
+            # Categorical x values are treated as evenly spaced
+            indices, method = lttb_indices(np.arange(n, dtype=float) if x is None else x, y, budget), "lttb"
+    else:
+        if x is None or y is None:
+            indices, method = np.linspace(0, n - 1, budget).astype(np.int64), "stride"
+        else:
+            indices, method = grid_indices(x, y, budget), "grid_2d"
+    _subset(trace, indices, n, ("x", "y") + PER_POINT_ATTRIBUTES)
+    return {"method": method, "points_after": len(indices)}
+
+
+def _reduce_bar(trace: Any, n: int, max_categories: int) -> Optional[Dict[str, Any]]:
+    import pandas as pd
+
+    horizontal = trace.orientation == "h"
+    categories, values = (trace.y, trace.x) if horizontal else (trace.x, trace.y)
+    if categories is None or values is None:
+        return None
+    summed = pd.Series(np.asarray(values)).groupby(np.asarray(categories), sort=False).sum()
+    dropped = 0
+    if len(summed) > max_categories:
+        dropped = len(summed) - max_categories
+        summed = summed.loc[summed.abs().nlargest(max_categories).index]
+    _clear_per_point(trace)
+    if horizontal:
+        trace.y, trace.x = summed.index.to_numpy(), summed.to_numpy()
+    else:
+        trace.x, trace.y = summed.index.to_numpy(), summed.to_numpy()
+    reduction = {"method": "sum_by_category", "points_after": len(summed)}
+    if dropped:
+        reduction["categories_dropped"] = dropped
+    return reduction
+
+
+def _reduce_pie(trace: Any, n: int, max_categories: int) -> Optional[Dict[str, Any]]:
+    import pandas as pd
+
+    if trace.labels is None:
+        return None
+    labels = np.asarray(trace.labels)
+    values = pd.Series(np.ones(n) if trace.values is None else np.asarray(trace.values))
+    summed = values.groupby(labels, sort=False).sum().sort_values(ascending=False)
+    merged = 0
+    if len(summed) > max_categories:
+        merged = len(summed) - (max_categories - 1)
+        other = summed.iloc[max_categories - 1:].sum()
+        summed = pd.concat([summed.iloc[:max_categories - 1], pd.Series({"Other": other})])
+    _clear_per_point(trace)
+    trace.labels, trace.values = summed.index.to_numpy(), summed.to_numpy()
+    reduction = {"method": "sum_by_label", "points_after": len(summed)}
+    if merged:
+        reduction["labels_merged_into_other"] = merged
+    return reduction
+
+
+def _reduce_histogram(trace: Any, n: int, budget: int) -> Optional[Dict[str, Any]]:
+    import pandas as pd
+
+    horizontal = trace.x is None
+    samples = trace.y if horizontal else trace.x
+    if samples is None or (trace.x is not None and trace.y is not None):
+        # Already a histfunc over (x, y) pairs; leave it alone
+        return None
+    if trace.histfunc not in (None, "count"):
+        return None
+    numeric, is_datetime = _numeric(samples)
+    if numeric is not None:
+        bins = (trace.nbinsy if horizontal else trace.nbinsx) or min(budget, 100)
+        counts, edges = np.histogram(numeric[np.isfinite(numeric)], bins=int(bins))
+        centers = (edges[:-1] + edges[1:]) / 2
+        if is_datetime:
+            # Date bins take their bounds as dates and their size in milliseconds
+            centers = centers.astype("int64").astype("datetime64[ns]")
+            binning = {"start": str(np.datetime64(int(edges[0]), "ns")), "end": str(np.datetime64(int(edges[-1]), "ns")),
+                       "size": float(edges[1] - edges[0]) / 1e6}
+        else:
+            binning = {"start": float(edges[0]), "end": float(edges[-1]), "size": float(edges[1] - edges[0])}
+        if horizontal:
+            trace.ybins = binning
+        else:
+            trace.xbins = binning
+    else:
+        counted = pd.Series(np.asarray(samples)).value_counts(sort=False)
+        centers, counts = counted.index.to_numpy(), counted.to_numpy()
+    trace.histfunc = "sum"
+    if horizontal:
+        trace.y, trace.x = centers, counts
+    else:
+        trace.x, trace.y = centers, counts
+    return {"method": "prebinned_counts", "points_after": len(centers)}
+
+
+def reduce_figure(
+    fig: Any,
+    max_points: int = DEFAULT_MAX_POINTS,
+    max_categories: int = DEFAULT_MAX_CATEGORIES,
+    line_method: str = "lttb",
+) -> List[Dict[str, Any]]:
+    """
+    Reduce the traces of ``fig`` in place so it holds about ``max_points``
+    points in total.
+
+    Args:
+        fig: Plotly figure produced by the chart code
+        max_points: Point budget for the whole figure
+        max_categories: Bars or pie slices kept per trace
+        line_method: "lttb" or "minmax" for line series
+
+    Returns:
+        One entry per reduced trace: index, name, type, method and point counts.
+        Empty if the figure was already within budget.
+    """
+    if line_method not in LINE_METHODS:
+        raise ValueError(f"line_method must be one of {LINE_METHODS}")
+    sizes = [_length(trace) for trace in fig.data]
+    total = sum(sizes)
+    if total <= max_points:
+        return []
+
+    reductions = []
+    for index, (trace, n) in enumerate(zip(fig.data, sizes)):
+        # Each trace gets a share of the budget proportional to its size
+        budget = max(int(max_points * n / total), 3)
+        if n <= budget:
+            continue
+        if trace.type in ("scatter", "scattergl"):
+            reduction = _reduce_points(trace, n, budget, line_method)
+        elif trace.type == "bar":
+            reduction = _reduce_bar(trace, n, min(budget, max_categories))
+        elif trace.type == "pie":
+            reduction = _reduce_pie(trace, n, min(budget, max_categories))
+        elif trace.type == "histogram":
+            reduction = _reduce_histogram(trace, n, budget)
+        else:
+            reduction = None
+        if reduction is not None:
+            reductions.append({
+                "trace": index, "name": trace.name, "type": trace.type, "points_before": n, **reduction,
+            })
+    return reductions
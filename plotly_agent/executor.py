@@ -0,0 +1,498 @@
+"""
+Execution of generated chart code, in process or in a sandboxed worker pool.
+
+By default the chart tools ``exec`` the model's code in the agent's own
+process: a runaway loop or a huge allocation stalls or kills the server, and
+the GIL is held for the whole render. :class:`ChartExecutorPool` keeps warm
+worker processes with pandas and plotly already imported and runs the code
+there instead:
+
+- every run has a wall-clock timeout; a worker that exceeds it is killed and
+  replaced, and the tool gets an error it can report back to the model
+- each worker has an address-space limit (``RLIMIT_AS``, where available), so
+  an oversized allocation fails with MemoryError in the worker only
+- the DataFrame goes to the worker through shared memory as an Arrow IPC
+  stream (pickle if Arrow cannot represent it). Segments are cached per dataset
+  handle, so repairs and repeat charts of one dataset are not copied again
+- separate callers use separate workers, so charts render in parallel across
+  cores
+
+Install a pool for the process with :func:`set_chart_executor`; the tools use
+it from then on. Security checks still run in the agent process, before
+anything is sent to a worker.
+"""
+
+import gc
+import multiprocessing
+import os
+import pickle
+import queue
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+from agent_tracing import span
+
+
+class ChartExecutionError(RuntimeError):
+    """The chart code failed in a worker; the message carries the worker's exception."""
+
+
+class ChartTimeoutError(ChartExecutionError):
+    """The chart code ran past the pool's timeout and its worker was killed."""
+
+
+def execute_chart_code(
+    code: str,
+    df: Any,
+    variables: Optional[Dict[str, Any]] = None,
+    max_points: int = 0,
+) -> Tuple[Any, Optional[str], List[Dict[str, Any]]]:
+    """
+    Run chart ``code`` with ``df``, ``px``, ``go`` and ``pd`` in scope.
+
+    Returns:
+        ``(fig, figure JSON, reductions)``, or ``(None, None, [])`` if the code
+        did not assign ``fig``. With ``max_points`` the figure is first reduced
+        to that point budget (see :func:`plotly_agent.downsample.reduce_figure`).
+    """
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    exec_context = {"df": df, "px": px, "go": go, "pd": pd, **(variables or {})}
+    with span("plotly.exec", code_chars=len(code)):
+        exec(code, exec_context)
+    fig = exec_context.get("fig")
+    if fig is None:
+        return None, None, []
+
+    reductions: List[Dict[str, Any]] = []
+    if max_points > 0:
+        from .downsample import reduce_figure
+
+        with span("plotly.downsample", max_points=max_points) as stage:
+            reductions = reduce_figure(fig, max_points=max_points)
+            stage.set(traces_reduced=len(reductions))
+
+    with span("plotly.to_json") as stage:
+        figure_json = fig.to_json()
+        stage.set(payload_bytes=len(figure_json))
+    return fig, figure_json, reductions
+
+
+@dataclass
+class ChartResult:
+    """Outcome of one run in the pool. ``figure_json`` is None if the code did not assign ``fig``."""
+    figure_json: Optional[str]
+    reductions: List[Dict[str, Any]] = field(default_factory=list)
+    worker_pid: int = 0
+    seconds: float = 0.0
+
+
+# ---------------------------------------------------------------------------
+# Shared-memory transport
+# ---------------------------------------------------------------------------
+
+def _write_shared(df: Any) -> Tuple[shared_memory.SharedMemory, str, int]:
+    """Copy ``df`` into a new shared memory segment; returns (segment, format, size)."""
+    try:
+        import pyarrow as pa
+
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        sink = pa.MockOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        size = sink.size()
+        segment = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        # Serialize straight into the segment, without an intermediate bytes copy
+        with pa.ipc.new_stream(pa.FixedSizeBufferWriter(pa.py_buffer(segment.buf)), table.schema) as writer:
+            writer.write_table(table)
+        return segment, "arrow", size
+    except (ImportError, TypeError, ValueError, NotImplementedError):
+        # No pyarrow, or columns Arrow cannot represent (e.g. mixed-type objects)
+        pass
+    payload = pickle.dumps(df, protocol=5)
+    segment = shared_memory.SharedMemory(create=True, size=max(len(payload), 1))
+    segment.buf[:len(payload)] = payload
+    return segment, "pickle", len(payload)
+
+
+def _attach_shared(name: str) -> shared_memory.SharedMemory:
+    """Open an existing segment without taking over its cleanup; the pool unlinks it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching also registers the segment with the
+        # resource tracker, which workers share with the pool's process, so the
+        # pool's unlink still unregisters it exactly once
+        return shared_memory.SharedMemory(name=name)
+
+
+def _read_shared(segment: shared_memory.SharedMemory, fmt: str, size: int) -> Any:
+    if fmt == "arrow":
+        import pyarrow as pa
+
+        # Columns that stay Arrow-backed are read from the segment in place
+        return pa.ipc.open_stream(pa.py_buffer(segment.buf)[:size]).read_all().to_pandas()
+    return pickle.loads(segment.buf[:size])
+
+
+# ---------------------------------------------------------------------------
+# Worker process
+# ---------------------------------------------------------------------------
+
+def _limit_memory(memory_limit_mb: Optional[int]) -> None:
+    if not memory_limit_mb:
+        return
+    try:
+        import resource
+    except ImportError:
+        # No rlimits on Windows; the timeout still applies
+        return
+    limit = memory_limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _worker_main(conn: Any, memory_limit_mb: Optional[int], cached_datasets: int) -> None:
+    _limit_memory(memory_limit_mb)
+    import pandas as pd
+    import plotly.express as px
+
+    # Load plotly's validators and serializer before the first real task
+    px.bar(pd.DataFrame({"x": ["a"], "y": [1]}), x="x", y="y").to_json()
+    attached: "OrderedDict[str, Tuple[shared_memory.SharedMemory, Any]]" = OrderedDict()
+    conn.send(("ready", os.getpid()))
+
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+        code, (name, fmt, size, cache), variables, max_points = task
+        segment = df = None
+        try:
+            if name in attached:
+                attached.move_to_end(name)
+                # Chart code may modify df in place; the cached frame must stay intact
+                df = attached[name][1].copy()
+            else:
+                segment = _attach_shared(name)
+                df = _read_shared(segment, fmt, size)
+                if cache:
+                    attached[name] = (segment, df)
+                    df = df.copy()
+                    while len(attached) > cached_datasets:
+                        _close_quietly(attached.popitem(last=False)[1][0])
+            _, figure_json, reductions = execute_chart_code(code, df, variables, max_points)
+            conn.send(("ok", figure_json, reductions))
+        except MemoryError:
+            conn.send(("error", f"MemoryError: chart code exceeded the worker memory limit of {memory_limit_mb} MB", None))
+        except BaseException as e:
+            conn.send(("error", f"{type(e).__name__}: {e}", None))
+        finally:
+            if segment is not None and not cache:
+                # Drop the frame before its one-off segment goes away
+                df = None
+                _close_quietly(segment)
+            _close_lingering()
+
+    for segment, _ in attached.values():
+        _close_quietly(segment)
+    attached.clear()
+    _close_lingering()
+
+
+# Segments whose frames were still alive when they were closed; retried after each task
+_lingering: List[shared_memory.SharedMemory] = []
+
+
+def _close_quietly(segment: shared_memory.SharedMemory) -> None:
+    try:
+        segment.close()
+    except BufferError:
+        # Still referenced by a frame; try again once that is collected
+        _lingering.append(segment)
+
+
+def _close_lingering() -> None:
+    if not _lingering:
+        return
+    gc.collect()
+    for segment in list(_lingering):
+        try:
+            segment.close()
+            _lingering.remove(segment)
+        except BufferError:
+            pass
+
+
+class _Worker:
+    def __init__(self, context: Any, memory_limit_mb: Optional[int], cached_datasets: int):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, memory_limit_mb, cached_datasets),
+            name="chart-worker", daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.pid: Optional[int] = None
+        self.tasks = 0
+        self._ready_lock = threading.Lock()
+
+    def wait_ready(self, timeout: float) -> None:
+        # ChartExecutorPool.ready() may wait on a worker that a run has just taken
+        with self._ready_lock:
+            if self.pid is not None:
+                return
+            if not self.conn.poll(timeout):
+                raise ChartExecutionError(f"Chart worker did not start within {timeout:.0f}s")
+            _, self.pid = self.conn.recv()
+
+    def stop(self, kill: bool = False) -> None:
+        if not kill:
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+# ---------------------------------------------------------------------------
+# Pool
+# ---------------------------------------------------------------------------
+
+class ChartExecutorPool:
+    """
+    Warm worker processes that run generated chart code under limits.
+
+    Args:
+        workers: Worker processes; defaults to the number of CPUs.
+        timeout: Seconds a single run may take before its worker is killed.
+        memory_limit_mb: Address-space limit per worker, or None for none.
+        max_tasks_per_worker: Runs after which a worker is replaced, to shed leaked memory.
+        shared_datasets: Datasets kept in shared memory (and cached by workers) between runs.
+        start_method: multiprocessing start method; "forkserver" where available, else "spawn".
+        startup_timeout: Seconds a new worker may take to import pandas and plotly.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        timeout: float = 30.0,
+        memory_limit_mb: Optional[int] = 4096,
+        max_tasks_per_worker: int = 200,
+        shared_datasets: int = 8,
+        start_method: Optional[str] = None,
+        startup_timeout: float = 60.0,
+    ):
+        if start_method is None:
+            start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        self._context = multiprocessing.get_context(start_method)
+        self.workers = workers or os.cpu_count() or 1
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.shared_datasets = shared_datasets
+        self.startup_timeout = startup_timeout
+        self._lock = threading.Lock()
+        self._closed = False
+        # dataset key -> [segment, format, size, runs using it]
+        self._shared: "OrderedDict[str, List[Any]]" = OrderedDict()
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._all: List[_Worker] = []
+        for _ in range(self.workers):
+            self._idle.put(self._spawn())
+        self.runs = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.busy_seconds = 0.0
+
+    def ready(self, timeout: Optional[float] = None) -> "ChartExecutorPool":
+        """Wait until every worker has imported pandas and plotly, so the first runs are not slowed by start-up."""
+        with self._lock:
+            workers = list(self._all)
+        for worker in workers:
+            worker.wait_ready(self.startup_timeout if timeout is None else timeout)
+        return self
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._context, self.memory_limit_mb, self.shared_datasets)
+        with self._lock:
+            self._all.append(worker)
+        return worker
+
+    def _replace(self, worker: _Worker, kill: bool) -> None:
+        worker.stop(kill=kill)
+        with self._lock:
+            self._all.remove(worker)
+            self.restarts += 1
+            closed = self._closed
+        if not closed:
+            self._idle.put(self._spawn())
+
+    def _share(self, df: Any, key: Optional[str]) -> Tuple[List[Any], Optional[str]]:
+        """Shared-memory entry for ``df``, pinned until :meth:`_release`."""
+        with self._lock:
+            entry = self._shared.get(key) if key is not None else None
+            if entry is not None:
+                self._shared.move_to_end(key)
+                entry[3] += 1
+                return entry, key
+        segment, fmt, size = _write_shared(df)
+        entry = [segment, fmt, size, 1]
+        if key is None:
+            return entry, None
+        with self._lock:
+            if key in self._shared:
+                # Another caller shared the same dataset meanwhile; use theirs
+                _free(segment)
+                entry = self._shared[key]
+                entry[3] += 1
+            else:
+                self._shared[key] = entry
+        return entry, key
+
+    def _release(self, entry: List[Any], key: Optional[str]) -> None:
+        with self._lock:
+            entry[3] -= 1
+            if key is None:
+                _free(entry[0])
+                return
+            # Drop the least recently used datasets no run is using
+            for old_key in list(self._shared):
+                if len(self._shared) <= self.shared_datasets:
+                    break
+                if self._shared[old_key][3] == 0:
+                    _free(self._shared.pop(old_key)[0])
+
+    def run(
+        self,
+        code: str,
+        df: Any,
+        variables: Optional[Dict[str, Any]] = None,
+        max_points: int = 0,
+        data_key: Optional[str] = None,
+    ) -> ChartResult:
+        """
+        Run chart ``code`` on ``df`` in an idle worker, waiting for one if all are busy.
+
+        Args:
+            code: Chart code that assigns ``fig``
+            df: The DataFrame bound to ``df``
+            variables: Extra names for the code's namespace (must be picklable)
+            max_points: Point budget for :func:`~plotly_agent.downsample.reduce_figure` (0: off)
+            data_key: Identity of ``df`` (e.g. its dataset handle) so its shared
+                memory copy is reused by later runs
+
+        Raises:
+            ChartTimeoutError: The run took longer than ``timeout``.
+            ChartExecutionError: The code raised, or the worker died.
+        """
+        if self._closed:
+            raise RuntimeError("ChartExecutorPool is closed")
+        with span("plotly.share_data") as stage:
+            entry, key = self._share(df, data_key)
+            stage.set(payload_bytes=entry[2], format=entry[1])
+        worker = self._idle.get()
+        started = time.perf_counter()
+        try:
+            worker.wait_ready(self.startup_timeout)
+            worker.conn.send((code, (entry[0].name, entry[1], entry[2], key is not None), variables or {}, max_points))
+            if not worker.conn.poll(self.timeout):
+                with self._lock:
+                    self.timeouts += 1
+                self._replace(worker, kill=True)
+                worker = None
+                raise ChartTimeoutError(f"Chart code did not finish within {self.timeout:g}s and was stopped")
+            try:
+                status, payload, reductions = worker.conn.recv()
+            except (EOFError, OSError):
+                self._replace(worker, kill=True)
+                exitcode = worker.process.exitcode
+                worker = None
+                raise ChartExecutionError(f"Chart worker exited unexpectedly (exit code {exitcode})")
+            if status != "ok":
+                with self._lock:
+                    self.errors += 1
+                raise ChartExecutionError(payload)
+            return ChartResult(figure_json=payload, reductions=reductions or [], worker_pid=worker.pid or 0,
+                               seconds=time.perf_counter() - started)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.runs += 1
+                self.busy_seconds += elapsed
+            self._release(entry, key)
+            if worker is not None:
+                worker.tasks += 1
+                if worker.tasks >= self.max_tasks_per_worker:
+                    self._replace(worker, kill=False)
+                else:
+                    self._idle.put(worker)
+
+    def close(self) -> None:
+        """Stop the workers and free all shared memory."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            workers, self._all = list(self._all), []
+            shared, self._shared = list(self._shared.values()), OrderedDict()
+        for worker in workers:
+            worker.stop()
+        for entry in shared:
+            _free(entry[0])
+
+    def __enter__(self) -> "ChartExecutorPool":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "workers": len(self._all),
+                "idle": self._idle.qsize(),
+                "runs": self.runs,
+                "errors": self.errors,
+                "timeouts": self.timeouts,
+                "restarts": self.restarts,
+                "avg_run_ms": round(self.busy_seconds / self.runs * 1000, 1) if self.runs else 0.0,
+                "shared_datasets": len(self._shared),
+                "shared_bytes": sum(entry[2] for entry in self._shared.values()),
+            }
+
+
+def _free(segment: shared_memory.SharedMemory) -> None:
+    segment.close()
+    try:
+        segment.unlink()
+    except FileNotFoundError:
+        pass
+
+
+_executor: Optional[ChartExecutorPool] = None
+
+
+def get_chart_executor() -> Optional[ChartExecutorPool]:
+    """The pool the chart tools run code in, or None to run it in this process."""
+    return _executor
+
+
+def set_chart_executor(executor: Optional[ChartExecutorPool]) -> Optional[ChartExecutorPool]:
+    """Make the chart tools use ``executor`` (None: run in process); returns the previous one."""
+    global _executor
+    previous, _executor = _executor, executor
+    return previous
@@ -9,21 +9,103 @@ import json
 import os
 from datetime import datetime
 import uuid
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 from langchain.tools import tool
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 
+from agent_tracing import span, traced
+
+from .datasets import describe_dataset, is_handle, resolve_dataset
+from .executor import execute_chart_code, get_chart_executor
 from .security import check_malicious_code
 
 
+def _plotting_modules() -> Tuple[Any, Any, Any]:
+    """
+    Import pandas, plotly.express and plotly.graph_objects on first use.
+
+    They take far longer to import than the rest of the package, so loading
+    them here keeps short-lived processes that never draw a chart fast.
+    """
+    import pandas as pd
+    import plotly.express as px
+    import plotly.graph_objects as go
+
+    return pd, px, go
+
+
+def _load_dataframe(data_json: str, for_exec: bool = False) -> Any:
+    """
+    DataFrame for a tool's ``data_json`` argument: a registered dataset handle,
+    resolved without parsing, or inline JSON. File paths are refused.
+    """
+    with span("plotly.parse_data") as stage:
+        if is_handle(data_json):
+            # Resolved through the dataset store
+            stage.set(dataset=str(data_json).strip())
+            df = resolve_dataset(data_json)
+            if for_exec:
+                # Chart code may modify df in place; keep the registered dataset intact.
+                # Arrow-backed columns share their immutable buffers in the copy.
+                df = df.copy()
+        else:
+            if isinstance(data_json, str):
+                stage.set(payload_bytes=len(data_json))
+            df = resolve_dataset(data_json)
+        stage.set(records=len(df))
+    return df
+
+
 def _should_save_images() -> bool:
     """Check if SAVE_IMAGES environment variable is set to Yes."""
     save_images = os.environ.get("SAVE_IMAGES", "").strip().lower()
     return save_images in ("yes", "true", "1")
 
 
+def _max_points() -> int:
+    """Figure point budget from PLOTLY_MAX_POINTS (default 20000; 0 turns downsampling off)."""
+    value = os.environ.get("PLOTLY_MAX_POINTS", "").strip()
+    try:
+        return int(value) if value else 20000
+    except ValueError:
+        return 20000
+
+
+def _run_chart_code(
+    data_json: str, plotly_code: str, variables: Dict[str, Any]
+) -> Tuple[Any, Optional[str], List[Dict[str, Any]]]:
+    """
+    Run chart code against the data and return ``(fig, figure JSON, reductions)``;
+    both are None if the code did not assign ``fig``. With a chart executor set
+    (see :func:`~plotly_agent.executor.set_chart_executor`) the code runs in a
+    sandboxed worker and ``fig`` is only rebuilt here when it is to be saved.
+    """
+    executor = get_chart_executor()
+    if executor is None:
+        df = _load_dataframe(data_json, for_exec=True)
+        return execute_chart_code(plotly_code, df, variables, _max_points())
+
+    # The worker gets its own copy, so the registered frame is shared as is
+    df = _load_dataframe(data_json)
+    data_key = data_json.strip() if is_handle(data_json) else None
+    with span("plotly.sandbox_run", code_chars=len(plotly_code)) as stage:
+        outcome = executor.run(plotly_code, df, variables, max_points=_max_points(), data_key=data_key)
+        stage.set(worker_pid=outcome.worker_pid)
+    if outcome.figure_json is None:
+        return None, None, []
+    fig = None
+    if _should_save_images():
+        import plotly.io as pio
+
+        fig = pio.from_json(outcome.figure_json)
+    return fig, outcome.figure_json, outcome.reductions
+
+
+def _describe_reductions(reductions: List[Dict[str, Any]]) -> str:
+    parts = [f"trace {r['trace']} ({r['type']}) {r['method']} {r['points_before']}->{r['points_after']} points"
+             for r in reductions]
+    return "Data reduced to fit the point budget: " + "; ".join(parts)
+
+
 def _save_chart(fig, chart_type: str = "chart") -> Optional[str]:
     """
     Save a Plotly figure to the data folder if SAVE_IMAGES is enabled.
@@ -73,6 +155,7 @@ def _save_chart(fig, chart_type: str = "chart") -> Optional[str]:
 
 
 @tool
+@traced("tool.create_plotly_chart")
 def create_plotly_chart(data_json: str, plotly_code: str) -> str:
     """
     Create a Plotly chart from data and Python code.
@@ -81,7 +164,8 @@ def create_plotly_chart(data_json: str, plotly_code: str) -> str:
     a figure object named 'fig' using plotly.express (px) or plotly.graph_objects (go).
 
     Args:
-        data_json: JSON string representation of the DataFrame data.
+        data_json: Dataset handle (e.g. 'ds_3f9a0c12b4e6d871') when one was given,
+                   otherwise a JSON string of the data.
                    Example: '[{"A": 1, "B": 2}, {"A": 3, "B": 4}]'
         plotly_code: Python code that creates a Plotly figure named 'fig'.
                      Example: 'fig = px.line(df, x="A", y="B", title="My Chart")'
@@ -90,47 +174,36 @@ def create_plotly_chart(data_json: str, plotly_code: str) -> str:
         JSON string of the figure for rendering, or error message if failed.
     """
     try:
-        # Parse the data
-        if isinstance(data_json, str):
-            data = json.loads(data_json)
-        else:
-            data = data_json
-        df = pd.DataFrame(data)
-
         # Security check
-        if check_malicious_code(plotly_code, verbose=True):
+        with span("plotly.security_check"):
+            malicious = check_malicious_code(plotly_code, verbose=True)
+        if malicious:
             return json.dumps({
                 "error": "Security Error: Malicious code patterns detected. Please revise your code.",
                 "success": False
             })
 
-        # Create execution context
-        exec_context = {
-            "df": df,
-            "px": px,
-            "go": go,
-            "pd": pd
-        }
-
-        # Execute the code
-        exec(plotly_code, exec_context)
-        fig = exec_context.get("fig")
+        # Execute the code, reduce very large data to the point budget and serialize
+        fig, figure_json, reductions = _run_chart_code(data_json, plotly_code, {})
 
-        if fig is None:
+        if figure_json is None:
             return json.dumps({
                 "error": "The code did not create a 'fig' variable. Ensure your code assigns the figure to 'fig'.",
                 "success": False
             })
 
         # Save chart if SAVE_IMAGES is enabled
-        saved_path = _save_chart(fig, "chart")
+        with span("plotly.save"):
+            saved_path = _save_chart(fig, "chart")
 
-        # Return figure as JSON for serialization
         result = {
-            "figure_json": fig.to_json(),
+            "figure_json": figure_json,
             "success": True,
             "message": "Chart created successfully"
         }
+        if reductions:
+            result["reductions"] = reductions
+            result["message"] += ". " + _describe_reductions(reductions)
         if saved_path:
             result["saved_path"] = saved_path
 
@@ -145,6 +218,7 @@ def create_plotly_chart(data_json: str, plotly_code: str) -> str:
 
 
 @tool
+@traced("tool.repair_plotly_code")
 def repair_plotly_code(data_json: str, plotly_code: str, error_message: str) -> str:
     """
     Attempt to repair and execute Plotly code that previously failed.
@@ -152,7 +226,8 @@ def repair_plotly_code(data_json: str, plotly_code: str, error_message: str) ->
     Use this tool when create_plotly_chart fails and you need to fix the code.
 
     Args:
-        data_json: JSON string representation of the DataFrame data.
+        data_json: Dataset handle (e.g. 'ds_3f9a0c12b4e6d871') when one was given,
+                   otherwise a JSON string of the data.
         plotly_code: The corrected Python code that creates a Plotly figure named 'fig'.
         error_message: The error message from the previous failed attempt.
 
@@ -160,34 +235,19 @@ def repair_plotly_code(data_json: str, plotly_code: str, error_message: str) ->
         JSON string of the figure for rendering, or error message if repair failed.
     """
     try:
-        # Parse the data
-        if isinstance(data_json, str):
-            data = json.loads(data_json)
-        else:
-            data = data_json
-        df = pd.DataFrame(data)
-
         # Security check
-        if check_malicious_code(plotly_code, verbose=True):
+        with span("plotly.security_check"):
+            malicious = check_malicious_code(plotly_code, verbose=True)
+        if malicious:
             return json.dumps({
                 "error": "Security Error: Malicious code patterns detected in repair attempt.",
                 "success": False
             })
 
-        # Create execution context
-        exec_context = {
-            "df": df,
-            "px": px,
-            "go": go,
-            "pd": pd,
-            "previous_error": error_message
-        }
-
-        # Execute the repaired code
-        exec(plotly_code, exec_context)
-        fig = exec_context.get("fig")
+        # Execute the repaired code, reduce very large data and serialize
+        fig, figure_json, reductions = _run_chart_code(data_json, plotly_code, {"previous_error": error_message})
 
-        if fig is None:
+        if figure_json is None:
             return json.dumps({
                 "error": "Repair failed: The code still did not create a 'fig' variable.",
                 "success": False,
@@ -195,13 +255,17 @@ def repair_plotly_code(data_json: str, plotly_code: str, error_message: str) ->
             })
 
         # Save chart if SAVE_IMAGES is enabled
-        saved_path = _save_chart(fig, "repaired_chart")
+        with span("plotly.save"):
+            saved_path = _save_chart(fig, "repaired_chart")
 
         result = {
-            "figure_json": fig.to_json(),
+            "figure_json": figure_json,
             "success": True,
             "message": "Chart repaired and created successfully"
         }
+        if reductions:
+            result["reductions"] = reductions
+            result["message"] += ". " + _describe_reductions(reductions)
         if saved_path:
             result["saved_path"] = saved_path
 
@@ -217,6 +281,7 @@ def repair_plotly_code(data_json: str, plotly_code: str, error_message: str) ->
 
 
 @tool
+@traced("tool.get_dataframe_info")
 def get_dataframe_info(data_json: str) -> str:
     """
     Get information about a DataFrame to help with chart creation.
@@ -225,27 +290,16 @@ def get_dataframe_info(data_json: str) -> str:
     before creating a chart.
 
     Args:
-        data_json: JSON string representation of the DataFrame data.
+        data_json: Dataset handle (e.g. 'ds_3f9a0c12b4e6d871') when one was given,
+                   otherwise a JSON string of the data.
 
     Returns:
         JSON string containing DataFrame information (columns, dtypes, sample data).
     """
     try:
-        if isinstance(data_json, str):
-            data = json.loads(data_json)
-        else:
-            data = data_json
-        df = pd.DataFrame(data)
-
-        info = {
-            "columns": list(df.columns),
-            "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
-            "shape": {"rows": len(df), "columns": len(df.columns)},
-            "sample_data": df.head(3).to_dict(orient="records"),
-            "numeric_columns": list(df.select_dtypes(include=['number']).columns),
-            "categorical_columns": list(df.select_dtypes(include=['object', 'category']).columns),
-            "success": True
-        }
+        df = _load_dataframe(data_json)
+        info = describe_dataset(df)
+        info["success"] = True
 
         return json.dumps(info)
 
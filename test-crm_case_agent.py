@@ -2,7 +2,7 @@ import os
 from dotenv import load_dotenv
 from PowerPlatform.Dataverse.client import DataverseClient
 from azure.identity import InteractiveBrowserCredential
-from crm_case_agent import CRMCaseAgent
+from crm_case_agent import CRMCaseAgent, SharedTokenCredential
 
 # Load environment variables from .env file
 load_dotenv()
@@ -19,17 +19,18 @@ if __name__ == '__main__':
     if not resource_url:
         raise ValueError("DATAVERSE_RESOURCE_URL environment variable is not set")
 
-    # Use InteractiveBrowserCredential for user authentication
+    # Use InteractiveBrowserCredential for user authentication, behind a shared token cache
+    # that refreshes tokens in the background so requests never wait on auth
     print("Using InteractiveBrowserCredential() for authentication. A browser window may open for you to sign in...")
-    credential = InteractiveBrowserCredential()
+    credential = SharedTokenCredential(InteractiveBrowserCredential())
 
     # Trigger an interactive auth flow to prompt the user immediately (optional).
     # We use the Dataverse resource scope: '<resource_url>/.default'
     try:
         test_scope = f"{resource_url}/.default" if resource_url else None
         if test_scope:
-            # This call will open a browser for interactive login if needed
-            token = credential.get_token(test_scope)
+            # This call will open a browser for interactive login if needed; the token is cached
+            token = credential.prefetch(test_scope)
             print(f"Obtained access token for scope: {test_scope} (expires_on={token.expires_on})")
     except Exception as e:
         print(f"Warning: Interactive auth failed or was not completed: {e}")
@@ -53,3 +54,6 @@ if __name__ == '__main__':
     interactive_flag = os.getenv("INTERACTIVE", "false").strip().lower()
     if interactive_flag in ("1", "true", "yes"):
         agent.chat()
+
+    print(f"Token cache: {credential.stats()}")
+    credential.close()
@@ -0,0 +1,76 @@
+from crm_case_agent.fakes import synthetic_client
+from crm_case_agent.filters import CaseFilter
+from crm_case_agent.replica import CaseReplica
+
+# Offline check of the local incident replica against the in-memory fake Dataverse client:
+# full sync, incremental upserts and the watermark, reconcile, keyset paging and staleness.
+
+if __name__ == '__main__':
+
+    client = synthetic_client(incidents=2000, customers=20)
+    incidents = client.tables["incident"]
+    replica = CaseReplica()
+    assert not replica.is_ready
+
+    # First sync pulls everything and sets the watermark to the newest modifiedon
+    applied = replica.sync(client)
+    print(f"Initial sync: {applied} rows, watermark={replica.watermark}")
+    assert applied == len(incidents) == len(replica)
+    assert replica.watermark == max(case["modifiedon"] for case in incidents)
+    assert replica.is_ready
+
+    # Detail lookups carry the state and owner columns get_case_details shows
+    first = replica.get_case(incidents[0]["ticketnumber"])
+    assert first["statecode"] == incidents[0]["statecode"]
+    assert "_ownerid_value" in first
+
+    # An edited case is upserted in place and advances the watermark; nothing is duplicated
+    edited = dict(incidents[0], title="Edited title", modifiedon="2099-01-01T00:00:00Z")
+    incidents[0] = edited
+    applied = replica.sync(client)
+    print(f"Incremental sync: {applied} rows, watermark={replica.watermark}")
+    assert replica.watermark == "2099-01-01T00:00:00Z"
+    assert len(replica) == len(incidents)
+    assert replica.get_case(edited["ticketnumber"].lower())["title"] == "Edited title"
+
+    # The watermark never moves backwards, even when older rows are applied later
+    replica.apply([dict(incidents[1], modifiedon="2000-01-01T00:00:00Z")])
+    assert replica.watermark == "2099-01-01T00:00:00Z"
+
+    # Deletions are invisible to the watermark; reconcile removes them
+    deleted = incidents.pop()
+    replica.sync(client)
+    assert replica.get_case(deleted["ticketnumber"]) is not None
+    removed = replica.reconcile(client)
+    print(f"Reconcile removed {removed} row(s)")
+    assert removed == 1 and replica.get_case(deleted["ticketnumber"]) is None
+
+    # Keyset pages cover every row exactly once, in the requested order, and match Dataverse
+    customer = incidents[0]["customerid_account"]["name"]
+    case_filter = CaseFilter.build(order_by="createdon desc")
+    pages = list(replica.get_customer_cases(customer, page_size=7, case_filter=case_filter))
+    local_ids = [case["incidentid"] for page in pages for case in page]
+    remote_ids = [
+        case["incidentid"]
+        for page in client.get("incident", select=["incidentid"], orderby=case_filter.to_orderby(),
+                               filter=f"customerid_account/name eq '{customer}'")
+        for case in page
+    ]
+    print(f"Keyset read for '{customer}': {len(local_ids)} rows in {len(pages)} pages")
+    assert all(len(page) <= 7 for page in pages)
+    assert len(local_ids) == len(set(local_ids)) == len(remote_ids)
+    assert sorted(local_ids) == sorted(remote_ids)
+    created = [replica.get_case(case["ticketnumber"])["createdon"] for page in pages for case in page]
+    assert created == sorted(created, reverse=True)
+
+    # With max_age the replica stops serving once it has not synced for too long
+    fresh = CaseReplica(max_age=60)
+    fresh.sync(client)
+    assert fresh.is_ready
+    fresh.last_sync_at -= 120
+    print(f"Replica age {fresh.age:.0f}s with max_age=60: is_ready={fresh.is_ready}")
+    assert not fresh.is_ready
+
+    replica.close()
+    fresh.close()
+    print("Case replica checks passed.")